@@ -0,0 +1,136 @@
+"""Structured, sampled access log for the gateway.
+
+One JSON line per (sampled) request, written by a background thread: the
+request path only builds a dict and puts it on a bounded queue, so logging
+cost stays constant under load. When the queue is full entries are dropped
+and counted instead of blocking.
+
+Errors (status >= 500) and slow requests are always logged; the rest are
+kept with probability ``GATEWAY_ACCESS_LOG_SAMPLE``.
+"""
+
+import json
+import logging
+import queue
+import random
+import sys
+import time
+from datetime import datetime, timezone
+from logging.handlers import QueueHandler, QueueListener
+
+
+class _JsonFormatter(logging.Formatter):
+    def format(self, record: logging.LogRecord) -> str:
+        entry = getattr(record, "access", None)
+        if entry is None:
+            entry = {"msg": record.getMessage()}
+        return json.dumps(entry, separators=(",", ":"), default=str)
+
+
+class _DroppingQueueHandler(QueueHandler):
+    def __init__(self, q):
+        super().__init__(q)
+        self.dropped = 0
+
+    def prepare(self, record):
+        # formatting happens in the listener thread, not on the request path
+        return record
+
+    def enqueue(self, record):
+        try:
+            self.queue.put_nowait(record)
+        except queue.Full:
+            self.dropped += 1
+
+
+class AccessLogger:
+    def __init__(
+        self,
+        sample_rate: float = 1.0,
+        slow_ms: float = 1000.0,
+        queue_size: int = 10000,
+        stream=None,
+    ):
+        self.sample_rate = sample_rate
+        self.slow_ms = slow_ms
+        self._handler = _DroppingQueueHandler(queue.Queue(maxsize=queue_size))
+        out = logging.StreamHandler(stream or sys.stdout)
+        out.setFormatter(_JsonFormatter())
+        self._listener = QueueListener(self._handler.queue, out)
+        self._logger = logging.getLogger("api-gateway.access")
+        self._logger.propagate = False
+        self._logger.setLevel(logging.INFO)
+        self._logger.addHandler(self._handler)
+        self._started = False
+
+    @property
+    def dropped(self) -> int:
+        return self._handler.dropped
+
+    def start(self) -> None:
+        if not self._started:
+            self._listener.start()
+            self._started = True
+
+    def stop(self) -> None:
+        if self._started:
+            # flushes whatever is still queued
+            self._listener.stop()
+            self._started = False
+
+    def sampled(self, status: int, total_ms: float) -> bool:
+        if status >= 500 or total_ms >= self.slow_ms:
+            return True
+        return self.sample_rate >= 1.0 or random.random() < self.sample_rate
+
+    def log(self, entry: dict) -> None:
+        self._logger.info("access", extra={"access": entry})
+
+
+class AccessLogMiddleware:
+    """ASGI middleware that emits one access entry per HTTP request.
+
+    Upstream fields are read from ``request.state`` (``scope["state"]``),
+    where the forwarder stores ``upstream_service``, ``upstream_status``,
+    ``upstream_ms``, ``cache`` and ``coalesced``.
+    """
+
+    def __init__(self, app, access_logger: AccessLogger):
+        self.app = app
+        self.access_logger = access_logger
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+        start = time.perf_counter()
+        status = {"code": 500}
+
+        async def send_wrapper(message):
+            if message["type"] == "http.response.start":
+                status["code"] = message["status"]
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            total_ms = (time.perf_counter() - start) * 1000
+            if self.access_logger.sampled(status["code"], total_ms):
+                state = scope.get("state") or {}
+                client = scope.get("client")
+                self.access_logger.log(
+                    {
+                        "ts": datetime.now(timezone.utc).isoformat(),
+                        "method": scope["method"],
+                        "path": scope["path"],
+                        "status": status["code"],
+                        "total_ms": round(total_ms, 2),
+                        "service": state.get("upstream_service"),
+                        "upstream_status": state.get("upstream_status"),
+                        "upstream_ms": state.get("upstream_ms"),
+                        "cache": state.get("cache"),
+                        "coalesced": state.get("coalesced", False),
+                        "client": client[0] if client else None,
+                        "sample_rate": self.access_logger.sample_rate,
+                    }
+                )
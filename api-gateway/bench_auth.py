@@ -0,0 +1,112 @@
+"""Micro-benchmark of the gateway per-request auth overhead.
+
+Compares the previous approach (linear scan of PUBLIC_ROUTES + full
+jwt.decode on every request) with the precompiled route trie and the
+verified-token cache used by main.py.
+
+Uso:
+    python bench_auth.py [iteraciones]
+"""
+
+import sys
+import time
+import timeit
+
+from jose import jwt
+
+from security import PublicRouteMatcher, TokenCache
+
+SECRET_KEY = "bench-secret"
+ALGORITHM = "HS256"
+PUBLIC_ROUTES = "auth:login,auth:register,auth:health,restaurantes:*"
+PATHS = [
+    ("pedidos", "abc-123"),
+    ("auth", "me"),
+    ("repartidor", "r1/orders"),
+    ("restaurantes", "rest1/menu"),
+]
+
+
+def _legacy_patterns(raw):
+    patterns = []
+    for part in [p.strip() for p in raw.split(",") if p.strip()]:
+        if ":" not in part:
+            continue
+        svc, rp = part.split(":", 1)
+        patterns.append((svc, rp))
+    return patterns
+
+
+LEGACY_PATTERNS = _legacy_patterns(PUBLIC_ROUTES)
+
+
+def legacy_is_auth_exempt(service_name, path):
+    p = path.lstrip("/")
+    for svc, rp in LEGACY_PATTERNS:
+        if svc != service_name:
+            continue
+        if rp.endswith("*"):
+            if p.startswith(rp[:-1].lstrip("/")):
+                return True
+        else:
+            if p == rp.lstrip("/") or p.startswith(rp.lstrip("/")) and rp == "":
+                return True
+    return False
+
+
+def legacy_verify(token):
+    payload = jwt.decode(token, SECRET_KEY, algorithms=[ALGORITHM])
+    return {
+        "sub": payload.get("sub"),
+        "email": payload.get("email"),
+        "role": payload.get("role"),
+    }
+
+
+matcher = PublicRouteMatcher.from_string(PUBLIC_ROUTES)
+cache = TokenCache()
+
+
+def cached_verify(token):
+    claims = cache.get(token)
+    if claims is None:
+        payload = jwt.decode(token, SECRET_KEY, algorithms=[ALGORITHM])
+        claims = {
+            "sub": payload.get("sub"),
+            "email": payload.get("email"),
+            "role": payload.get("role"),
+        }
+        cache.put(token, claims, payload.get("exp"))
+    return claims
+
+
+def run(n):
+    token = jwt.encode(
+        {
+            "sub": "u1",
+            "email": "u1@example.com",
+            "role": "cliente",
+            "exp": int(time.time()) + 3600,
+        },
+        SECRET_KEY,
+        algorithm=ALGORITHM,
+    )
+
+    def before():
+        for svc, path in PATHS:
+            if not legacy_is_auth_exempt(svc, path):
+                legacy_verify(token)
+
+    def after():
+        for svc, path in PATHS:
+            if not matcher.is_public(svc, path):
+                cached_verify(token)
+
+    for name, fn in (("before", before), ("after", after)):
+        secs = timeit.timeit(fn, number=n)
+        per_req = secs / (n * len(PATHS)) * 1e6
+        print(f"{name:>6}: {per_req:8.2f} us/request ({n * len(PATHS)} requests)")
+
+
+if __name__ == "__main__":
+    run(int(sys.argv[1]) if len(sys.argv) > 1 else 5000)
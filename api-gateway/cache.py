@@ -0,0 +1,216 @@
+"""Response cache for the public, read-mostly restaurant catalog.
+
+Only ``GET`` on the listing (``restaurantes/``), a restaurant
+(``restaurantes/{id}``) and its menu (``restaurantes/{id}/menu``) are cached;
+sibling routes such as ``restaurantes/autocomplete`` are not restaurant ids
+and are passed through.
+Entries live for ``GATEWAY_CACHE_TTL`` seconds in an in-process LRU, or in
+Redis when ``GATEWAY_CACHE_REDIS_URL`` is set so every gateway replica shares
+them. Any write forwarded under ``restaurantes/{id}`` drops that restaurant's
+entries and the listing.
+
+Stock reservations made by pedidos go straight to restaurantes-service, so a
+cached menu may show a stale ``cantidad`` for up to the TTL; pedidos always
+re-checks stock itself.
+"""
+
+import base64
+import hashlib
+import json
+import re
+import time
+from collections import OrderedDict
+from dataclasses import dataclass
+from typing import List, Optional, Tuple
+
+try:
+    import redis.asyncio as aioredis
+except ImportError:  # redis is optional: only needed for the shared backend
+    aioredis = None
+
+
+@dataclass
+class CachedResponse:
+    status_code: int
+    headers: List[Tuple[bytes, bytes]]
+    body: bytes
+    etag: str
+
+    def to_json(self) -> str:
+        return json.dumps(
+            {
+                "s": self.status_code,
+                "h": [
+                    [k.decode("latin-1"), v.decode("latin-1")] for k, v in self.headers
+                ],
+                "b": base64.b64encode(self.body).decode("ascii"),
+                "e": self.etag,
+            }
+        )
+
+    @classmethod
+    def from_json(cls, raw) -> "CachedResponse":
+        d = json.loads(raw)
+        return cls(
+            status_code=d["s"],
+            headers=[(k.encode("latin-1"), v.encode("latin-1")) for k, v in d["h"]],
+            body=base64.b64decode(d["b"]),
+            etag=d["e"],
+        )
+
+
+def make_etag(body: bytes) -> str:
+    return '"' + hashlib.blake2b(body, digest_size=16).hexdigest() + '"'
+
+
+def etag_matches(if_none_match: Optional[str], etag: str) -> bool:
+    if not if_none_match:
+        return False
+    if if_none_match.strip() == "*":
+        return True
+    # weak comparison, as required for If-None-Match
+    tags = [t.strip().removeprefix("W/") for t in if_none_match.split(",")]
+    return etag.removeprefix("W/") in tags
+
+
+class MemoryBackend:
+    """In-process LRU with per-entry expiry."""
+
+    def __init__(self, max_entries: int = 1000):
+        self.max_entries = max_entries
+        self._entries: "OrderedDict[str, tuple]" = OrderedDict()
+
+    async def get(self, key: str) -> Optional[CachedResponse]:
+        entry = self._entries.get(key)
+        if entry is None:
+            return None
+        expires_at, value = entry
+        if expires_at <= time.monotonic():
+            self._entries.pop(key, None)
+            return None
+        self._entries.move_to_end(key)
+        return value
+
+    async def set(self, key: str, value: CachedResponse, ttl: float) -> None:
+        self._entries[key] = (time.monotonic() + ttl, value)
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+
+    async def invalidate_prefix(self, prefix: str) -> None:
+        for key in [k for k in self._entries if k.startswith(prefix)]:
+            self._entries.pop(key, None)
+
+    async def close(self) -> None:
+        self._entries.clear()
+
+
+_GLOB_SPECIAL = re.compile(r"([*?\[\]\\])")
+
+
+class RedisBackend:
+    """Shared backend; Redis handles expiry (and LRU with maxmemory-policy)."""
+
+    def __init__(self, url: str, namespace: str = "gwcache:"):
+        if aioredis is None:
+            raise RuntimeError("redis package is required for GATEWAY_CACHE_REDIS_URL")
+        self.namespace = namespace
+        self._client = aioredis.from_url(url)
+
+    async def get(self, key: str) -> Optional[CachedResponse]:
+        try:
+            raw = await self._client.get(self.namespace + key)
+        except Exception:
+            # cache outages must never fail the request
+            return None
+        return CachedResponse.from_json(raw) if raw else None
+
+    async def set(self, key: str, value: CachedResponse, ttl: float) -> None:
+        try:
+            await self._client.set(
+                self.namespace + key, value.to_json(), px=max(1, int(ttl * 1000))
+            )
+        except Exception:
+            pass
+
+    async def invalidate_prefix(self, prefix: str) -> None:
+        pattern = _GLOB_SPECIAL.sub(r"\\\1", self.namespace + prefix) + "*"
+        try:
+            keys = [k async for k in self._client.scan_iter(match=pattern, count=500)]
+            if keys:
+                await self._client.delete(*keys)
+        except Exception:
+            pass
+
+    async def close(self) -> None:
+        try:
+            await self._client.aclose()
+        except Exception:
+            pass
+
+
+class ResponseCache:
+    """Decides what is cacheable and how writes invalidate it."""
+
+    SERVICE = "restaurantes"
+    # first path segments that are routes of their own, not restaurant ids;
+    # their entries would sit under a fake id that no write ever invalidates
+    NON_ID_SEGMENTS = frozenset({"autocomplete", "by-user"})
+
+    def __init__(self, backend, ttl: float = 10.0, max_body: int = 1024 * 1024):
+        self.backend = backend
+        self.ttl = ttl
+        self.max_body = max_body
+
+    @staticmethod
+    def _segments(path: str) -> List[str]:
+        return [s for s in path.strip("/").split("/") if s]
+
+    def key_for(self, service_name: str, path: str, query: str) -> Optional[str]:
+        """Cache key for a catalog GET, or ``None`` if the route is not cached."""
+        if service_name != self.SERVICE:
+            return None
+        segs = self._segments(path)
+        if len(segs) > 2 or (len(segs) == 2 and segs[1] != "menu"):
+            return None
+        if segs and segs[0] in self.NON_ID_SEGMENTS:
+            return None
+        # key layout "<service>|<restaurant id>|<rest of path>?<query>" so a
+        # restaurant's entries share the "<service>|<id>|" prefix
+        rest_id = segs[0] if segs else ""
+        sub = segs[1] if len(segs) == 2 else ""
+        return f"{service_name}|{rest_id}|{sub}?{query}"
+
+    def invalidation_prefixes(self, service_name: str, path: str) -> List[str]:
+        if service_name != self.SERVICE:
+            return []
+        segs = self._segments(path)
+        # the listing embeds restaurant fields, so any write invalidates it
+        prefixes = [f"{service_name}||"]
+        if segs:
+            prefixes.append(f"{service_name}|{segs[0]}|")
+        return prefixes
+
+    def storable(self, status_code: int, headers, body: bytes) -> bool:
+        if status_code != 200 or len(body) > self.max_body:
+            return False
+        for k, v in headers:
+            name = k.lower()
+            if name == b"set-cookie":
+                return False
+            if name == b"cache-control" and (b"no-store" in v or b"private" in v):
+                return False
+        return True
+
+    async def get(self, key: str) -> Optional[CachedResponse]:
+        return await self.backend.get(key)
+
+    async def store(self, key: str, value: CachedResponse) -> None:
+        await self.backend.set(key, value, self.ttl)
+
+    async def invalidate(self, service_name: str, path: str) -> None:
+        for prefix in self.invalidation_prefixes(service_name, path):
+            await self.backend.invalidate_prefix(prefix)
+
+    async def close(self) -> None:
+        await self.backend.close()
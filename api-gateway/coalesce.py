@@ -0,0 +1,66 @@
+"""Single-flight coalescing of identical concurrent upstream GETs.
+
+The first request for a key becomes the leader and performs the upstream
+call; requests arriving with the same key while it is in flight wait for
+the leader's buffered response instead of making their own call. If the
+leader cannot share its response (too large, streamed, cancelled) it
+resolves with ``None`` and each waiter falls back to its own upstream call.
+"""
+
+import asyncio
+from typing import Dict, Optional
+
+
+class SingleFlight:
+    def __init__(self):
+        self._inflight: Dict[str, asyncio.Future] = {}
+        self.leaders = 0
+        self.followers = 0
+        # followers that had to make their own call after all
+        self.fallbacks = 0
+
+    def join(self, key: str) -> Optional[asyncio.Future]:
+        """Return the in-flight future for ``key``, or ``None`` if the caller
+        is now the leader and must call :meth:`resolve` or :meth:`fail`."""
+        fut = self._inflight.get(key)
+        if fut is not None:
+            self.followers += 1
+            return fut
+        self._inflight[key] = asyncio.get_running_loop().create_future()
+        self.leaders += 1
+        return None
+
+    def resolve(self, key: str, value) -> None:
+        fut = self._inflight.pop(key, None)
+        if fut is not None and not fut.done():
+            fut.set_result(value)
+
+    def fail(self, key: str, exc: BaseException) -> None:
+        if isinstance(exc, asyncio.CancelledError):
+            # the leader's client went away; waiters still want an answer
+            self.resolve(key, None)
+            return
+        fut = self._inflight.pop(key, None)
+        if fut is not None and not fut.done():
+            fut.set_exception(exc)
+            # mark retrieved: with no waiters asyncio would log it as lost
+            fut.exception()
+
+    async def wait(self, fut: asyncio.Future):
+        # shield: a cancelled waiter must not cancel the shared future
+        value = await asyncio.shield(fut)
+        if value is None:
+            self.fallbacks += 1
+        return value
+
+    def stats(self) -> dict:
+        total = self.leaders + self.followers
+        shared = self.followers - self.fallbacks
+        return {
+            "in_flight": len(self._inflight),
+            "leaders": self.leaders,
+            "followers": self.followers,
+            "fallbacks": self.fallbacks,
+            # share of GETs answered without their own upstream call
+            "coalescing_ratio": round(shared / total, 4) if total else 0.0,
+        }
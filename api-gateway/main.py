@@ -1,10 +1,39 @@
 from fastapi import FastAPI, APIRouter, Request, HTTPException
-from fastapi.responses import JSONResponse
+from fastapi.responses import Response, StreamingResponse
+from starlette.background import BackgroundTask
 from jose import JWTError, jwt
 import os
 from fastapi.middleware.cors import CORSMiddleware
-import requests
+import httpx
 import logging
+import math
+import time
+from typing import Optional
+
+from access_log import AccessLogger, AccessLogMiddleware
+from cache import (
+    CachedResponse,
+    MemoryBackend,
+    RedisBackend,
+    ResponseCache,
+    etag_matches,
+    make_etag,
+)
+from coalesce import SingleFlight
+from common.metrics import instrument_app, observe_upstream
+from ratelimit import MemoryBackend as RateLimitMemoryBackend
+from ratelimit import Quota, RateLimiter, TrustedProxies, parse_rules
+from ratelimit import RedisBackend as RateLimitRedisBackend
+from resilience import FAILURE_STATUSES, ServiceUnavailable, guards_from_env
+from routing import (
+    FORWARD_METHODS,
+    SAFE_METHODS,
+    RouteTable,
+    request_headers,
+    response_headers,
+)
+from security import PublicRouteMatcher, TokenCache
+from upstream import CONNECT_TIMEOUT, POOL_TIMEOUT, WRITE_TIMEOUT, UpstreamPool
 
 # Define la instancia de la aplicación FastAPI.
 app = FastAPI(title="API Gateway Taller Microservicios")
@@ -25,6 +54,16 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
+# Access log estructurado (JSON lines) con muestreo, escrito en segundo plano.
+access_logger = AccessLogger(
+    sample_rate=float(os.getenv("GATEWAY_ACCESS_LOG_SAMPLE", "1.0")),
+    slow_ms=float(os.getenv("GATEWAY_ACCESS_LOG_SLOW_MS", "1000")),
+)
+app.add_middleware(AccessLogMiddleware, access_logger=access_logger)
+
+# Métricas Prometheus (GET /metrics): peticiones, latencias y llamadas a servicios.
+instrument_app(app, service="api-gateway")
+
 # Crea un enrutador para las peticiones de los microservicios.
 router = APIRouter(prefix="/api/v1")
 
@@ -39,294 +78,401 @@ SERVICES = {
     "repartidores": os.getenv("REPARTIDORES_URL", "http://repartidores-service:8004"),
 }
 
+# Tabla de rutas: prefijo de URL de cada servicio calculado una sola vez.
+routes = RouteTable(SERVICES)
+
+# Pool de clientes HTTP asíncronos (uno por servicio, con keep-alive).
+upstream = UpstreamPool(SERVICES)
+
+
+@app.on_event("startup")
+async def startup_upstream_clients():
+    await upstream.startup()
+    access_logger.start()
+
+
+# Circuit breaker, timeout adaptativo y bulkhead por servicio.
+guards = guards_from_env(SERVICES, os.getenv)
+
+# Coalescing de GETs idénticos concurrentes (una sola llamada al servicio).
+coalescer = (
+    SingleFlight() if os.getenv("GATEWAY_COALESCE_ENABLED", "1") == "1" else None
+)
+COALESCE_MAX_BODY = int(os.getenv("GATEWAY_COALESCE_MAX_BODY", str(1024 * 1024)))
+
+# Caché de respuestas del catálogo público (memoria o Redis compartido).
+response_cache = None
+if os.getenv("GATEWAY_CACHE_ENABLED", "1") == "1":
+    _cache_redis_url = os.getenv("GATEWAY_CACHE_REDIS_URL")
+    response_cache = ResponseCache(
+        RedisBackend(_cache_redis_url)
+        if _cache_redis_url
+        else MemoryBackend(int(os.getenv("GATEWAY_CACHE_MAX_ENTRIES", "1000"))),
+        ttl=float(os.getenv("GATEWAY_CACHE_TTL", "10")),
+        max_body=int(os.getenv("GATEWAY_CACHE_MAX_BODY", str(1024 * 1024))),
+    )
+
+# Rate limiting con token buckets por usuario (sub) o IP, con cuotas por ruta.
+rate_limiter = None
+if os.getenv("GATEWAY_RATE_LIMIT_ENABLED", "1") == "1":
+    _rate_redis_url = os.getenv("GATEWAY_RATE_LIMIT_REDIS_URL")
+    _rate_default = os.getenv("GATEWAY_RATE_LIMIT_DEFAULT", "300/60")
+    rate_limiter = RateLimiter(
+        RateLimitRedisBackend(_rate_redis_url)
+        if _rate_redis_url
+        else RateLimitMemoryBackend(
+            int(os.getenv("GATEWAY_RATE_LIMIT_MAX_KEYS", "100000"))
+        ),
+        default=Quota.parse(_rate_default) if _rate_default else None,
+        rules=parse_rules(
+            os.getenv("GATEWAY_RATE_LIMITS", "POST pedidos=20/60,POST auth/login=10/60")
+        ),
+    )
+# X-Forwarded-For solo se cree si la petición viene de GATEWAY_TRUSTED_PROXIES
+# (IPs, CIDRs o nombres como "frontend"); sin lista, de cualquier origen.
+TRUST_FORWARDED_FOR = os.getenv("GATEWAY_TRUST_FORWARDED_FOR", "0") == "1"
+trusted_proxies = TrustedProxies.parse(os.getenv("GATEWAY_TRUSTED_PROXIES", ""))
+if TRUST_FORWARDED_FOR and not trusted_proxies:
+    trusted_proxies = TrustedProxies(["*"])
+
+
+@app.on_event("shutdown")
+async def shutdown_upstream_clients():
+    await upstream.shutdown()
+    access_logger.stop()
+    if response_cache is not None:
+        await response_cache.close()
+    if rate_limiter is not None:
+        await rate_limiter.close()
+
+
 # JWT settings (will pick from env, use .env via docker-compose)
 SECRET_KEY = os.getenv("JWT_SECRET", "change-me-in-production")
 ALGORITHM = os.getenv("JWT_ALGORITHM", "HS256")
 
 
+# Public routes are compiled once at startup into a prefix trie per service.
+# By default allow auth endpoints and restaurantes public listing/menu.
+public_routes = PublicRouteMatcher.from_string(
+    os.getenv("PUBLIC_ROUTES", "auth:login,auth:register,auth:health,restaurantes:*")
+)
+
+# Verified token claims are cached until the token's exp (bounded LRU).
+token_cache = TokenCache(
+    maxsize=int(os.getenv("GATEWAY_TOKEN_CACHE_SIZE", "10000")),
+    max_ttl=float(os.getenv("GATEWAY_TOKEN_CACHE_TTL", "300")),
+)
+
+
 def _is_auth_exempt(service_name: str, path: str) -> bool:
-    # allow public auth endpoints
-    # First, keep legacy default for auth service (if PUBLIC_ROUTES not set)
-    p = path.lstrip("/")
-    # Load configured public routes from env (cached per process)
-    if not hasattr(_is_auth_exempt, "_public_patterns"):
-        # by default allow auth endpoints and restaurantes public listing/menu
-        raw = os.getenv(
-            "PUBLIC_ROUTES", "auth:login,auth:register,auth:health,restaurantes:*"
-        )
-        patterns = []
-        for part in [p.strip() for p in raw.split(",") if p.strip()]:
-            # expected format service:route or service:route*
-            if ":" not in part:
-                continue
-            svc, rp = part.split(":", 1)
-            patterns.append((svc, rp))
-        _is_auth_exempt._public_patterns = patterns
-
-    for svc, rp in _is_auth_exempt._public_patterns:
-        if svc != service_name:
-            continue
-        # exact match or wildcard suffix
-        if rp.endswith("*"):
-            prefix = rp[:-1].lstrip("/")
-            if p.startswith(prefix):
-                return True
-        else:
-            if p == rp.lstrip("/") or p.startswith(rp.lstrip("/")) and rp == "":
-                return True
-    return False
-
-
-def _verify_token_from_request(request: Request):
+    return public_routes.is_public(service_name, path)
+
+
+async def _verify_token_from_request(request: Request, service_name: str, path: str):
     auth = request.headers.get("authorization") or request.headers.get("Authorization")
     if not auth or not auth.lower().startswith("bearer "):
         raise HTTPException(status_code=401, detail="Missing Authorization header")
     token = auth.split(None, 1)[1]
+    claims = token_cache.get(token)
+    if claims is not None:
+        return claims
+    # tokens not verified yet are paid for by the client IP before decoding,
+    # so a flood of garbage tokens is limited like anonymous traffic
+    if rate_limiter is not None:
+        await _enforce_rate_limit(service_name, path, request, None)
     try:
         payload = jwt.decode(token, SECRET_KEY, algorithms=[ALGORITHM])
     except JWTError:
         raise HTTPException(status_code=401, detail="Invalid token")
     # extract commonly used claims
-    return {
+    claims = {
         "sub": payload.get("sub"),
         "email": payload.get("email"),
         "role": payload.get("role"),
     }
+    token_cache.put(token, claims, payload.get("exp"))
+    return claims
+
 
+async def _client_ip(request: Request) -> str:
+    peer = request.client.host if request.client else "unknown"
+    if not TRUST_FORWARDED_FOR:
+        return peer
+    return await trusted_proxies.client_ip(peer, request.headers.get("x-forwarded-for"))
 
-# TODO: Implementa una ruta genérica para redirigir peticiones GET.
-@router.get("/{service_name}/{path:path}")
-async def forward_get(service_name: str, path: str, request: Request):
-    if service_name not in SERVICES:
+
+async def _enforce_rate_limit(
+    service_name: str, path: str, request: Request, user: Optional[dict]
+) -> None:
+    # authenticated callers get their own bucket, so users behind one NAT
+    # do not share it; anonymous traffic is limited per client IP
+    if user and user.get("sub"):
+        identity = f"user:{user['sub']}"
+    else:
+        identity = f"ip:{await _client_ip(request)}"
+    retry_after = await rate_limiter.check(request.method, service_name, path, identity)
+    if retry_after is not None:
         raise HTTPException(
-            status_code=404, detail=f"Service '{service_name}' not found."
+            status_code=429,
+            detail="Too many requests",
+            headers={"Retry-After": str(retry_after)},
         )
-    # Build target URL including the service's own API prefix so that
-    # gateway /api/v1/restaurantes/... maps to restaurantes-service:/api/v1/restaurantes/...
-    base = SERVICES[service_name].rstrip("/")
-    # Special-case the auth service: its endpoints are mounted at root (e.g. /login)
-    # so we must not prepend /api/v1/auth when forwarding. Other services keep
-    # their own /api/v1/{service} prefix to preserve internal routing.
-    if service_name == "auth":
-        if path:
-            service_url = f"{base}/{path}"
-        else:
-            service_url = f"{base}/"
-    else:
-        svc_prefix = f"/api/v1/{service_name}"
-        if path:
-            service_url = f"{base}{svc_prefix}/{path}"
-        else:
-            service_url = f"{base}{svc_prefix}"
 
-    # Validate token unless endpoint is exempt (e.g. auth/login, auth/register, auth/health)
-    headers = {k: v for k, v in request.headers.items()}
-    if not _is_auth_exempt(service_name, path):
-        user = _verify_token_from_request(request)
-        # add user headers for downstream services
-        headers["X-User-Id"] = str(user.get("sub"))
-        if user.get("email"):
-            headers["X-User-Email"] = str(user.get("email"))
-        if user.get("role"):
-            headers["X-User-Role"] = str(user.get("role"))
 
+def _build_upstream_request(
+    client: httpx.AsyncClient, method: str, service_url: str, request: Request, headers
+) -> httpx.Request:
+    content = None
+    if "content-length" in request.headers or "transfer-encoding" in request.headers:
+        content = request.stream()
+    query = request.url.query
+    return client.build_request(
+        method,
+        f"{service_url}?{query}" if query else service_url,
+        headers=headers,
+        content=content,
+    )
+
+
+async def _send_upstream(
+    service_name: str, method: str, service_url: str, request: Request, headers
+) -> httpx.Response:
+    client = upstream.client(service_name)
+    upstream_request = _build_upstream_request(
+        client, method, service_url, request, headers
+    )
+    guard = guards[service_name]
     try:
-        # print instead of logger to ensure messages appear in container stdout
-        print(
-            f"[GATEWAY] Forwarding GET to {service_url} query={dict(request.query_params)} headers={list(headers.keys())}"
-        )
-        response = requests.get(
-            service_url, params=request.query_params, headers=headers, timeout=10
+        await guard.acquire()
+    except ServiceUnavailable as e:
+        # fail fast instead of queueing behind an unhealthy service
+        raise HTTPException(
+            status_code=503,
+            detail=f"Service '{service_name}' unavailable: {e.reason}",
+            headers={"Retry-After": str(max(1, math.ceil(e.retry_after)))},
         )
-        # Forward the downstream status code and body transparently.
-        try:
-            print(
-                f"[GATEWAY] Downstream {service_name} responded {response.status_code}"
-            )
-            return JSONResponse(
-                status_code=response.status_code, content=response.json()
-            )
-        except ValueError:
-            print(f"[GATEWAY] Downstream returned non-json body: {response.text[:200]}")
-            return JSONResponse(
-                status_code=response.status_code, content={"detail": response.text}
-            )
-    except requests.exceptions.RequestException as e:
+    # the read timeout follows the service's observed p99 latency
+    read_timeout = guard.latency.timeout()
+    upstream_request.extensions["timeout"] = httpx.Timeout(
+        connect=CONNECT_TIMEOUT,
+        read=read_timeout,
+        write=WRITE_TIMEOUT,
+        pool=POOL_TIMEOUT,
+    ).as_dict()
+    start = time.perf_counter()
+    try:
+        response = await client.send(upstream_request, stream=True)
+    except httpx.HTTPError as e:
+        if isinstance(e, httpx.ReadTimeout):
+            # counted at the cut-off so the timeout can grow with a slow service
+            guard.latency.observe(read_timeout)
+        guard.breaker.record_failure()
         # Network/connection errors should still map to 500 from the gateway.
         raise HTTPException(
             status_code=500, detail=f"Error forwarding request to {service_name}: {e}"
         )
-
-
-# TODO: Implementa una ruta genérica para redirigir peticiones POST.
-@router.post("/{service_name}/{path:path}")
-async def forward_post(service_name: str, path: str, request: Request):
-    if service_name not in SERVICES:
-        raise HTTPException(
-            status_code=404, detail=f"Service '{service_name}' not found."
-        )
-    # Build target URL including the service's own API prefix so that
-    # gateway /api/v1/restaurantes/... maps to restaurantes-service:/api/v1/restaurantes/...
-    base = SERVICES[service_name].rstrip("/")
-    # Mirror same auth special-case for POST routing.
-    if service_name == "auth":
-        if path:
-            service_url = f"{base}/{path}"
-        else:
-            service_url = f"{base}/"
+    except BaseException:
+        # cancelled by the client: says nothing about the service health
+        guard.breaker.cancel_probe()
+        raise
+    finally:
+        # the bulkhead bounds calls waiting on the service, i.e. until headers
+        guard.release()
+    elapsed = time.perf_counter() - start
+    guard.latency.observe(elapsed)
+    observe_upstream("api-gateway", service_name, elapsed, response.status_code)
+    if response.status_code in FAILURE_STATUSES:
+        guard.breaker.record_failure()
     else:
-        svc_prefix = f"/api/v1/{service_name}"
-        if path:
-            service_url = f"{base}{svc_prefix}/{path}"
-        else:
-            service_url = f"{base}{svc_prefix}"
-
-    headers = {k: v for k, v in request.headers.items()}
-    if not _is_auth_exempt(service_name, path):
-        user = _verify_token_from_request(request)
-        headers["X-User-Id"] = str(user.get("sub"))
-        if user.get("email"):
-            headers["X-User-Email"] = str(user.get("email"))
-        if user.get("role"):
-            headers["X-User-Role"] = str(user.get("role"))
-
+        guard.breaker.record_success()
+    # picked up by the access log middleware
+    request.state.upstream_service = service_name
+    request.state.upstream_status = response.status_code
+    request.state.upstream_ms = round(elapsed * 1000, 2)
+    return response
+
+
+def _stream_response(response: httpx.Response) -> StreamingResponse:
+    proxied = StreamingResponse(
+        response.aiter_raw(),
+        status_code=response.status_code,
+        background=BackgroundTask(response.aclose),
+    )
+    # raw list keeps repeated headers such as set-cookie intact
+    proxied.raw_headers = response_headers(response.headers.raw)
+    return proxied
+
+
+async def _proxy_stream(
+    service_name: str, method: str, service_url: str, request: Request, headers
+):
+    """Forward the request and stream the upstream response back unchanged.
+
+    Status, headers and body bytes are relayed chunk by chunk: the body is
+    never decoded, so JSON, images and compressed payloads pass through as-is
+    and memory use does not grow with the response size.
+    """
+    response = await _send_upstream(service_name, method, service_url, request, headers)
+    return _stream_response(response)
+
+
+async def _read_buffered(service_name: str, response: httpx.Response) -> CachedResponse:
+    """Read the whole (still encoded) upstream body."""
     try:
-        # Pasa los datos JSON del cuerpo de la petición.
-        body = None
-        try:
-            body = await request.json()
-        except Exception:
-            body = None
-        print(
-            f"[GATEWAY] Forwarding POST to {service_url} body_keys={list(body.keys()) if isinstance(body, dict) else 'raw'} headers={list(headers.keys())}"
-        )
-        response = requests.post(service_url, json=body, headers=headers, timeout=10)
-        # Forward downstream status and body transparently.
-        try:
-            print(
-                f"[GATEWAY] Downstream {service_name} responded {response.status_code}"
-            )
-            return JSONResponse(
-                status_code=response.status_code, content=response.json()
-            )
-        except ValueError:
-            print(f"[GATEWAY] Downstream returned non-json body: {response.text[:200]}")
-            return JSONResponse(
-                status_code=response.status_code, content={"detail": response.text}
-            )
-    except requests.exceptions.RequestException as e:
+        body = b"".join([chunk async for chunk in response.aiter_raw()])
+    except httpx.HTTPError as e:
         raise HTTPException(
             status_code=500, detail=f"Error forwarding request to {service_name}: {e}"
         )
-
-
-@router.put("/{service_name}/{path:path}")
-async def forward_put(service_name: str, path: str, request: Request):
-    if service_name not in SERVICES:
-        raise HTTPException(
-            status_code=404, detail=f"Service '{service_name}' not found."
+    finally:
+        await response.aclose()
+    raw = response_headers(response.headers.raw)
+    etag = response.headers.get("etag") or make_etag(body)
+    if "etag" not in response.headers:
+        raw.append((b"etag", etag.encode("latin-1")))
+    return CachedResponse(response.status_code, raw, body, etag)
+
+
+def _buffered_response(
+    entry: CachedResponse, request: Request, cache_status: Optional[bytes] = None
+):
+    if entry.status_code == 200 and etag_matches(
+        request.headers.get("if-none-match"), entry.etag
+    ):
+        resp = Response(status_code=304)
+        resp.raw_headers = [(b"etag", entry.etag.encode("latin-1"))]
+    else:
+        resp = Response(content=entry.body, status_code=entry.status_code)
+        resp.raw_headers = list(entry.headers)
+    if cache_status:
+        resp.raw_headers.append((b"x-cache", cache_status))
+    return resp
+
+
+def _coalesce_key(service_url: str, request: Request, user: Optional[dict]) -> str:
+    # responses may depend on the caller identity and on content negotiation
+    claims = f"{user.get('sub')}|{user.get('role')}" if user else "-"
+    return "|".join(
+        (
+            service_url,
+            request.url.query,
+            claims,
+            request.headers.get("accept", ""),
+            request.headers.get("accept-encoding", ""),
         )
+    )
 
-    base = SERVICES[service_name].rstrip("/")
-    if service_name == "auth":
-        if path:
-            service_url = f"{base}/{path}"
-        else:
-            service_url = f"{base}/"
-    else:
-        svc_prefix = f"/api/v1/{service_name}"
-        if path:
-            service_url = f"{base}{svc_prefix}/{path}"
-        else:
-            service_url = f"{base}{svc_prefix}"
-
-    headers = {k: v for k, v in request.headers.items()}
-    if not _is_auth_exempt(service_name, path):
-        user = _verify_token_from_request(request)
-        headers["X-User-Id"] = str(user.get("sub"))
-        if user.get("email"):
-            headers["X-User-Email"] = str(user.get("email"))
-        if user.get("role"):
-            headers["X-User-Role"] = str(user.get("role"))
 
+def _shareable(response: httpx.Response) -> bool:
+    # only bodies of known, bounded size are buffered for the waiters
     try:
-        body = None
-        try:
-            body = await request.json()
-        except Exception:
-            body = None
-        print(
-            f"[GATEWAY] Forwarding PUT to {service_url} body_keys={list(body.keys()) if isinstance(body, dict) else 'raw'} headers={list(headers.keys())}"
-        )
-        response = requests.put(service_url, json=body, headers=headers, timeout=10)
-        try:
-            print(
-                f"[GATEWAY] Downstream {service_name} responded {response.status_code}"
-            )
-            return JSONResponse(
-                status_code=response.status_code, content=response.json()
-            )
-        except ValueError:
-            print(f"[GATEWAY] Downstream returned non-json body: {response.text[:200]}")
-            return JSONResponse(
-                status_code=response.status_code, content={"detail": response.text}
-            )
-    except requests.exceptions.RequestException as e:
-        raise HTTPException(
-            status_code=500, detail=f"Error forwarding request to {service_name}: {e}"
+        length = int(response.headers.get("content-length", ""))
+    except ValueError:
+        return False
+    return length <= COALESCE_MAX_BODY
+
+
+async def _fetch_get(
+    key: Optional[str], service_name: str, service_url: str, request: Request, headers
+):
+    """GET through the single-flight layer.
+
+    Returns a ``CachedResponse`` when the body was buffered (and possibly
+    shared with concurrent identical GETs), or a ``StreamingResponse`` when it
+    was too large to share. ``key=None`` skips coalescing.
+    """
+    # conditionals are answered by the gateway from the buffered body
+    headers = [(k, v) for k, v in headers if k.lower() != b"if-none-match"]
+    if key is not None and coalescer is not None:
+        waiting = coalescer.join(key)
+        if waiting is not None:
+            entry = await coalescer.wait(waiting)
+            if entry is not None:
+                request.state.upstream_service = service_name
+                request.state.coalesced = True
+                return entry
+            # the leader could not share its response: make our own call
+            key = None
+    try:
+        response = await _send_upstream(
+            service_name, "GET", service_url, request, headers
         )
-
-
-@router.delete("/{service_name}/{path:path}")
-async def forward_delete(service_name: str, path: str, request: Request):
-    if service_name not in SERVICES:
+        if not _shareable(response):
+            if key is not None and coalescer is not None:
+                coalescer.resolve(key, None)
+            return _stream_response(response)
+        entry = await _read_buffered(service_name, response)
+    except BaseException as e:
+        if key is not None and coalescer is not None:
+            coalescer.fail(key, e)
+        raise
+    if key is not None and coalescer is not None:
+        coalescer.resolve(key, entry)
+    return entry
+
+
+async def _serve_cached(
+    key: str, service_name: str, service_url: str, request: Request, headers
+):
+    entry = await response_cache.get(key)
+    if entry is not None:
+        request.state.upstream_service = service_name
+        request.state.cache = "HIT"
+        return _buffered_response(entry, request, b"HIT")
+    request.state.cache = "MISS"
+    result = await _fetch_get(key, service_name, service_url, request, headers)
+    if not isinstance(result, CachedResponse):
+        return result
+    if response_cache.storable(result.status_code, result.headers, result.body):
+        await response_cache.store(key, result)
+    return _buffered_response(result, request, b"MISS")
+
+
+@router.api_route("/{service_name}/{path:path}", methods=FORWARD_METHODS)
+async def forward(service_name: str, path: str, request: Request):
+    """Single forwarder for every method: resolve, authenticate and stream."""
+    service_url = routes.resolve(service_name, path)
+    if service_url is None:
         raise HTTPException(
             status_code=404, detail=f"Service '{service_name}' not found."
         )
-
-    base = SERVICES[service_name].rstrip("/")
-    if service_name == "auth":
-        if path:
-            service_url = f"{base}/{path}"
-        else:
-            service_url = f"{base}/"
-    else:
-        svc_prefix = f"/api/v1/{service_name}"
-        if path:
-            service_url = f"{base}{svc_prefix}/{path}"
-        else:
-            service_url = f"{base}{svc_prefix}"
-
-    headers = {k: v for k, v in request.headers.items()}
+    # one latency series per upstream service instead of the catch-all template
+    request.scope["metrics_route"] = f"/api/v1/{service_name}"
+    # Validate token unless endpoint is exempt (e.g. auth/login, auth/register, auth/health)
+    user = None
     if not _is_auth_exempt(service_name, path):
-        user = _verify_token_from_request(request)
-        headers["X-User-Id"] = str(user.get("sub"))
-        if user.get("email"):
-            headers["X-User-Email"] = str(user.get("email"))
-        if user.get("role"):
-            headers["X-User-Role"] = str(user.get("role"))
-
-    try:
-        print(
-            f"[GATEWAY] Forwarding DELETE to {service_url} headers={list(headers.keys())}"
-        )
-        response = requests.delete(service_url, headers=headers, timeout=10)
-        try:
-            print(
-                f"[GATEWAY] Downstream {service_name} responded {response.status_code}"
+        user = await _verify_token_from_request(request, service_name, path)
+    # rejected before any cache lookup or upstream call
+    if rate_limiter is not None:
+        await _enforce_rate_limit(service_name, path, request, user)
+    headers = request_headers(request.headers.raw, user)
+    method = request.method
+
+    if method == "GET":
+        # only public (unauthenticated) catalog reads are cached
+        if response_cache is not None and user is None:
+            key = response_cache.key_for(service_name, path, request.url.query)
+            if key is not None:
+                return await _serve_cached(
+                    key, service_name, service_url, request, headers
+                )
+        # range requests (partial photo downloads) are never coalesced
+        if coalescer is not None and "range" not in request.headers:
+            result = await _fetch_get(
+                _coalesce_key(service_url, request, user),
+                service_name,
+                service_url,
+                request,
+                headers,
             )
-            return JSONResponse(
-                status_code=response.status_code, content=response.json()
-            )
-        except ValueError:
-            print(f"[GATEWAY] Downstream returned non-json body: {response.text[:200]}")
-            return JSONResponse(
-                status_code=response.status_code, content={"detail": response.text}
-            )
-    except requests.exceptions.RequestException as e:
-        raise HTTPException(
-            status_code=500, detail=f"Error forwarding request to {service_name}: {e}"
-        )
+            if isinstance(result, CachedResponse):
+                return _buffered_response(result, request)
+            return result
+
+    response = await _proxy_stream(service_name, method, service_url, request, headers)
+    if response_cache is not None and method not in SAFE_METHODS:
+        await response_cache.invalidate(service_name, path)
+    return response
 
 
 # Incluye el router en la aplicación principal.
@@ -337,3 +483,14 @@ app.include_router(router)
 @app.get("/health")
 def health_check():
     return {"status": "ok", "message": "API Gateway is running."}
+
+
+# Estadísticas internas del gateway (coalescing y salud de cada servicio).
+@app.get("/stats")
+def gateway_stats():
+    return {
+        "coalescing": coalescer.stats() if coalescer is not None else None,
+        "services": {name: g.stats() for name, g in guards.items()},
+        "access_log": {"dropped": access_logger.dropped},
+        "rate_limit": rate_limiter.stats() if rate_limiter is not None else None,
+    }
@@ -0,0 +1,285 @@
+"""Token-bucket rate limiting for the gateway.
+
+Each request takes one token from a bucket keyed on the caller: the verified
+``sub`` claim when the route is authenticated, the client IP otherwise. A
+bucket holds up to ``limit`` tokens and refills at ``limit / period`` tokens
+per second, so short bursts are allowed while the sustained rate is capped.
+
+Quotas come from ``GATEWAY_RATE_LIMITS``, a comma separated list of
+``[METHOD ]service[/path]=limit/seconds`` rules (e.g.
+``POST pedidos=10/60,POST auth/login=5/60``); the most specific matching
+rule wins and ``GATEWAY_RATE_LIMIT_DEFAULT`` applies to everything else.
+Buckets live in process memory, or in Redis (``GATEWAY_RATE_LIMIT_REDIS_URL``)
+where a Lua script refills and takes the token atomically so every gateway
+replica shares the same budget.
+
+Callers that reach the gateway through another service (the frontend renders
+pages server-side) all share that service's address. :class:`TrustedProxies`
+lists the peers whose ``X-Forwarded-For`` is believed, so each end user gets
+a bucket of its own; the header of any other peer is ignored, as a client
+talking to the gateway directly could put anything in it.
+"""
+
+import asyncio
+import ipaddress
+import math
+import socket
+import time
+from collections import OrderedDict
+from dataclasses import dataclass
+from typing import List, Optional, Set, Tuple
+
+try:
+    import redis.asyncio as aioredis
+except ImportError:  # redis is optional: only needed for the shared backend
+    aioredis = None
+
+
+class TrustedProxies:
+    """Peers allowed to set ``X-Forwarded-For``: IPs, CIDRs or host names.
+
+    Host names (e.g. the ``frontend`` compose service) are resolved off the
+    event loop and cached for ``resolve_ttl`` seconds, since container
+    addresses change on restart. ``*`` trusts every peer.
+    """
+
+    def __init__(self, entries: List[str], resolve_ttl: float = 30.0):
+        self.any = "*" in entries
+        self.networks = []
+        self.hosts = []
+        for entry in entries:
+            if entry == "*":
+                continue
+            try:
+                self.networks.append(ipaddress.ip_network(entry, strict=False))
+            except ValueError:
+                self.hosts.append(entry)
+        self.resolve_ttl = resolve_ttl
+        self._resolved: Set[str] = set()
+        self._resolved_at = -math.inf
+
+    @classmethod
+    def parse(cls, raw: str) -> "TrustedProxies":
+        return cls([e.strip() for e in (raw or "").split(",") if e.strip()])
+
+    def __bool__(self) -> bool:
+        return self.any or bool(self.networks or self.hosts)
+
+    async def _host_addresses(self) -> Set[str]:
+        if self.hosts and time.monotonic() - self._resolved_at >= self.resolve_ttl:
+            self._resolved = await asyncio.to_thread(_resolve, self.hosts)
+            self._resolved_at = time.monotonic()
+        return self._resolved
+
+    async def trusts(self, addr: str) -> bool:
+        if self.any:
+            return True
+        try:
+            ip = ipaddress.ip_address(addr)
+        except ValueError:
+            ip = None
+        if ip is not None and any(ip in net for net in self.networks):
+            return True
+        return addr in await self._host_addresses()
+
+    async def client_ip(self, peer: str, forwarded: Optional[str]) -> str:
+        """The caller's address: ``peer`` unless it is a trusted proxy, then
+        the right-most ``X-Forwarded-For`` hop that is not one (hops further
+        left were written by the client and could be forged)."""
+        if not forwarded or not await self.trusts(peer):
+            return peer
+        hops = [h.strip() for h in forwarded.split(",") if h.strip()]
+        for hop in reversed(hops):
+            if not await self.trusts(hop):
+                return hop
+        return hops[0] if hops else peer
+
+
+def _resolve(hosts: List[str]) -> Set[str]:
+    addresses = set()
+    for host in hosts:
+        try:
+            for info in socket.getaddrinfo(host, None):
+                addresses.add(info[4][0])
+        except OSError:
+            # not up yet (the frontend starts after the gateway): retry later
+            pass
+    return addresses
+
+
+@dataclass(frozen=True)
+class Quota:
+    limit: int
+    period: float
+
+    @property
+    def rate(self) -> float:
+        return self.limit / self.period
+
+    @classmethod
+    def parse(cls, raw: str) -> "Quota":
+        limit, _, period = raw.strip().partition("/")
+        quota = cls(int(limit), float(period or "1"))
+        if quota.limit <= 0 or quota.period <= 0:
+            raise ValueError(f"invalid rate limit quota: {raw!r}")
+        return quota
+
+
+@dataclass(frozen=True)
+class Rule:
+    method: str
+    service: str
+    prefix: str
+    quota: Quota
+
+    @property
+    def name(self) -> str:
+        return f"{self.method} {self.service}/{self.prefix}"
+
+    def matches(self, method: str, service: str, path: str) -> bool:
+        if self.method not in ("*", method) or self.service != service:
+            return False
+        if not self.prefix:
+            return True
+        # whole segments only: "auth/login" must not match "auth/login2"
+        return path == self.prefix or path.startswith(self.prefix + "/")
+
+
+def parse_rules(raw: str) -> List[Rule]:
+    rules = []
+    for item in (raw or "").split(","):
+        item = item.strip()
+        if not item:
+            continue
+        target, _, quota = item.rpartition("=")
+        if not target:
+            raise ValueError(f"invalid rate limit rule: {item!r}")
+        method, _, route = target.strip().rpartition(" ")
+        service, _, prefix = route.partition("/")
+        rules.append(
+            Rule(
+                method=(method.strip() or "*").upper(),
+                service=service,
+                prefix=prefix.strip("/"),
+                quota=Quota.parse(quota),
+            )
+        )
+    return rules
+
+
+class MemoryBackend:
+    """Per-process buckets, bounded by evicting the least recently used."""
+
+    def __init__(self, max_keys: int = 100000):
+        self.max_keys = max_keys
+        # key -> (tokens, last refill)
+        self._buckets: "OrderedDict[str, Tuple[float, float]]" = OrderedDict()
+
+    async def take(self, key: str, quota: Quota) -> Tuple[bool, float]:
+        """Take one token; return ``(allowed, seconds until a token is back)``."""
+        now = time.monotonic()
+        tokens, last = self._buckets.get(key, (float(quota.limit), now))
+        tokens = min(float(quota.limit), tokens + (now - last) * quota.rate)
+        allowed = tokens >= 1.0
+        if allowed:
+            tokens -= 1.0
+        self._buckets[key] = (tokens, now)
+        self._buckets.move_to_end(key)
+        while len(self._buckets) > self.max_keys:
+            self._buckets.popitem(last=False)
+        return allowed, 0.0 if allowed else (1.0 - tokens) / quota.rate
+
+    async def close(self) -> None:
+        self._buckets.clear()
+
+
+# Refill and take in one step, using the Redis clock so replicas agree.
+# KEYS[1] bucket; ARGV: limit, rate (tokens/s). Returns {allowed, tokens}.
+_TAKE_SCRIPT = """
+local limit = tonumber(ARGV[1])
+local rate = tonumber(ARGV[2])
+local t = redis.call('TIME')
+local now = tonumber(t[1]) + tonumber(t[2]) / 1000000
+local bucket = redis.call('HMGET', KEYS[1], 'tokens', 'ts')
+local tokens = tonumber(bucket[1]) or limit
+local ts = tonumber(bucket[2]) or now
+tokens = math.min(limit, tokens + math.max(0, now - ts) * rate)
+local allowed = 0
+if tokens >= 1 then
+  tokens = tokens - 1
+  allowed = 1
+end
+redis.call('HSET', KEYS[1], 'tokens', tostring(tokens), 'ts', tostring(now))
+redis.call('PEXPIRE', KEYS[1], math.ceil(limit / rate * 1000) + 1000)
+return {allowed, tostring(tokens)}
+"""
+
+
+class RedisBackend:
+    """Buckets shared by every gateway replica."""
+
+    def __init__(self, url: str, namespace: str = "gwrate:"):
+        if aioredis is None:
+            raise RuntimeError(
+                "redis package is required for GATEWAY_RATE_LIMIT_REDIS_URL"
+            )
+        self.namespace = namespace
+        self._client = aioredis.from_url(url)
+        self._take = self._client.register_script(_TAKE_SCRIPT)
+
+    async def take(self, key: str, quota: Quota) -> Tuple[bool, float]:
+        try:
+            allowed, tokens = await self._take(
+                keys=[self.namespace + key], args=[quota.limit, quota.rate]
+            )
+        except Exception:
+            # a limiter outage must not take the gateway down: fail open
+            return True, 0.0
+        if int(allowed):
+            return True, 0.0
+        return False, (1.0 - float(tokens)) / quota.rate
+
+    async def close(self) -> None:
+        try:
+            await self._client.aclose()
+        except Exception:
+            pass
+
+
+class RateLimiter:
+    def __init__(self, backend, default: Optional[Quota], rules: List[Rule]):
+        self.backend = backend
+        self.default = default
+        # most specific first: longer prefixes, then explicit methods
+        self.rules = sorted(
+            rules, key=lambda r: (len(r.prefix), r.method != "*"), reverse=True
+        )
+        self.rejected = 0
+
+    def quota_for(
+        self, method: str, service: str, path: str
+    ) -> Tuple[str, Optional[Quota]]:
+        path = path.strip("/")
+        for rule in self.rules:
+            if rule.matches(method, service, path):
+                return rule.name, rule.quota
+        return "*", self.default
+
+    async def check(
+        self, method: str, service: str, path: str, identity: str
+    ) -> Optional[int]:
+        """Return ``None`` if allowed, else the ``Retry-After`` in seconds."""
+        name, quota = self.quota_for(method, service, path)
+        if quota is None:
+            return None
+        allowed, wait = await self.backend.take(f"{name}|{identity}", quota)
+        if allowed:
+            return None
+        self.rejected += 1
+        return max(1, math.ceil(wait))
+
+    async def close(self) -> None:
+        await self.backend.close()
+
+    def stats(self) -> dict:
+        return {"rules": len(self.rules), "rejected": self.rejected}
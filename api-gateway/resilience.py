@@ -0,0 +1,196 @@
+"""Per-service circuit breaker, adaptive timeout and bulkhead.
+
+- Circuit breaker: after ``failure_threshold`` consecutive failures (network
+  errors, timeouts, 502/503/504) the service is *open* and calls fail fast
+  for ``reset_timeout`` seconds; then one probe is let through (*half-open*)
+  and its outcome closes or re-opens the circuit.
+- Adaptive timeout: the read timeout follows the observed p99 latency of the
+  service (times a multiplier, clamped to [min, max]).
+- Bulkhead: at most ``max_in_flight`` concurrent calls per service, so a slow
+  service cannot hold every gateway worker.
+"""
+
+import asyncio
+import math
+import time
+from collections import deque
+from typing import Dict, Optional
+
+CLOSED = "closed"
+OPEN = "open"
+HALF_OPEN = "half_open"
+
+# Upstream statuses that mean the service itself is unhealthy.
+FAILURE_STATUSES = frozenset((502, 503, 504))
+
+
+class ServiceUnavailable(Exception):
+    """Raised when a call is rejected without reaching the service."""
+
+    def __init__(self, reason: str, retry_after: float):
+        super().__init__(reason)
+        self.reason = reason
+        self.retry_after = retry_after
+
+
+class CircuitBreaker:
+    def __init__(self, failure_threshold: int = 5, reset_timeout: float = 10.0):
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.state = CLOSED
+        self.failures = 0
+        self.opened_at = 0.0
+        self._probe_in_flight = False
+
+    def retry_after(self) -> float:
+        return max(0.0, self.opened_at + self.reset_timeout - time.monotonic())
+
+    def allow(self) -> bool:
+        if self.state == CLOSED:
+            return True
+        if self.state == OPEN:
+            if self.retry_after() > 0:
+                return False
+            self.state = HALF_OPEN
+            self._probe_in_flight = False
+        # half-open: a single probe at a time
+        if self._probe_in_flight:
+            return False
+        self._probe_in_flight = True
+        return True
+
+    def cancel_probe(self) -> None:
+        # the probe was admitted but never reached the service
+        self._probe_in_flight = False
+
+    def record_success(self) -> None:
+        self.state = CLOSED
+        self.failures = 0
+        self._probe_in_flight = False
+
+    def record_failure(self) -> None:
+        self.failures += 1
+        if self.state == HALF_OPEN or self.failures >= self.failure_threshold:
+            self.state = OPEN
+            self.opened_at = time.monotonic()
+        self._probe_in_flight = False
+
+
+class LatencyTracker:
+    """Sliding window of recent latencies used to derive the read timeout.
+
+    The p99 is cached and only recomputed every ``recompute_every``
+    observations, so proxied requests do not sort the window each time.
+    """
+
+    def __init__(
+        self,
+        window: int = 200,
+        min_samples: int = 20,
+        multiplier: float = 3.0,
+        min_timeout: float = 1.0,
+        max_timeout: float = 10.0,
+        recompute_every: int = 20,
+    ):
+        self.samples = deque(maxlen=window)
+        self.min_samples = min_samples
+        self.multiplier = multiplier
+        self.min_timeout = min_timeout
+        self.max_timeout = max_timeout
+        self.recompute_every = recompute_every
+        self._p99: Optional[float] = None
+        self._unsorted = 0
+
+    def observe(self, seconds: float) -> None:
+        self.samples.append(seconds)
+        self._unsorted += 1
+
+    def p99(self) -> Optional[float]:
+        if not self.samples:
+            return None
+        if self._p99 is None or self._unsorted >= self.recompute_every:
+            ordered = sorted(self.samples)
+            self._p99 = ordered[
+                min(len(ordered) - 1, math.ceil(0.99 * len(ordered)) - 1)
+            ]
+            self._unsorted = 0
+        return self._p99
+
+    def timeout(self) -> float:
+        if len(self.samples) < self.min_samples:
+            return self.max_timeout
+        p99 = self.p99() or 0.0
+        return min(self.max_timeout, max(self.min_timeout, p99 * self.multiplier))
+
+
+class ServiceGuard:
+    """Breaker + latency tracker + bulkhead for one upstream service."""
+
+    def __init__(
+        self,
+        breaker: CircuitBreaker,
+        latency: LatencyTracker,
+        max_in_flight: int = 50,
+        bulkhead_wait: float = 0.0,
+    ):
+        self.breaker = breaker
+        self.latency = latency
+        self.max_in_flight = max_in_flight
+        self.bulkhead_wait = bulkhead_wait
+        self.in_flight = 0
+        self.rejected = 0
+        self._slots = asyncio.Semaphore(max_in_flight)
+
+    async def acquire(self) -> None:
+        if not self.breaker.allow():
+            self.rejected += 1
+            raise ServiceUnavailable("circuit open", self.breaker.retry_after())
+        try:
+            if self._slots.locked() and self.bulkhead_wait <= 0:
+                raise asyncio.TimeoutError
+            await asyncio.wait_for(self._slots.acquire(), self.bulkhead_wait or None)
+        except asyncio.TimeoutError:
+            self.breaker.cancel_probe()
+            self.rejected += 1
+            raise ServiceUnavailable("too many in-flight requests", 1.0)
+        self.in_flight += 1
+
+    def release(self) -> None:
+        self.in_flight -= 1
+        self._slots.release()
+
+    def stats(self) -> dict:
+        p99 = self.latency.p99()
+        return {
+            "state": self.breaker.state,
+            "consecutive_failures": self.breaker.failures,
+            "p99_ms": round(p99 * 1000, 1) if p99 is not None else None,
+            "timeout_s": round(self.latency.timeout(), 3),
+            "in_flight": self.in_flight,
+            "max_in_flight": self.max_in_flight,
+            "rejected": self.rejected,
+        }
+
+
+def guards_from_env(services, getenv) -> Dict[str, ServiceGuard]:
+    """Build one guard per service; ``GATEWAY_BULKHEAD_<SERVICE>`` overrides
+    the default in-flight limit for a single service."""
+    default_limit = int(getenv("GATEWAY_BULKHEAD_LIMIT", "50"))
+    guards = {}
+    for name in services:
+        guards[name] = ServiceGuard(
+            CircuitBreaker(
+                failure_threshold=int(getenv("GATEWAY_CB_FAILURES", "5")),
+                reset_timeout=float(getenv("GATEWAY_CB_RESET_TIMEOUT", "10")),
+            ),
+            LatencyTracker(
+                multiplier=float(getenv("GATEWAY_TIMEOUT_P99_MULTIPLIER", "3")),
+                min_timeout=float(getenv("GATEWAY_TIMEOUT_MIN", "1")),
+                max_timeout=float(getenv("GATEWAY_READ_TIMEOUT", "10")),
+            ),
+            max_in_flight=int(
+                getenv(f"GATEWAY_BULKHEAD_{name.upper()}", str(default_limit))
+            ),
+            bulkhead_wait=float(getenv("GATEWAY_BULKHEAD_WAIT", "0")),
+        )
+    return guards
@@ -0,0 +1,110 @@
+"""Route resolution for the gateway: service name + path -> upstream URL.
+
+The per-service URL prefix is computed once, so resolving a request is a
+dict lookup plus one string concatenation. Header filtering for both
+directions of the proxy lives here too.
+"""
+
+from typing import Dict, Iterable, List, Optional, Tuple
+
+# Methods the gateway forwards to the microservices.
+FORWARD_METHODS = ["GET", "HEAD", "POST", "PUT", "PATCH", "DELETE", "OPTIONS"]
+# Methods that never modify upstream state.
+SAFE_METHODS = frozenset(("GET", "HEAD", "OPTIONS"))
+
+# Hop-by-hop headers (RFC 7230 6.1) apply to a single connection and must not
+# be relayed in either direction.
+HOP_BY_HOP_HEADERS = frozenset(
+    (
+        "connection",
+        "keep-alive",
+        "proxy-authenticate",
+        "proxy-authorization",
+        "te",
+        "trailer",
+        "transfer-encoding",
+        "upgrade",
+    )
+)
+
+# Request headers never copied upstream: host is set by the HTTP client and
+# identity headers are only trusted when the gateway sets them from the JWT.
+_DROPPED_REQUEST_HEADERS = HOP_BY_HOP_HEADERS | {
+    "host",
+    "x-user-id",
+    "x-user-email",
+    "x-user-role",
+}
+
+# Services mounted at the root of their host (e.g. auth exposes /login)
+# instead of under /api/v1/{service}.
+ROOT_MOUNTED_SERVICES = frozenset(("auth",))
+
+
+class RouteTable:
+    """Caches the upstream URL prefix of each service."""
+
+    def __init__(self, services: Dict[str, str]):
+        self._prefixes: Dict[str, str] = {}
+        for name, base in services.items():
+            base = base.rstrip("/")
+            if name in ROOT_MOUNTED_SERVICES:
+                self._prefixes[name] = base
+            else:
+                # gateway /api/v1/restaurantes/... maps to
+                # restaurantes-service:/api/v1/restaurantes/...
+                self._prefixes[name] = f"{base}/api/v1/{name}"
+
+    def __contains__(self, service_name: str) -> bool:
+        return service_name in self._prefixes
+
+    def resolve(self, service_name: str, path: str) -> Optional[str]:
+        prefix = self._prefixes.get(service_name)
+        if prefix is None:
+            return None
+        if path:
+            return f"{prefix}/{path}"
+        # root-mounted services need the trailing slash for their index route
+        return f"{prefix}/" if service_name in ROOT_MOUNTED_SERVICES else prefix
+
+
+def _connection_tokens(raw_headers: Iterable[Tuple[bytes, bytes]]) -> frozenset:
+    # headers listed in Connection are hop-by-hop for this message as well
+    tokens = set()
+    for k, v in raw_headers:
+        if k.lower() == b"connection":
+            tokens.update(t.strip().lower() for t in v.split(b","))
+    return frozenset(t.decode("latin-1") for t in tokens if t)
+
+
+def request_headers(
+    raw_headers: List[Tuple[bytes, bytes]], user: Optional[dict] = None
+) -> List[Tuple[bytes, bytes]]:
+    """Headers to send upstream, plus the X-User-* identity headers."""
+    extra = _connection_tokens(raw_headers)
+    out = [
+        (k, v)
+        for k, v in raw_headers
+        if (name := k.decode("latin-1").lower()) not in _DROPPED_REQUEST_HEADERS
+        and name not in extra
+    ]
+    if user:
+        out.append((b"x-user-id", str(user.get("sub")).encode("latin-1")))
+        if user.get("email"):
+            out.append((b"x-user-email", str(user["email"]).encode("latin-1")))
+        if user.get("role"):
+            out.append((b"x-user-role", str(user["role"]).encode("latin-1")))
+    return out
+
+
+def response_headers(
+    raw_headers: List[Tuple[bytes, bytes]],
+) -> List[Tuple[bytes, bytes]]:
+    """Upstream response headers to relay to the client."""
+    extra = _connection_tokens(raw_headers)
+    return [
+        (k, v)
+        for k, v in raw_headers
+        if (name := k.decode("latin-1").lower()) not in HOP_BY_HOP_HEADERS
+        and name not in extra
+    ]
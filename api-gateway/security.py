@@ -0,0 +1,126 @@
+"""Auth helpers for the gateway hot path.
+
+- ``TokenCache``: bounded LRU of already verified JWT claims, keyed by the
+  token digest and expiring at the token's ``exp`` (capped by a max TTL).
+- ``PublicRouteMatcher``: ``PUBLIC_ROUTES`` patterns compiled once into a
+  prefix trie per service, so checking a path is a single walk over it.
+"""
+
+import hashlib
+import time
+from collections import OrderedDict
+from typing import Dict, Optional
+
+
+class TokenCache:
+    """LRU + TTL cache of verified token claims."""
+
+    def __init__(self, maxsize: int = 10000, max_ttl: float = 300.0):
+        self.maxsize = maxsize
+        self.max_ttl = max_ttl
+        # digest -> (expires_at, claims)
+        self._entries: "OrderedDict[bytes, tuple]" = OrderedDict()
+
+    @staticmethod
+    def _key(token: str) -> bytes:
+        # never keep raw tokens in memory longer than needed
+        return hashlib.sha256(token.encode("utf-8")).digest()
+
+    def get(self, token: str) -> Optional[dict]:
+        if self.maxsize <= 0:
+            return None
+        key = self._key(token)
+        entry = self._entries.get(key)
+        if entry is None:
+            return None
+        expires_at, claims = entry
+        if expires_at <= time.time():
+            self._entries.pop(key, None)
+            return None
+        self._entries.move_to_end(key)
+        return claims
+
+    def put(self, token: str, claims: dict, exp=None) -> None:
+        if self.maxsize <= 0:
+            return
+        now = time.time()
+        expires_at = now + self.max_ttl
+        if exp is not None:
+            try:
+                expires_at = min(expires_at, float(exp))
+            except (TypeError, ValueError):
+                pass
+        if expires_at <= now:
+            return
+        key = self._key(token)
+        self._entries[key] = (expires_at, claims)
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.maxsize:
+            self._entries.popitem(last=False)
+
+    def clear(self) -> None:
+        self._entries.clear()
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+
+class _TrieNode:
+    __slots__ = ("children", "exact", "prefix")
+
+    def __init__(self):
+        self.children: Dict[str, "_TrieNode"] = {}
+        # a pattern ends here and must match the whole path
+        self.exact = False
+        # a wildcard pattern ends here: any path continuing from here matches
+        self.prefix = False
+
+
+class PublicRouteMatcher:
+    """Prefix trie per service built from ``service:route`` patterns.
+
+    ``route*`` matches any path starting with ``route``; ``route`` matches the
+    path exactly and an empty route matches every path of the service.
+    Leading slashes are ignored on both patterns and paths.
+    """
+
+    def __init__(self, patterns):
+        self._roots: Dict[str, _TrieNode] = {}
+        for svc, rp in patterns:
+            self.add(svc, rp)
+
+    @classmethod
+    def from_string(cls, raw: str) -> "PublicRouteMatcher":
+        patterns = []
+        for part in [p.strip() for p in raw.split(",") if p.strip()]:
+            # expected format service:route or service:route*
+            if ":" not in part:
+                continue
+            svc, rp = part.split(":", 1)
+            patterns.append((svc, rp))
+        return cls(patterns)
+
+    def add(self, service_name: str, route: str) -> None:
+        # an empty (not merely "/") route is a catch-all for the service
+        catch_all = route == ""
+        wildcard = route.endswith("*")
+        route = (route[:-1] if wildcard else route).lstrip("/")
+        node = self._roots.setdefault(service_name, _TrieNode())
+        for ch in route:
+            node = node.children.setdefault(ch, _TrieNode())
+        if wildcard or catch_all:
+            node.prefix = True
+        else:
+            node.exact = True
+
+    def is_public(self, service_name: str, path: str) -> bool:
+        node = self._roots.get(service_name)
+        if node is None:
+            return False
+        for ch in path.lstrip("/"):
+            if node.prefix:
+                return True
+            node = node.children.get(ch)
+            if node is None:
+                return False
+        return node.prefix or node.exact
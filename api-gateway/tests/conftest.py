@@ -0,0 +1,45 @@
+import inspect
+import os
+import sys
+
+import pytest
+
+# Make the gateway modules (main, upstream, ...) importable from the tests.
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+# ... and the shared ``common`` package from the repository root.
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..", "..")))
+
+
+async def _chunks(data: bytes, size: int = 1024):
+    for i in range(0, len(data), size):
+        yield data[i : i + size]
+
+
+@pytest.fixture
+def mock_upstream(monkeypatch):
+    """Route the gateway's upstream clients to ``handler(request)``.
+
+    Responses are re-wrapped as streams, like a real upstream socket
+    (httpx.MockTransport responses are otherwise already read).
+    """
+    import httpx
+
+    import main as gateway_main
+
+    def install(handler):
+        async def streaming(request):
+            resp = handler(request)
+            if inspect.isawaitable(resp):
+                resp = await resp
+            return httpx.Response(
+                resp.status_code, headers=resp.headers, content=_chunks(resp.content)
+            )
+
+        monkeypatch.setattr(
+            gateway_main.upstream,
+            "_new_client",
+            lambda: httpx.AsyncClient(transport=httpx.MockTransport(streaming)),
+        )
+        gateway_main.upstream._clients.clear()
+
+    return install
@@ -0,0 +1,56 @@
+import io
+import json
+
+from fastapi import FastAPI, Request
+from fastapi.responses import JSONResponse
+from fastapi.testclient import TestClient
+
+from access_log import AccessLogger, AccessLogMiddleware
+
+
+def _app(access_logger):
+    app = FastAPI()
+    app.add_middleware(AccessLogMiddleware, access_logger=access_logger)
+
+    @app.get("/api/v1/x")
+    def x(request: Request):
+        request.state.upstream_service = "restaurantes"
+        request.state.upstream_status = 200
+        request.state.upstream_ms = 1.5
+        return {"ok": True}
+
+    @app.get("/boom")
+    def boom():
+        return JSONResponse({}, status_code=502)
+
+    return app
+
+
+def _lines(stream):
+    return [json.loads(line) for line in stream.getvalue().splitlines()]
+
+
+def test_access_entries_are_json_lines_with_upstream_fields():
+    out = io.StringIO()
+    access_logger = AccessLogger(stream=out)
+    access_logger.start()
+    TestClient(_app(access_logger)).get("/api/v1/x")
+    access_logger.stop()
+    (entry,) = _lines(out)
+    assert entry["path"] == "/api/v1/x"
+    assert entry["status"] == 200
+    assert entry["service"] == "restaurantes"
+    assert entry["upstream_status"] == 200
+    assert entry["upstream_ms"] == 1.5
+    assert entry["total_ms"] >= 0
+
+
+def test_sampling_keeps_errors():
+    out = io.StringIO()
+    access_logger = AccessLogger(sample_rate=0.0, stream=out)
+    access_logger.start()
+    client = TestClient(_app(access_logger))
+    client.get("/api/v1/x")
+    client.get("/boom")
+    access_logger.stop()
+    assert [e["status"] for e in _lines(out)] == [502]
@@ -0,0 +1,70 @@
+import asyncio
+
+import httpx
+
+import main as gateway_main
+from cache import MemoryBackend, ResponseCache
+
+
+def _install_cache(monkeypatch):
+    monkeypatch.setattr(
+        gateway_main, "response_cache", ResponseCache(MemoryBackend(), ttl=60)
+    )
+
+
+def _run(*calls):
+    async def run():
+        transport = httpx.ASGITransport(app=gateway_main.app)
+        async with httpx.AsyncClient(
+            transport=transport, base_url="http://gateway"
+        ) as client:
+            return [await call(client) for call in calls]
+
+    return asyncio.run(run())
+
+
+def test_catalog_reads_are_cached_and_invalidated(monkeypatch, mock_upstream):
+    hits = {"menu": 0}
+
+    def handler(request: httpx.Request) -> httpx.Response:
+        if request.method == "GET":
+            hits["menu"] += 1
+            return httpx.Response(200, json={"menu": [], "v": hits["menu"]})
+        return httpx.Response(200, json={"id": "x"})
+
+    mock_upstream(handler)
+    _install_cache(monkeypatch)
+    url = "/api/v1/restaurantes/rest1/menu"
+    first, second, _, third = _run(
+        lambda c: c.get(url),
+        lambda c: c.get(url),
+        lambda c: c.post(url, json={"nombre": "Nueva", "precio": 1}),
+        lambda c: c.get(url),
+    )
+    assert first.headers["x-cache"] == "MISS"
+    assert second.headers["x-cache"] == "HIT"
+    assert second.json() == first.json()
+    # the POST under the same restaurant dropped the cached menu
+    assert third.headers["x-cache"] == "MISS"
+    assert third.json()["v"] == 2
+
+
+def test_if_none_match_returns_304(monkeypatch, mock_upstream):
+    mock_upstream(lambda r: httpx.Response(200, json={"ok": 1}))
+    _install_cache(monkeypatch)
+    url = "/api/v1/restaurantes/rest1"
+    (first,) = _run(lambda c: c.get(url))
+    etag = first.headers["etag"]
+    (second,) = _run(lambda c: c.get(url, headers={"If-None-Match": etag}))
+    assert second.status_code == 304
+    assert second.headers["etag"] == etag
+    assert second.content == b""
+
+
+def test_only_catalog_routes_are_cacheable():
+    cache = ResponseCache(MemoryBackend())
+    assert cache.key_for("restaurantes", "", "q=pizza") == "restaurantes||?q=pizza"
+    assert cache.key_for("restaurantes", "rest1/menu", "") == "restaurantes|rest1|menu?"
+    assert cache.key_for("restaurantes", "rest1/photo", "") is None
+    assert cache.key_for("restaurantes", "autocomplete", "q=piz") is None
+    assert cache.key_for("pedidos", "abc", "") is None
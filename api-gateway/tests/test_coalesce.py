@@ -0,0 +1,49 @@
+import asyncio
+
+import httpx
+
+import main as gateway_main
+from coalesce import SingleFlight
+
+
+def test_identical_concurrent_gets_share_one_upstream_call(monkeypatch, mock_upstream):
+    calls = {"n": 0}
+
+    async def handler(request: httpx.Request) -> httpx.Response:
+        calls["n"] += 1
+        await asyncio.sleep(0.1)
+        return httpx.Response(200, json={"user_id": "u1"})
+
+    mock_upstream(handler)
+    monkeypatch.setattr(gateway_main, "coalescer", SingleFlight())
+
+    async def run():
+        transport = httpx.ASGITransport(app=gateway_main.app)
+        async with httpx.AsyncClient(
+            transport=transport, base_url="http://gateway"
+        ) as client:
+            return await asyncio.gather(
+                *[client.get("/api/v1/restaurantes/by-user/u1") for _ in range(5)]
+            )
+
+    resps = asyncio.run(run())
+    assert [r.json() for r in resps] == [{"user_id": "u1"}] * 5
+    assert calls["n"] == 1
+    stats = gateway_main.coalescer.stats()
+    assert stats["leaders"] == 1
+    assert stats["followers"] == 4
+    assert stats["coalescing_ratio"] == 0.8
+
+
+def test_unshareable_leader_lets_waiters_fetch_on_their_own():
+    async def run():
+        sf = SingleFlight()
+        assert sf.join("k") is None
+        waiting = sf.join("k")
+        sf.resolve("k", None)
+        return await sf.wait(waiting), sf.stats()
+
+    value, stats = asyncio.run(run())
+    assert value is None
+    assert stats["fallbacks"] == 1
+    assert stats["coalescing_ratio"] == 0.0
@@ -0,0 +1,81 @@
+import httpx
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+
+from common.metrics import Registry, instrument_app, track_sqlalchemy_pool
+
+
+def test_histogram_renders_cumulative_buckets():
+    registry = Registry()
+    h = registry.histogram("lat_seconds", "latency", ("route",), buckets=(0.1, 1.0))
+    h.observe(0.05, route="/a")
+    h.observe(0.5, route="/a")
+    h.observe(5.0, route="/a")
+    text = registry.render()
+    assert 'lat_seconds_bucket{route="/a",le="0.1"} 1' in text
+    assert 'lat_seconds_bucket{route="/a",le="1"} 2' in text
+    assert 'lat_seconds_bucket{route="/a",le="+Inf"} 3' in text
+    assert 'lat_seconds_count{route="/a"} 3' in text
+
+
+def test_metrics_endpoint_labels_requests_by_route_template():
+    app = FastAPI()
+    instrument_app(app, service="test-svc")
+
+    @app.get("/items/{item_id}")
+    def item(item_id: str):
+        return {"id": item_id}
+
+    client = TestClient(app)
+    client.get("/items/1")
+    client.get("/items/2")
+    resp = client.get("/metrics")
+    assert resp.status_code == 200
+    assert resp.headers["content-type"].startswith("text/plain")
+    assert (
+        'http_requests_total{service="test-svc",method="GET",'
+        'route="/items/{item_id}",status="200"} 2'
+    ) in resp.text
+
+
+def test_pool_collector_exports_gauges():
+    class FakePool:
+        def size(self):
+            return 5
+
+        def checkedout(self):
+            return 2
+
+    class FakeEngine:
+        pool = FakePool()
+
+    track_sqlalchemy_pool(FakeEngine(), "test-pool-svc")
+    app = FastAPI()
+    instrument_app(app, service="x")
+    text = TestClient(app).get("/metrics").text
+    assert 'db_pool_size{service="test-pool-svc",pool="default"} 5' in text
+    assert 'db_pool_checked_out{service="test-pool-svc",pool="default"} 2' in text
+
+
+def test_gateway_records_upstream_latency(mock_upstream):
+    import main as gateway_main
+
+    mock_upstream(lambda request: httpx.Response(200, json=[]))
+    client = TestClient(gateway_main.app)
+    client.get("/api/v1/restaurantes/")
+    text = client.get("/metrics").text
+    assert 'upstream_request_duration_seconds_count{service="api-gateway",' in text
+    assert 'upstream="restaurantes",status="200"}' in text
+
+
+def test_gateway_labels_requests_by_upstream_service(mock_upstream):
+    import main as gateway_main
+
+    mock_upstream(lambda request: httpx.Response(200, json=[]))
+    client = TestClient(gateway_main.app)
+    client.get("/api/v1/restaurantes/rest1/menu")
+    client.get("/api/v1/auth/health")
+    text = client.get("/metrics").text
+    for route in ("/api/v1/restaurantes", "/api/v1/auth"):
+        assert f'method="GET",route="{route}",status="200"}}' in text
+    assert "{service_name}" not in text
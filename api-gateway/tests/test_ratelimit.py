@@ -0,0 +1,130 @@
+import asyncio
+
+import httpx
+import pytest
+from fastapi.testclient import TestClient
+
+import main as gateway_main
+from ratelimit import MemoryBackend, Quota, RateLimiter, TrustedProxies, parse_rules
+
+
+def test_parse_rules_and_most_specific_match():
+    limiter = RateLimiter(
+        MemoryBackend(),
+        default=Quota.parse("100/60"),
+        rules=parse_rules("POST pedidos=10/60, auth/login=5/60,auth=50/60"),
+    )
+    assert limiter.quota_for("POST", "pedidos", "") == ("POST pedidos/", Quota(10, 60))
+    assert limiter.quota_for("GET", "pedidos", "x") == ("*", Quota(100, 60))
+    assert limiter.quota_for("POST", "auth", "login")[1] == Quota(5, 60)
+    assert limiter.quota_for("POST", "auth", "login2")[1] == Quota(50, 60)
+
+
+def test_invalid_quota_is_rejected():
+    with pytest.raises(ValueError):
+        parse_rules("pedidos=0/60")
+
+
+def test_bucket_allows_burst_then_refills(monkeypatch):
+    now = {"t": 1000.0}
+    monkeypatch.setattr("ratelimit.time.monotonic", lambda: now["t"])
+    backend = MemoryBackend()
+    quota = Quota(2, 2.0)  # one token per second
+
+    async def take():
+        return await backend.take("k", quota)
+
+    assert asyncio.run(take()) == (True, 0.0)
+    assert asyncio.run(take()) == (True, 0.0)
+    allowed, wait = asyncio.run(take())
+    assert not allowed and wait == pytest.approx(1.0)
+    now["t"] += 1.0
+    assert asyncio.run(take())[0]
+
+
+def test_over_limit_returns_429_without_upstream_call(monkeypatch, mock_upstream):
+    calls = {"n": 0}
+
+    def handler(request):
+        calls["n"] += 1
+        return httpx.Response(200, json={})
+
+    mock_upstream(handler)
+    monkeypatch.setattr(
+        gateway_main,
+        "rate_limiter",
+        RateLimiter(MemoryBackend(), None, parse_rules("POST auth/login=2/60")),
+    )
+    client = TestClient(gateway_main.app)
+    statuses = [
+        client.post("/api/v1/auth/login", json={}).status_code for _ in range(3)
+    ]
+    assert statuses == [200, 200, 429]
+    assert calls["n"] == 2
+    resp = client.post("/api/v1/auth/login", json={})
+    assert int(resp.headers["retry-after"]) >= 1
+
+
+def test_forwarded_clients_get_their_own_bucket(monkeypatch, mock_upstream):
+    mock_upstream(lambda request: httpx.Response(200, json={}))
+    monkeypatch.setattr(
+        gateway_main,
+        "rate_limiter",
+        RateLimiter(MemoryBackend(), None, parse_rules("POST auth/login=1/60")),
+    )
+    monkeypatch.setattr(gateway_main, "TRUST_FORWARDED_FOR", True)
+    # TestClient connects as "testclient"; stand in for the frontend's address
+    monkeypatch.setattr(
+        gateway_main, "trusted_proxies", TrustedProxies.parse("testclient")
+    )
+
+    async def resolved():
+        return {"testclient"}
+
+    monkeypatch.setattr(gateway_main.trusted_proxies, "_host_addresses", resolved)
+    client = TestClient(gateway_main.app)
+
+    def login(ip):
+        headers = {"X-Forwarded-For": ip}
+        return client.post("/api/v1/auth/login", json={}, headers=headers).status_code
+
+    assert login("203.0.113.1") == 200
+    assert login("203.0.113.2") == 200  # another user, another bucket
+    assert login("203.0.113.1") == 429
+
+
+def test_forwarded_for_is_ignored_from_untrusted_peers():
+    proxies = TrustedProxies.parse("10.0.0.0/8")
+
+    async def ip(peer, forwarded):
+        return await proxies.client_ip(peer, forwarded)
+
+    # a client talking to the gateway directly cannot pick its bucket
+    assert asyncio.run(ip("198.51.100.7", "203.0.113.1")) == "198.51.100.7"
+    # through the proxy, forged hops to the left of the real one are skipped
+    assert asyncio.run(ip("10.0.0.5", "1.2.3.4, 203.0.113.1")) == "203.0.113.1"
+
+
+def test_invalid_tokens_are_charged_to_the_client_ip(monkeypatch, mock_upstream):
+    mock_upstream(lambda request: httpx.Response(200, json={}))
+    monkeypatch.setattr(
+        gateway_main,
+        "rate_limiter",
+        RateLimiter(MemoryBackend(), None, parse_rules("GET pedidos=2/60")),
+    )
+    decodes = {"n": 0}
+    real_decode = gateway_main.jwt.decode
+
+    def counting_decode(*args, **kwargs):
+        decodes["n"] += 1
+        return real_decode(*args, **kwargs)
+
+    monkeypatch.setattr(gateway_main.jwt, "decode", counting_decode)
+    client = TestClient(gateway_main.app)
+    headers = {"Authorization": "Bearer not-a-jwt"}
+    statuses = [
+        client.get("/api/v1/pedidos/orders", headers=headers).status_code
+        for _ in range(4)
+    ]
+    assert statuses == [401, 401, 429, 429]
+    assert decodes["n"] == 2
@@ -0,0 +1,108 @@
+import asyncio
+
+import httpx
+
+import main as gateway_main
+from resilience import (
+    CLOSED,
+    HALF_OPEN,
+    OPEN,
+    CircuitBreaker,
+    LatencyTracker,
+    ServiceGuard,
+    ServiceUnavailable,
+)
+
+
+def test_breaker_opens_then_probes_once():
+    cb = CircuitBreaker(failure_threshold=2, reset_timeout=0.0)
+    cb.record_failure()
+    assert cb.state == CLOSED
+    cb.record_failure()
+    assert cb.state == OPEN
+    # reset timeout elapsed: a single half-open probe is admitted
+    assert cb.allow()
+    assert cb.state == HALF_OPEN
+    assert not cb.allow()
+    cb.record_success()
+    assert cb.state == CLOSED
+
+
+def test_timeout_follows_p99():
+    lt = LatencyTracker(min_samples=10, multiplier=2.0, min_timeout=0.1, max_timeout=5)
+    assert lt.timeout() == 5
+    for _ in range(100):
+        lt.observe(0.2)
+    assert lt.timeout() == 0.4
+
+
+def test_p99_is_recomputed_every_n_observations():
+    lt = LatencyTracker(min_samples=1, recompute_every=5)
+    lt.observe(0.2)
+    assert lt.p99() == 0.2
+    for _ in range(4):
+        lt.observe(1.0)
+    assert lt.p99() == 0.2  # cached
+    lt.observe(1.0)
+    assert lt.p99() == 1.0
+
+
+def test_bulkhead_rejects_when_full():
+    async def run():
+        guard = ServiceGuard(CircuitBreaker(), LatencyTracker(), max_in_flight=1)
+        await guard.acquire()
+        try:
+            await guard.acquire()
+        except ServiceUnavailable as e:
+            return e.reason
+        finally:
+            guard.release()
+
+    assert asyncio.run(run()) == "too many in-flight requests"
+
+
+def test_open_circuit_fails_fast_with_503(monkeypatch, mock_upstream):
+    calls = {"n": 0}
+
+    def handler(request):
+        calls["n"] += 1
+        raise httpx.ConnectError("refused")
+
+    mock_upstream(handler)
+    guard = ServiceGuard(
+        CircuitBreaker(failure_threshold=2, reset_timeout=30), LatencyTracker()
+    )
+    monkeypatch.setitem(gateway_main.guards, "restaurantes", guard)
+
+    async def run():
+        transport = httpx.ASGITransport(app=gateway_main.app)
+        async with httpx.AsyncClient(
+            transport=transport, base_url="http://gateway"
+        ) as client:
+            return [
+                await client.get("/api/v1/restaurantes/rest1/photo") for _ in range(3)
+            ]
+
+    resps = asyncio.run(run())
+    assert [r.status_code for r in resps] == [500, 500, 503]
+    assert int(resps[2].headers["retry-after"]) >= 1
+    assert calls["n"] == 2
+
+
+def test_timed_out_call_is_recorded_at_the_timeout(monkeypatch, mock_upstream):
+    def handler(request):
+        raise httpx.ReadTimeout("slow", request=request)
+
+    mock_upstream(handler)
+    guard = ServiceGuard(CircuitBreaker(), LatencyTracker(max_timeout=2.5))
+    monkeypatch.setitem(gateway_main.guards, "restaurantes", guard)
+
+    async def run():
+        transport = httpx.ASGITransport(app=gateway_main.app)
+        async with httpx.AsyncClient(
+            transport=transport, base_url="http://gateway"
+        ) as client:
+            return await client.get("/api/v1/restaurantes/rest1/photo")
+
+    assert asyncio.run(run()).status_code == 500
+    assert list(guard.latency.samples) == [2.5]
@@ -0,0 +1,47 @@
+from routing import RouteTable, request_headers, response_headers
+
+SERVICES = {
+    "auth": "http://authentication:8001/",
+    "restaurantes": "http://restaurantes-service:8002",
+}
+
+
+def test_resolve_keeps_auth_root_mounting():
+    routes = RouteTable(SERVICES)
+    assert routes.resolve("auth", "login") == "http://authentication:8001/login"
+    assert routes.resolve("auth", "") == "http://authentication:8001/"
+    assert (
+        routes.resolve("restaurantes", "rest1/menu")
+        == "http://restaurantes-service:8002/api/v1/restaurantes/rest1/menu"
+    )
+    assert (
+        routes.resolve("restaurantes", "")
+        == "http://restaurantes-service:8002/api/v1/restaurantes"
+    )
+    assert routes.resolve("unknown", "x") is None
+
+
+def test_request_headers_drop_hop_by_hop_and_spoofed_identity():
+    raw = [
+        (b"host", b"gateway"),
+        (b"connection", b"keep-alive, x-trace"),
+        (b"keep-alive", b"timeout=5"),
+        (b"x-trace", b"1"),
+        (b"x-user-id", b"someone-else"),
+        (b"accept", b"application/json"),
+    ]
+    out = request_headers(raw, {"sub": "u1", "email": None, "role": "cliente"})
+    assert out == [
+        (b"accept", b"application/json"),
+        (b"x-user-id", b"u1"),
+        (b"x-user-role", b"cliente"),
+    ]
+
+
+def test_response_headers_keep_repeated_set_cookie():
+    raw = [
+        (b"transfer-encoding", b"chunked"),
+        (b"set-cookie", b"a=1"),
+        (b"set-cookie", b"b=2"),
+    ]
+    assert response_headers(raw) == [(b"set-cookie", b"a=1"), (b"set-cookie", b"b=2")]
@@ -0,0 +1,39 @@
+import time
+
+from security import PublicRouteMatcher, TokenCache
+
+
+def test_public_routes_match_legacy_semantics():
+    m = PublicRouteMatcher.from_string(
+        "auth:login,auth:register,restaurantes:*,pedidos:health*,repartidores:"
+    )
+    assert m.is_public("auth", "login")
+    assert m.is_public("auth", "/login")
+    assert not m.is_public("auth", "login/extra")
+    assert not m.is_public("auth", "me")
+    assert m.is_public("restaurantes", "")
+    assert m.is_public("restaurantes", "rest1/menu")
+    assert m.is_public("pedidos", "healthz")
+    assert not m.is_public("pedidos", "abc")
+    # empty route is a catch-all for the service
+    assert m.is_public("repartidores", "r1/photo")
+    assert not m.is_public("unknown", "login")
+
+
+def test_token_cache_expires_at_exp():
+    cache = TokenCache(maxsize=10, max_ttl=60)
+    cache.put("tok", {"sub": "u1"}, exp=time.time() + 30)
+    assert cache.get("tok") == {"sub": "u1"}
+    cache.put("old", {"sub": "u2"}, exp=time.time() - 1)
+    assert cache.get("old") is None
+
+
+def test_token_cache_is_bounded():
+    cache = TokenCache(maxsize=2, max_ttl=60)
+    cache.put("a", {"sub": "a"})
+    cache.put("b", {"sub": "b"})
+    cache.get("a")
+    cache.put("c", {"sub": "c"})
+    assert len(cache) == 2
+    assert cache.get("b") is None
+    assert cache.get("a") == {"sub": "a"}
@@ -0,0 +1,75 @@
+import asyncio
+import time
+
+import httpx
+
+import main as gateway_main
+
+
+def _run(app_request):
+    async def run():
+        transport = httpx.ASGITransport(app=gateway_main.app)
+        async with httpx.AsyncClient(
+            transport=transport, base_url="http://gateway"
+        ) as client:
+            return await app_request(client)
+
+    return asyncio.run(run())
+
+
+def test_forwarded_calls_run_concurrently(mock_upstream):
+    # every upstream call takes 0.2s; 5 parallel calls must not serialize
+    async def handler(request: httpx.Request) -> httpx.Response:
+        await asyncio.sleep(0.2)
+        return httpx.Response(200, json={"path": request.url.path})
+
+    mock_upstream(handler)
+
+    async def calls(client):
+        start = time.perf_counter()
+        resps = await asyncio.gather(
+            *[client.get(f"/api/v1/restaurantes/rest{i}/menu") for i in range(5)]
+        )
+        return resps, time.perf_counter() - start
+
+    resps, elapsed = _run(calls)
+    assert all(r.status_code == 200 for r in resps)
+    assert resps[0].json() == {"path": "/api/v1/restaurantes/rest0/menu"}
+    assert elapsed < 0.6
+
+
+def test_binary_body_is_streamed_unchanged(mock_upstream):
+    photo = bytes(range(256)) * 64
+    mock_upstream(
+        lambda r: httpx.Response(
+            200, content=photo, headers={"content-type": "image/png"}
+        )
+    )
+
+    resp = _run(lambda c: c.get("/api/v1/restaurantes/rest1/photo"))
+    assert resp.status_code == 200
+    assert resp.headers["content-type"] == "image/png"
+    assert resp.content == photo
+
+
+def test_request_body_is_forwarded_as_is(mock_upstream):
+    seen = {}
+
+    async def handler(request: httpx.Request) -> httpx.Response:
+        seen["body"] = await request.aread()
+        seen["content-type"] = request.headers.get("content-type")
+        return httpx.Response(201, content=b'{"ok": true}')
+
+    mock_upstream(handler)
+
+    resp = _run(
+        lambda c: c.patch(
+            "/api/v1/auth/login",
+            content=b"raw-form-data",
+            headers={"content-type": "multipart/form-data; boundary=x"},
+        )
+    )
+    assert resp.status_code == 201
+    assert resp.content == b'{"ok": true}'
+    assert seen["body"] == b"raw-form-data"
+    assert seen["content-type"].startswith("multipart/form-data")
@@ -0,0 +1,85 @@
+"""Pooled async HTTP clients used by the gateway to reach the microservices.
+
+Each upstream service gets its own ``httpx.AsyncClient`` so keep-alive
+connections are reused per service and a slow service cannot exhaust the
+connection pool of the others. Limits and timeouts are read from env.
+"""
+
+import os
+from typing import Dict, Optional
+
+import httpx
+
+
+def _env_float(name: str, default: float) -> float:
+    try:
+        return float(os.getenv(name, default))
+    except (TypeError, ValueError):
+        return default
+
+
+def _env_int(name: str, default: int) -> int:
+    try:
+        return int(os.getenv(name, default))
+    except (TypeError, ValueError):
+        return default
+
+
+# Pool limits (per upstream service)
+MAX_CONNECTIONS = _env_int("GATEWAY_MAX_CONNECTIONS", 100)
+MAX_KEEPALIVE = _env_int("GATEWAY_MAX_KEEPALIVE", 20)
+KEEPALIVE_EXPIRY = _env_float("GATEWAY_KEEPALIVE_EXPIRY", 30.0)
+
+# Timeouts (seconds)
+CONNECT_TIMEOUT = _env_float("GATEWAY_CONNECT_TIMEOUT", 3.0)
+READ_TIMEOUT = _env_float("GATEWAY_READ_TIMEOUT", 10.0)
+WRITE_TIMEOUT = _env_float("GATEWAY_WRITE_TIMEOUT", 10.0)
+POOL_TIMEOUT = _env_float("GATEWAY_POOL_TIMEOUT", 5.0)
+
+
+class UpstreamPool:
+    """Holds one keep-alive ``AsyncClient`` per upstream service."""
+
+    def __init__(self, services: Dict[str, str]):
+        self.services = services
+        self._clients: Dict[str, httpx.AsyncClient] = {}
+
+    def _new_client(self) -> httpx.AsyncClient:
+        limits = httpx.Limits(
+            max_connections=MAX_CONNECTIONS,
+            max_keepalive_connections=MAX_KEEPALIVE,
+            keepalive_expiry=KEEPALIVE_EXPIRY,
+        )
+        timeout = httpx.Timeout(
+            connect=CONNECT_TIMEOUT,
+            read=READ_TIMEOUT,
+            write=WRITE_TIMEOUT,
+            pool=POOL_TIMEOUT,
+        )
+        # follow_redirects stays off: redirects are forwarded to the caller as-is
+        return httpx.AsyncClient(limits=limits, timeout=timeout)
+
+    async def startup(self) -> None:
+        for name in self.services:
+            if name not in self._clients:
+                self._clients[name] = self._new_client()
+
+    async def shutdown(self) -> None:
+        clients, self._clients = self._clients, {}
+        for c in clients.values():
+            try:
+                await c.aclose()
+            except Exception:
+                pass
+
+    def client(self, service_name: str) -> httpx.AsyncClient:
+        """Return the pooled client for ``service_name``.
+
+        Clients are normally created on startup; create lazily as a fallback
+        (e.g. when the app runs without lifespan events in tests).
+        """
+        c: Optional[httpx.AsyncClient] = self._clients.get(service_name)
+        if c is None or c.is_closed:
+            c = self._new_client()
+            self._clients[service_name] = c
+        return c
@@ -0,0 +1,60 @@
+"""Eventos de asignación de repartidores en Redis Streams (``ASSIGN_QUEUE=redis``).
+
+- ``assign:orders``: pedidos publica ``order_id`` cuando un pedido queda sin
+  repartidor.
+- ``assign:couriers``: repartidores publica ``rep_id`` cuando alguien pasa a
+  ``disponible`` (alta o liberación).
+
+El despachador de pedidos (``services/pedidos/assign_queue.py``) los
+lee con ``XREAD`` (cada réplica líder ve todos los eventos) y empareja pedidos en espera con
+repartidores libres en cuanto llega el evento. Publicar es best effort:
+un evento perdido lo recupera la resincronización periódica del
+despachador.
+"""
+
+import os
+import time
+from typing import Optional
+
+ASSIGN_QUEUE = os.getenv("ASSIGN_QUEUE", "redis")
+ASSIGN_REDIS_URL = os.getenv("ASSIGN_REDIS_URL", "redis://redis:6379/0")
+ASSIGN_STREAM_MAXLEN = int(os.getenv("ASSIGN_STREAM_MAXLEN", "10000"))
+
+ORDERS_STREAM = "assign:orders"
+COURIERS_STREAM = "assign:couriers"
+
+_client = None
+
+
+def enabled() -> bool:
+    return ASSIGN_QUEUE == "redis"
+
+
+def get_client():
+    global _client
+    if _client is None:
+        import redis
+
+        # falla rápido si Redis no responde: publicar no debe frenar la petición
+        _client = redis.from_url(ASSIGN_REDIS_URL, socket_connect_timeout=1)
+    return _client
+
+
+def _publish(stream: str, fields: dict) -> Optional[str]:
+    if not enabled():
+        return None
+    try:
+        return get_client().xadd(
+            stream, fields, maxlen=ASSIGN_STREAM_MAXLEN, approximate=True
+        )
+    except Exception as e:
+        print(f"[ASSIGN] could not publish to {stream}: {e}", flush=True)
+        return None
+
+
+def publish_order_pending(order_id: str) -> Optional[str]:
+    return _publish(ORDERS_STREAM, {"order_id": order_id, "ts": time.time()})
+
+
+def publish_courier_available(rep_id: str) -> Optional[str]:
+    return _publish(COURIERS_STREAM, {"rep_id": rep_id})
@@ -0,0 +1,123 @@
+"""Motor SQLAlchemy compartido: pool configurable, sesión por petición y
+métricas del pool.
+
+Uso en un servicio FastAPI:
+
+    from common.db import create_db_engine, session_factory
+
+    engine = create_db_engine(DATABASE_URL, service="pedidos")
+    SessionLocal = session_factory(engine)
+
+    def get_db():
+        db = SessionLocal()
+        try:
+            yield db
+        finally:
+            db.close()
+
+    @app.get("/x")
+    def handler(db: Session = Depends(get_db)): ...
+
+El pool se configura por entorno (por proceso: con N workers de uvicorn el
+servicio abre hasta ``N * (DB_POOL_SIZE + DB_MAX_OVERFLOW)`` conexiones, que
+deben caber en el ``max_connections`` de Postgres):
+
+- ``DB_POOL_SIZE`` / ``DB_MAX_OVERFLOW``: conexiones fijas y extra
+- ``DB_POOL_TIMEOUT``: segundos esperando una conexión libre antes de fallar
+- ``DB_POOL_RECYCLE``: segundos tras los que una conexión se reabre
+- ``DB_POOL_PRE_PING``: comprueba la conexión antes de entregarla
+- ``DB_STATEMENT_TIMEOUT_MS``: ``statement_timeout`` de Postgres (0 = sin límite)
+
+Además de los gauges de :func:`common.metrics.track_sqlalchemy_pool` se
+exportan ``db_pool_checkout_seconds`` (espera hasta obtener una conexión),
+``db_pool_checkout_timeouts_total`` y ``db_pool_saturation`` (conexiones en
+uso sobre ``DB_POOL_SIZE + DB_MAX_OVERFLOW``).
+"""
+
+import os
+import time
+from typing import Dict, Optional
+
+from sqlalchemy import create_engine, exc
+from sqlalchemy.engine import Engine
+from sqlalchemy.orm import sessionmaker
+from sqlalchemy.pool import QueuePool
+
+from common.metrics import REGISTRY, track_sqlalchemy_pool
+
+DB_POOL_SIZE = int(os.getenv("DB_POOL_SIZE", "5"))
+DB_MAX_OVERFLOW = int(os.getenv("DB_MAX_OVERFLOW", "10"))
+DB_POOL_TIMEOUT = float(os.getenv("DB_POOL_TIMEOUT", "30"))
+DB_POOL_RECYCLE = int(os.getenv("DB_POOL_RECYCLE", "1800"))
+DB_POOL_PRE_PING = os.getenv("DB_POOL_PRE_PING", "1") == "1"
+DB_STATEMENT_TIMEOUT_MS = int(os.getenv("DB_STATEMENT_TIMEOUT_MS", "0"))
+
+POOL_CHECKOUT = REGISTRY.histogram(
+    "db_pool_checkout_seconds",
+    "Time waiting for a connection from the pool",
+    ("service", "pool"),
+    buckets=(0.0005, 0.001, 0.005, 0.01, 0.05, 0.1, 0.5, 1.0, 5.0, 30.0),
+)
+POOL_TIMEOUTS = REGISTRY.counter(
+    "db_pool_checkout_timeouts_total",
+    "Checkouts that gave up after DB_POOL_TIMEOUT",
+    ("service", "pool"),
+)
+
+
+class TimedQueuePool(QueuePool):
+    """``QueuePool`` que mide la espera de cada checkout."""
+
+    labels: Optional[Dict[str, str]] = None
+
+    def _do_get(self):
+        start = time.perf_counter()
+        try:
+            return super()._do_get()
+        except exc.TimeoutError:
+            if self.labels:
+                POOL_TIMEOUTS.inc(**self.labels)
+            raise
+        finally:
+            if self.labels:
+                POOL_CHECKOUT.observe(time.perf_counter() - start, **self.labels)
+
+    def recreate(self):
+        # engine.dispose() crea un pool nuevo: conserva las etiquetas
+        pool = super().recreate()
+        pool.labels = self.labels
+        return pool
+
+
+def create_db_engine(
+    url: str, service: str, pool_name: str = "default", **kwargs
+) -> Engine:
+    """``create_engine`` con la configuración de pool del entorno y métricas.
+
+    ``kwargs`` se pasan a ``create_engine`` y tienen prioridad.
+    """
+    options = {}
+    if not url.startswith("sqlite"):
+        options.update(
+            poolclass=TimedQueuePool,
+            pool_size=DB_POOL_SIZE,
+            max_overflow=DB_MAX_OVERFLOW,
+            pool_timeout=DB_POOL_TIMEOUT,
+            pool_recycle=DB_POOL_RECYCLE,
+            pool_pre_ping=DB_POOL_PRE_PING,
+        )
+    if url.startswith("postgresql") and DB_STATEMENT_TIMEOUT_MS > 0:
+        # libpq (psycopg2 y psycopg 3) aplica -c al abrir cada conexión
+        options["connect_args"] = {
+            "options": f"-c statement_timeout={DB_STATEMENT_TIMEOUT_MS}"
+        }
+    options.update(kwargs)
+    engine = create_engine(url, **options)
+    if isinstance(engine.pool, TimedQueuePool):
+        engine.pool.labels = {"service": service, "pool": pool_name}
+    track_sqlalchemy_pool(engine, service, pool_name)
+    return engine
+
+
+def session_factory(engine: Engine) -> sessionmaker:
+    return sessionmaker(autocommit=False, autoflush=False, bind=engine)
@@ -0,0 +1,322 @@
+"""Almacén de fotos direccionado por contenido, con miniaturas y caché HTTP.
+
+Uso en un servicio FastAPI:
+
+    from common.media import MediaStore, UploadLimitMiddleware
+
+    app.add_middleware(UploadLimitMiddleware)
+    store = MediaStore(os.path.join(os.getcwd(), "data", "restaurante_photos"))
+    nombre = store.save(file.file)  # se guarda en foto_url
+    return store.response(request, nombre, size=size)
+
+- Las subidas se copian por bloques a un temporal del mismo directorio con
+  un presupuesto de ``MEDIA_MAX_UPLOAD_BYTES`` (413 al superarlo) y el tipo
+  se comprueba por la cabecera del archivo, no por su nombre ni su
+  Content-Type (415 si no es JPEG, PNG, GIF o WebP). El archivo completo se
+  mueve a su sitio con ``os.replace``, así nunca se sirve a medias.
+  :class:`UploadLimitMiddleware` rechaza antes de leer el cuerpo las
+  peticiones cuyo Content-Length ya supera el límite, y corta con 413 las
+  que lo superan mientras llegan (chunked o sin Content-Length), antes de
+  que el parser multipart las vuelque enteras a disco.
+- Cada archivo se llama como el SHA-256 de su contenido y vive en
+  ``<root>/<hash[:2]>/<hash><ext>``. El nombre guardado en la base de datos
+  (``foto_url``) es el índice: servir una foto resuelve la ruta directamente,
+  sin recorrer el directorio. Subidas idénticas comparten el archivo.
+- Las miniaturas ``<hash>_<lado><ext>`` de cada tamaño de
+  ``MEDIA_THUMB_SIZES`` se redimensionan y recomprimen en un pool de
+  ``MEDIA_WORKERS`` hilos, fuera de la petición, si Pillow está instalado.
+  Mientras no existen (o sin Pillow) se sirve el original. El original se
+  guarda tal como llegó, sin redimensionar ni recomprimir: su nombre y su
+  ETag son el hash de esos bytes, y reescribirlo en el worker cambiaría el
+  contenido detrás de un nombre ya publicado. Para acotar el tamaño servido
+  se piden las miniaturas (``?size=``); el disco lo acota
+  ``MEDIA_MAX_UPLOAD_BYTES``.
+- Las respuestas llevan un ETag fuerte (el hash), responden ``304`` a
+  ``If-None-Match`` y aceptan ``Range``/``If-Range`` (``FileResponse``). Si la
+  petición trae ``?v=<foto_url>`` la URL ya identifica el contenido y se
+  marca ``immutable``; si no, se cachea ``MEDIA_MAX_AGE`` segundos y se
+  revalida con el ETag.
+- Los nombres antiguos (``rest1__1700000000.jpg``) se siguen sirviendo desde
+  la raíz del almacén.
+"""
+
+import hashlib
+import os
+import re
+import tempfile
+import threading
+from concurrent.futures import Future, ThreadPoolExecutor
+from typing import BinaryIO, Optional, Tuple
+
+from fastapi import HTTPException, Request
+from fastapi.responses import FileResponse, JSONResponse, Response
+
+MEDIA_THUMB_SIZES = tuple(
+    int(s) for s in os.getenv("MEDIA_THUMB_SIZES", "128,512").split(",") if s.strip()
+)
+MEDIA_MAX_AGE = int(os.getenv("MEDIA_MAX_AGE", "300"))
+MEDIA_MAX_UPLOAD_BYTES = int(os.getenv("MEDIA_MAX_UPLOAD_BYTES", str(5 * 1024 * 1024)))
+MEDIA_WORKERS = int(os.getenv("MEDIA_WORKERS", "2"))
+MEDIA_JPEG_QUALITY = int(os.getenv("MEDIA_JPEG_QUALITY", "82"))
+
+CHUNK_SIZE = 64 * 1024
+# margen para las cabeceras multipart alrededor del archivo
+MULTIPART_OVERHEAD = 64 * 1024
+IMMUTABLE = "public, max-age=31536000, immutable"
+
+_HASHED = re.compile(r"^([0-9a-f]{64})(\.[a-z0-9]{1,5})$")
+
+_SIGNATURES = (
+    (b"\xff\xd8\xff", ".jpg"),
+    (b"\x89PNG\r\n\x1a\n", ".png"),
+    (b"GIF87a", ".gif"),
+    (b"GIF89a", ".gif"),
+)
+
+_executor: Optional[ThreadPoolExecutor] = None
+_executor_lock = threading.Lock()
+
+
+def sniff_image(head: bytes) -> Optional[str]:
+    """Extensión según los primeros bytes del archivo, o ``None``."""
+    for magic, ext in _SIGNATURES:
+        if head.startswith(magic):
+            return ext
+    if head[:4] == b"RIFF" and head[8:12] == b"WEBP":
+        return ".webp"
+    return None
+
+
+def _pool() -> ThreadPoolExecutor:
+    global _executor
+    with _executor_lock:
+        if _executor is None:
+            _executor = ThreadPoolExecutor(
+                max_workers=MEDIA_WORKERS, thread_name_prefix="media"
+            )
+        return _executor
+
+
+class UploadLimitMiddleware:
+    """Responde 413 a un ``POST .../photo`` cuyo cuerpo supera el límite:
+    sin leerlo si el Content-Length ya lo supera, y si no contando los bytes
+    según llegan, de modo que un cuerpo chunked nunca se vuelca entero a
+    disco."""
+
+    def __init__(self, app, max_bytes: Optional[int] = None):
+        self.app = app
+        # None: MEDIA_MAX_UPLOAD_BYTES leído en cada petición
+        self._max_bytes = max_bytes
+
+    @property
+    def max_bytes(self) -> int:
+        limit = self._max_bytes
+        if limit is None:
+            limit = MEDIA_MAX_UPLOAD_BYTES
+        return limit + MULTIPART_OVERHEAD
+
+    async def __call__(self, scope, receive, send):
+        if not (
+            scope["type"] == "http"
+            and scope["method"] == "POST"
+            and scope["path"].endswith("/photo")
+        ):
+            await self.app(scope, receive, send)
+            return
+        max_bytes = self.max_bytes
+        length = dict(scope["headers"]).get(b"content-length", b"")
+        if length.isdigit() and int(length) > max_bytes:
+            await _too_large(scope, receive, send)
+            return
+        received = 0
+        started = False
+
+        async def limited_receive():
+            nonlocal received
+            message = await receive()
+            if message["type"] == "http.request":
+                received += len(message.get("body", b""))
+                if received > max_bytes:
+                    # FastAPI deja pasar HTTPException al parsear el cuerpo
+                    raise HTTPException(status_code=413, detail="Foto demasiado grande")
+            return message
+
+        async def tracking_send(message):
+            nonlocal started
+            if message["type"] == "http.response.start":
+                started = True
+            await send(message)
+
+        try:
+            await self.app(scope, limited_receive, tracking_send)
+        except HTTPException as e:
+            if e.status_code != 413 or started:
+                raise
+            await _too_large(scope, receive, send)
+
+
+async def _too_large(scope, receive, send) -> None:
+    response = JSONResponse({"detail": "Foto demasiado grande"}, status_code=413)
+    await response(scope, receive, send)
+
+
+def _etag_matches(header: Optional[str], etag: str) -> bool:
+    if not header:
+        return False
+    if header.strip() == "*":
+        return True
+    # If-None-Match usa comparación débil: W/"x" equivale a "x"
+    return etag in (tag.strip().removeprefix("W/") for tag in header.split(","))
+
+
+class MediaStore:
+    def __init__(
+        self,
+        root: str,
+        sizes: Tuple[int, ...] = MEDIA_THUMB_SIZES,
+        max_bytes: int = MEDIA_MAX_UPLOAD_BYTES,
+    ):
+        self.root = root
+        self.sizes = tuple(sorted(sizes))
+        self.max_bytes = max_bytes
+        os.makedirs(root, exist_ok=True)
+
+    def _path(self, digest: str, ext: str, size: Optional[int] = None) -> str:
+        suffix = f"_{size}" if size else ""
+        return os.path.join(self.root, digest[:2], f"{digest}{suffix}{ext}")
+
+    def save(self, fileobj: BinaryIO) -> str:
+        """Guarda ``fileobj`` por contenido y devuelve su nombre (``<hash><ext>``).
+
+        Las miniaturas se encolan en el pool; ``400``/``413``/``415`` si el
+        archivo está vacío, es demasiado grande o no es una imagen.
+        """
+        head = fileobj.read(CHUNK_SIZE)
+        if not head:
+            raise HTTPException(status_code=400, detail="Archivo vacío")
+        ext = sniff_image(head)
+        if ext is None:
+            raise HTTPException(
+                status_code=415, detail="Formato de imagen no soportado"
+            )
+        digest = hashlib.sha256()
+        size = 0
+        fd, tmp = tempfile.mkstemp(dir=self.root, prefix=".upload-")
+        try:
+            with os.fdopen(fd, "wb") as out:
+                chunk = head
+                while chunk:
+                    size += len(chunk)
+                    if size > self.max_bytes:
+                        raise HTTPException(
+                            status_code=413, detail="Foto demasiado grande"
+                        )
+                    digest.update(chunk)
+                    out.write(chunk)
+                    chunk = fileobj.read(CHUNK_SIZE)
+            name = digest.hexdigest() + ext
+            dest = self._path(digest.hexdigest(), ext)
+            if os.path.exists(dest):
+                os.remove(tmp)
+            else:
+                os.makedirs(os.path.dirname(dest), exist_ok=True)
+                os.replace(tmp, dest)
+        except BaseException:
+            if os.path.exists(tmp):
+                os.remove(tmp)
+            raise
+        self.process(name)
+        return name
+
+    def process(self, name: str) -> Optional[Future]:
+        """Encola las miniaturas de ``name``; sin Pillow o sin tamaños no hace
+        nada y devuelve ``None``."""
+        if not self.sizes:
+            return None
+        try:
+            import PIL  # noqa: F401
+        except ImportError:
+            return None
+        digest, ext = _HASHED.match(name).groups()
+        return _pool().submit(self._make_thumbnails, digest, ext)
+
+    def _make_thumbnails(self, digest: str, ext: str) -> None:
+        from PIL import Image
+
+        try:
+            with Image.open(self._path(digest, ext)) as img:
+                fmt = img.format
+                for size in self.sizes:
+                    dest = self._path(digest, ext, size)
+                    if os.path.exists(dest):
+                        continue
+                    thumb = img.copy()
+                    thumb.thumbnail((size, size))
+                    # temporal único: dos subidas iguales pueden coincidir aquí
+                    fd, tmp = tempfile.mkstemp(dir=os.path.dirname(dest))
+                    os.close(fd)
+                    try:
+                        thumb.save(
+                            tmp, format=fmt, optimize=True, quality=MEDIA_JPEG_QUALITY
+                        )
+                        os.replace(tmp, dest)
+                    finally:
+                        if os.path.exists(tmp):
+                            os.remove(tmp)
+        except Exception as e:
+            # sin miniatura se sirve el original
+            print(f"[MEDIA] thumbnails for {digest} failed: {e}", flush=True)
+
+    def resolve(self, name: str, size: Optional[int] = None) -> Tuple[str, str]:
+        """Ruta y ETag de ``name`` (o de su miniatura ``size``); 404 si no existe."""
+        m = _HASHED.match(name or "")
+        if m:
+            digest, ext = m.groups()
+            if size:
+                thumb = self._path(digest, ext, size)
+                if os.path.isfile(thumb):
+                    return thumb, f'"{digest}-{size}"'
+            path, etag = self._path(digest, ext), f'"{digest}"'
+        else:
+            # nombre anterior a este almacén: archivo plano en la raíz
+            path = os.path.join(self.root, os.path.basename(name or ""))
+            stat = os.stat(path) if os.path.isfile(path) else None
+            etag = f'"{stat.st_size:x}-{int(stat.st_mtime):x}"' if stat else ""
+        if not os.path.isfile(path):
+            raise HTTPException(status_code=404, detail="Foto no encontrada")
+        return path, etag
+
+    def response(
+        self,
+        request: Request,
+        name: str,
+        size: Optional[int] = None,
+        max_age: int = MEDIA_MAX_AGE,
+    ) -> Response:
+        if size is not None and size not in self.sizes:
+            raise HTTPException(status_code=400, detail="Tamaño no disponible")
+        path, etag = self.resolve(name, size)
+        immutable = _HASHED.match(name) and request.query_params.get("v") == name
+        headers = {
+            "ETag": etag,
+            "Cache-Control": IMMUTABLE if immutable else f"public, max-age={max_age}",
+        }
+        if _etag_matches(request.headers.get("if-none-match"), etag):
+            return Response(status_code=304, headers=headers)
+        return FileResponse(path, headers=headers)
+
+    def delete(self, name: str) -> None:
+        """Borra ``name`` y sus miniaturas; el llamador comprueba que nadie más
+        lo referencia."""
+        m = _HASHED.match(name or "")
+        if m:
+            digest, ext = m.groups()
+            paths = [self._path(digest, ext)]
+            paths += [self._path(digest, ext, size) for size in self.sizes]
+        else:
+            paths = [os.path.join(self.root, os.path.basename(name or ""))]
+        for path in paths:
+            try:
+                os.remove(path)
+            except FileNotFoundError:
+                pass
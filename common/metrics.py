@@ -0,0 +1,364 @@
+"""Métricas de runtime en formato de exposición de Prometheus (sin dependencias).
+
+Uso en un servicio FastAPI:
+
+    from common.metrics import instrument_app, track_sqlalchemy_pool
+
+    instrument_app(app, service="pedidos")   # middleware + GET /metrics
+    track_sqlalchemy_pool(engine, "pedidos")  # uso del pool de sesiones
+
+Se exportan:
+
+- ``http_requests_total{service,method,route,status}``
+- ``http_request_duration_seconds{service,method,route}`` (histograma)
+- ``http_requests_in_flight{service}``
+- ``db_pool_*{service,pool}``: tamaño, conexiones en uso, overflow y
+  saturación del pool (la espera de checkout la añade :mod:`common.db`)
+- ``upstream_request_duration_seconds{service,upstream,status}``: llamadas a
+  otros servicios, registradas con :func:`observe_upstream`
+
+Las rutas se etiquetan con su plantilla (``/api/v1/pedidos/{order_id}``) para
+acotar la cardinalidad. Cada proceso (worker de uvicorn) expone sus propios
+valores; Prometheus los agrega por instancia.
+"""
+
+import bisect
+import threading
+import time
+from typing import Callable, Dict, Iterable, List, Sequence, Tuple
+
+# Buckets por defecto (segundos), pensados para latencias HTTP internas.
+DEFAULT_BUCKETS = (
+    0.005,
+    0.01,
+    0.025,
+    0.05,
+    0.1,
+    0.25,
+    0.5,
+    1.0,
+    2.5,
+    5.0,
+    10.0,
+)
+
+CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+
+def _escape(value) -> str:
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _fmt_labels(names: Sequence[str], values: Sequence) -> str:
+    if not names:
+        return ""
+    pairs = ",".join(f'{n}="{_escape(v)}"' for n, v in zip(names, values))
+    return "{" + pairs + "}"
+
+
+def _fmt_value(v: float) -> str:
+    if v == float("inf"):
+        return "+Inf"
+    if float(v).is_integer():
+        return str(int(v))
+    return repr(float(v))
+
+
+class _Metric:
+    kind = "untyped"
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = ()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._lock = threading.Lock()
+
+    def _key(self, labels: Dict[str, str]) -> Tuple:
+        return tuple(str(labels.get(n, "")) for n in self.labelnames)
+
+    def header(self) -> List[str]:
+        return [
+            f"# HELP {self.name} {self.documentation}",
+            f"# TYPE {self.name} {self.kind}",
+        ]
+
+
+class Counter(_Metric):
+    kind = "counter"
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self._values: Dict[Tuple, float] = {}
+
+    def inc(self, amount: float = 1.0, **labels) -> None:
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0.0) + amount
+
+    def render(self) -> List[str]:
+        with self._lock:
+            items = list(self._values.items())
+        return self.header() + [
+            f"{self.name}{_fmt_labels(self.labelnames, k)} {_fmt_value(v)}"
+            for k, v in items
+        ]
+
+
+class Gauge(_Metric):
+    kind = "gauge"
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self._values: Dict[Tuple, float] = {}
+
+    def set(self, value: float, **labels) -> None:
+        with self._lock:
+            self._values[self._key(labels)] = value
+
+    def inc(self, amount: float = 1.0, **labels) -> None:
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0.0) + amount
+
+    def dec(self, amount: float = 1.0, **labels) -> None:
+        self.inc(-amount, **labels)
+
+    def render(self) -> List[str]:
+        with self._lock:
+            items = list(self._values.items())
+        return self.header() + [
+            f"{self.name}{_fmt_labels(self.labelnames, k)} {_fmt_value(v)}"
+            for k, v in items
+        ]
+
+
+class Histogram(_Metric):
+    kind = "histogram"
+
+    def __init__(self, *args, buckets: Sequence[float] = DEFAULT_BUCKETS, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.buckets = tuple(sorted(buckets))
+        # key -> [bucket counts..., sum, count]
+        self._values: Dict[Tuple, List[float]] = {}
+
+    def observe(self, value: float, **labels) -> None:
+        key = self._key(labels)
+        idx = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            row = self._values.get(key)
+            if row is None:
+                row = [0.0] * (len(self.buckets) + 2)
+                self._values[key] = row
+            if idx < len(self.buckets):
+                row[idx] += 1
+            row[-2] += value
+            row[-1] += 1
+
+    def render(self) -> List[str]:
+        with self._lock:
+            items = [(k, list(v)) for k, v in self._values.items()]
+        lines = self.header()
+        names = self.labelnames + ("le",)
+        for key, row in items:
+            cumulative = 0.0
+            for bound, n in zip(self.buckets, row):
+                cumulative += n
+                lines.append(
+                    f"{self.name}_bucket{_fmt_labels(names, key + (_fmt_value(bound),))} "
+                    f"{_fmt_value(cumulative)}"
+                )
+            lines.append(
+                f"{self.name}_bucket{_fmt_labels(names, key + ('+Inf',))} "
+                f"{_fmt_value(row[-1])}"
+            )
+            labels = _fmt_labels(self.labelnames, key)
+            lines.append(f"{self.name}_sum{labels} {_fmt_value(row[-2])}")
+            lines.append(f"{self.name}_count{labels} {_fmt_value(row[-1])}")
+        return lines
+
+
+# A collector returns (name, documentation, kind, [(labels dict, value), ...])
+Collector = Callable[[], Iterable[Tuple[str, str, str, List[Tuple[dict, float]]]]]
+
+
+class Registry:
+    def __init__(self):
+        self._metrics: Dict[str, _Metric] = {}
+        self._collectors: List[Collector] = []
+        self._lock = threading.Lock()
+
+    def _get_or_create(self, cls, name, documentation, labelnames, **kwargs):
+        with self._lock:
+            metric = self._metrics.get(name)
+            if metric is None:
+                metric = cls(name, documentation, labelnames, **kwargs)
+                self._metrics[name] = metric
+            return metric
+
+    def counter(self, name, documentation, labelnames=()) -> Counter:
+        return self._get_or_create(Counter, name, documentation, labelnames)
+
+    def gauge(self, name, documentation, labelnames=()) -> Gauge:
+        return self._get_or_create(Gauge, name, documentation, labelnames)
+
+    def histogram(
+        self, name, documentation, labelnames=(), buckets=DEFAULT_BUCKETS
+    ) -> Histogram:
+        return self._get_or_create(
+            Histogram, name, documentation, labelnames, buckets=buckets
+        )
+
+    def register_collector(self, collector: Collector) -> None:
+        """Register a callback evaluated on every scrape (e.g. pool gauges)."""
+        with self._lock:
+            self._collectors.append(collector)
+
+    def render(self) -> str:
+        with self._lock:
+            metrics = list(self._metrics.values())
+            collectors = list(self._collectors)
+        lines: List[str] = []
+        for metric in metrics:
+            lines.extend(metric.render())
+        # collectors can emit samples for the same metric name (one per pool),
+        # group them so each family gets a single HELP/TYPE header
+        families: Dict[str, Tuple[str, str, List[Tuple[dict, float]]]] = {}
+        for collector in collectors:
+            try:
+                for name, doc, kind, samples in collector():
+                    families.setdefault(name, (doc, kind, []))[2].extend(samples)
+            except Exception:
+                # a failing collector must not break the whole scrape
+                continue
+        for name, (doc, kind, samples) in families.items():
+            lines.append(f"# HELP {name} {doc}")
+            lines.append(f"# TYPE {name} {kind}")
+            for labels, value in samples:
+                names = tuple(labels)
+                lines.append(
+                    f"{name}{_fmt_labels(names, [labels[n] for n in names])} "
+                    f"{_fmt_value(value)}"
+                )
+        return "\n".join(lines) + "\n"
+
+
+# Registro global del proceso.
+REGISTRY = Registry()
+
+HTTP_REQUESTS = REGISTRY.counter(
+    "http_requests_total",
+    "HTTP requests handled",
+    ("service", "method", "route", "status"),
+)
+HTTP_LATENCY = REGISTRY.histogram(
+    "http_request_duration_seconds",
+    "HTTP request latency by route",
+    ("service", "method", "route"),
+)
+HTTP_IN_FLIGHT = REGISTRY.gauge(
+    "http_requests_in_flight", "HTTP requests currently being served", ("service",)
+)
+UPSTREAM_LATENCY = REGISTRY.histogram(
+    "upstream_request_duration_seconds",
+    "Latency of calls to other services",
+    ("service", "upstream", "status"),
+)
+
+
+def observe_upstream(service: str, upstream: str, seconds: float, status) -> None:
+    """Record one outbound call made by ``service`` to ``upstream``."""
+    UPSTREAM_LATENCY.observe(seconds, service=service, upstream=upstream, status=status)
+
+
+class PrometheusMiddleware:
+    """ASGI middleware recording request count, latency and in-flight gauge."""
+
+    def __init__(self, app, service: str):
+        self.app = app
+        self.service = service
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or scope["path"] == "/metrics":
+            await self.app(scope, receive, send)
+            return
+        start = time.perf_counter()
+        status = {"code": 500}
+
+        async def send_wrapper(message):
+            if message["type"] == "http.response.start":
+                status["code"] = message["status"]
+            await send(message)
+
+        HTTP_IN_FLIGHT.inc(service=self.service)
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            HTTP_IN_FLIGHT.dec(service=self.service)
+            # route template keeps label cardinality bounded; a catch-all
+            # handler can name a finer, still bounded, route in the scope
+            route = (
+                scope.get("metrics_route")
+                or getattr(scope.get("route"), "path", None)
+                or "unmatched"
+            )
+            HTTP_LATENCY.observe(
+                time.perf_counter() - start,
+                service=self.service,
+                method=scope["method"],
+                route=route,
+            )
+            HTTP_REQUESTS.inc(
+                service=self.service,
+                method=scope["method"],
+                route=route,
+                status=status["code"],
+            )
+
+
+def instrument_app(app, service: str) -> None:
+    """Add the metrics middleware and a ``GET /metrics`` endpoint to ``app``."""
+    from starlette.responses import Response
+
+    app.add_middleware(PrometheusMiddleware, service=service)
+
+    async def metrics_endpoint():
+        return Response(REGISTRY.render(), media_type=CONTENT_TYPE)
+
+    app.add_api_route(
+        "/metrics", metrics_endpoint, methods=["GET"], include_in_schema=False
+    )
+
+
+def track_sqlalchemy_pool(engine, service: str, pool_name: str = "default") -> None:
+    """Export the engine's connection pool usage on every scrape."""
+
+    def collect():
+        pool = engine.pool
+        labels = {"service": service, "pool": pool_name}
+        samples = []
+        for metric, attr, doc in (
+            ("db_pool_size", "size", "Configured pool size"),
+            ("db_pool_checked_out", "checkedout", "Connections currently in use"),
+            ("db_pool_overflow", "overflow", "Connections opened above pool size"),
+            ("db_pool_checked_in", "checkedin", "Idle connections in the pool"),
+        ):
+            fn = getattr(pool, attr, None)
+            if fn is None:
+                continue
+            samples.append((metric, doc, "gauge", [(labels, float(fn()))]))
+        # QueuePool does not expose max_overflow publicly; -1 means unbounded
+        max_overflow = getattr(pool, "_max_overflow", -1)
+        if hasattr(pool, "size") and max_overflow >= 0:
+            capacity = pool.size() + max_overflow
+            if capacity > 0:
+                samples.append(
+                    (
+                        "db_pool_saturation",
+                        "Connections in use over pool size + max overflow",
+                        "gauge",
+                        [(labels, pool.checkedout() / capacity)],
+                    )
+                )
+        return samples
+
+    REGISTRY.register_collector(collect)
@@ -1,6 +1,7 @@
 # /frontend/app.py
 
 from flask import Flask, render_template, request, redirect, url_for, session, jsonify
+from flask import has_request_context
 import os
 import requests
 from flask import flash
@@ -19,6 +20,37 @@ API_GATEWAY_URL = os.getenv("API_GATEWAY_URL", "http://localhost:8000")
 app.secret_key = os.getenv("FLASK_SECRET", "dev-secret-change-me")
 
 
+# --- Cliente HTTP hacia el gateway y los servicios ---
+# El frontend llama al gateway desde el servidor, así que todas las peticiones
+# llegan con la IP de este contenedor. Se reenvía la IP del usuario en
+# X-Forwarded-For para que el rate limiting del gateway (por IP en las rutas
+# anónimas) dé un bucket a cada usuario; el gateway solo cree la cabecera si
+# viene de GATEWAY_TRUSTED_PROXIES. Si el frontend queda detrás de otro proxy,
+# request.remote_addr tiene que venir corregido (p. ej. con ProxyFix).
+class ForwardingClient:
+    def request(self, method, url, **kwargs):
+        if has_request_context() and request.remote_addr:
+            headers = dict(kwargs.pop("headers", None) or {})
+            headers["X-Forwarded-For"] = request.remote_addr
+            kwargs["headers"] = headers
+        return requests.request(method, url, **kwargs)
+
+    def get(self, url, **kwargs):
+        return self.request("GET", url, **kwargs)
+
+    def post(self, url, **kwargs):
+        return self.request("POST", url, **kwargs)
+
+    def put(self, url, **kwargs):
+        return self.request("PUT", url, **kwargs)
+
+    def delete(self, url, **kwargs):
+        return self.request("DELETE", url, **kwargs)
+
+
+http = ForwardingClient()
+
+
 # --- Local mock store fallback (used when API Gateway and other services are down) ---
 class MockStore:
     def __init__(self, path=None):
@@ -178,7 +210,7 @@ def index():
     restos = []
     gw_path = f"/api/v1/restaurantes?q={q}" if q else "/api/v1/restaurantes?limit=20"
     try:
-        resp = requests.get(f"{API_GATEWAY_URL}{gw_path}", timeout=5)
+        resp = http.get(f"{API_GATEWAY_URL}{gw_path}", timeout=5)
         if resp.status_code == 200:
             restos = resp.json().get("restaurantes") or resp.json()
         else:
@@ -186,7 +218,7 @@ def index():
             if resp.status_code == 404:
                 try:
                     direct_url = f"http://restaurantes-service:8002{gw_path}"
-                    dr = requests.get(direct_url, timeout=5)
+                    dr = http.get(direct_url, timeout=5)
                     if dr.status_code == 200:
                         restos = dr.json().get("restaurantes") or dr.json()
                 except requests.exceptions.RequestException:
@@ -195,7 +227,7 @@ def index():
         # Gateway inaccessible: try direct
         try:
             direct_url = f"http://restaurantes-service:8002{gw_path}"
-            dr = requests.get(direct_url, timeout=5)
+            dr = http.get(direct_url, timeout=5)
             if dr.status_code == 200:
                 restos = dr.json().get("restaurantes") or dr.json()
         except requests.exceptions.RequestException:
@@ -248,7 +280,7 @@ def services_json():
         try:
             # forward the session token to the API Gateway so it can include user headers
             headers = {"Authorization": f"Bearer {token}"}
-            r = requests.get(s["health"], timeout=2, headers=headers)
+            r = http.get(s["health"], timeout=2, headers=headers)
             if r.status_code == 200:
                 s["status"] = "up"
                 try:
@@ -279,7 +311,7 @@ def login():
             return render_template("login.html", title="Login")
         try:
             try:
-                resp = requests.post(
+                resp = http.post(
                     f"{API_GATEWAY_URL}/api/v1/auth/login",
                     json={"email": email, "password": password},
                     timeout=2,
@@ -289,7 +321,7 @@ def login():
                     "[FRONTEND][LOGIN] Gateway timeout, using direct auth service",
                     flush=True,
                 )
-                resp = requests.post(
+                resp = http.post(
                     "http://authentication:8001/login",
                     json={"email": email, "password": password},
                     timeout=5,
@@ -302,7 +334,7 @@ def login():
                     # fetch user info to check role
                     try:
                         try:
-                            me = requests.get(
+                            me = http.get(
                                 f"{API_GATEWAY_URL}/api/v1/auth/me",
                                 headers={"Authorization": f"Bearer {token}"},
                                 timeout=2,
@@ -312,7 +344,7 @@ def login():
                                 "[FRONTEND][LOGIN] Gateway /me timeout, using direct auth service",
                                 flush=True,
                             )
-                            me = requests.get(
+                            me = http.get(
                                 "http://authentication:8001/me",
                                 headers={"Authorization": f"Bearer {token}"},
                                 timeout=5,
@@ -401,7 +433,7 @@ def restaurant_setup():
 
         try:
             # try API gateway first (with trailing slash and allow_redirects to handle FastAPI redirects)
-            resp = requests.post(
+            resp = http.post(
                 f"{API_GATEWAY_URL}/api/v1/restaurantes/",
                 json=rest_payload,
                 headers=headers,
@@ -412,7 +444,7 @@ def restaurant_setup():
             if resp.status_code not in (200, 201):
                 # try direct service inside compose network
                 print("[RESTAURANT] Gateway failed, trying direct service", flush=True)
-                direct = requests.post(
+                direct = http.post(
                     "http://restaurantes-service:8002/api/v1/restaurantes/",
                     json=rest_payload,
                     timeout=4,
@@ -452,7 +484,7 @@ def restaurant_setup():
                         )
                     }
                     try:
-                        r = requests.post(
+                        r = http.post(
                             f"{API_GATEWAY_URL}/api/v1/restaurantes/{rest_id}/photo",
                             files=files,
                             headers=headers,
@@ -460,14 +492,14 @@ def restaurant_setup():
                         )
                         if r.status_code not in (200, 201):
                             # fallback direct
-                            requests.post(
+                            http.post(
                                 f"http://restaurantes-service:8002/api/v1/restaurantes/{rest_id}/photo",
                                 files=files,
                                 timeout=4,
                             )
                     except requests.exceptions.RequestException:
                         try:
-                            requests.post(
+                            http.post(
                                 f"http://restaurantes-service:8002/api/v1/restaurantes/{rest_id}/photo",
                                 files=files,
                                 timeout=4,
@@ -489,7 +521,7 @@ def restaurant_setup():
                     "cantidad": int(cantidad or 0),
                 }
                 try:
-                    r = requests.post(
+                    r = http.post(
                         f"{API_GATEWAY_URL}/api/v1/restaurantes/{rest_id}/menu/",
                         json=item_payload,
                         headers=headers,
@@ -498,7 +530,7 @@ def restaurant_setup():
                     )
                     if r.status_code not in (200, 201):
                         # fallback
-                        requests.post(
+                        http.post(
                             f"http://restaurantes-service:8002/api/v1/restaurantes/{rest_id}/menu/",
                             json=item_payload,
                             timeout=4,
@@ -506,7 +538,7 @@ def restaurant_setup():
                         )
                 except requests.exceptions.RequestException:
                     try:
-                        requests.post(
+                        http.post(
                             f"http://restaurantes-service:8002/api/v1/restaurantes/{rest_id}/menu/",
                             json=item_payload,
                             timeout=4,
@@ -562,13 +594,13 @@ def restaurant_dashboard():
     if user_id and not restaurant_id:
         try:
             try:
-                resp = requests.get(
+                resp = http.get(
                     f"{API_GATEWAY_URL}/api/v1/restaurantes/by-user/{user_id}",
                     headers=headers,
                     timeout=3,
                 )
             except requests.exceptions.RequestException:
-                resp = requests.get(
+                resp = http.get(
                     f"http://restaurantes-service:8002/api/v1/restaurantes/by-user/{user_id}",
                     timeout=3,
                 )
@@ -588,13 +620,13 @@ def restaurant_dashboard():
             # Get restaurant info if not already loaded
             if not restaurante:
                 try:
-                    resp = requests.get(
+                    resp = http.get(
                         f"{API_GATEWAY_URL}/api/v1/restaurantes/{restaurant_id}",
                         headers=headers,
                         timeout=3,
                     )
                 except requests.exceptions.RequestException:
-                    resp = requests.get(
+                    resp = http.get(
                         f"http://restaurantes-service:8002/api/v1/restaurantes/{restaurant_id}",
                         timeout=3,
                     )
@@ -604,13 +636,13 @@ def restaurant_dashboard():
 
             # Get menu
             try:
-                menu_resp = requests.get(
+                menu_resp = http.get(
                     f"{API_GATEWAY_URL}/api/v1/restaurantes/{restaurant_id}/menu",
                     headers=headers,
                     timeout=3,
                 )
             except requests.exceptions.RequestException:
-                menu_resp = requests.get(
+                menu_resp = http.get(
                     f"http://restaurantes-service:8002/api/v1/restaurantes/{restaurant_id}/menu",
                     timeout=3,
                 )
@@ -638,7 +670,7 @@ def restaurant_dashboard():
 
             # Call pedidos service directly since this endpoint is not in gateway routing
             try:
-                orders_resp = requests.get(
+                orders_resp = http.get(
                     f"http://pedidos-service:8003/api/v1/restaurante/{restaurant_id}/orders",
                     params={"year": year, "month": month},
                     timeout=5,
@@ -694,13 +726,13 @@ def add_menu_items():
     restaurante = None
     try:
         try:
-            resp = requests.get(
+            resp = http.get(
                 f"{API_GATEWAY_URL}/api/v1/restaurantes/{restaurant_id}",
                 headers=headers,
                 timeout=3,
             )
         except requests.exceptions.RequestException:
-            resp = requests.get(
+            resp = http.get(
                 f"http://restaurantes-service:8002/api/v1/restaurantes/{restaurant_id}",
                 timeout=3,
             )
@@ -743,7 +775,7 @@ def add_menu_items():
 
             try:
                 # Try via gateway first
-                r = requests.post(
+                r = http.post(
                     f"{API_GATEWAY_URL}/api/v1/restaurantes/{restaurant_id}/menu/",
                     json=item_payload,
                     headers=headers,
@@ -756,7 +788,7 @@ def add_menu_items():
                 else:
                     # Try direct service
                     try:
-                        direct = requests.post(
+                        direct = http.post(
                             f"http://restaurantes-service:8002/api/v1/restaurantes/{restaurant_id}/menu/",
                             json=item_payload,
                             timeout=4,
@@ -771,7 +803,7 @@ def add_menu_items():
             except Exception:
                 # Try direct service as fallback
                 try:
-                    direct = requests.post(
+                    direct = http.post(
                         f"http://restaurantes-service:8002/api/v1/restaurantes/{restaurant_id}/menu/",
                         json=item_payload,
                         timeout=4,
@@ -827,14 +859,14 @@ def delete_menu_item(restaurant_id: str, item_id: str):
     try:
         # Try via gateway first
         try:
-            resp = requests.delete(
+            resp = http.delete(
                 f"{API_GATEWAY_URL}/api/v1/restaurantes/{restaurant_id}/menu/{item_id}",
                 headers=headers,
                 timeout=4,
             )
         except requests.exceptions.RequestException:
             # Fallback to direct service
-            resp = requests.delete(
+            resp = http.delete(
                 f"http://restaurantes-service:8002/api/v1/restaurantes/{restaurant_id}/menu/{item_id}",
                 timeout=4,
             )
@@ -886,7 +918,7 @@ def update_restaurant_logo():
 
         # Try via gateway first
         try:
-            r = requests.post(
+            r = http.post(
                 f"{API_GATEWAY_URL}/api/v1/restaurantes/{restaurant_id}/photo",
                 files=files,
                 headers=headers,
@@ -897,7 +929,7 @@ def update_restaurant_logo():
                 flash("✓ Logo actualizado correctamente.")
             else:
                 # Fallback to direct service
-                r = requests.post(
+                r = http.post(
                     f"http://restaurantes-service:8002/api/v1/restaurantes/{restaurant_id}/photo",
                     files=files,
                     timeout=5,
@@ -909,7 +941,7 @@ def update_restaurant_logo():
         except requests.exceptions.RequestException:
             # Try direct service
             try:
-                r = requests.post(
+                r = http.post(
                     f"http://restaurantes-service:8002/api/v1/restaurantes/{restaurant_id}/photo",
                     files=files,
                     timeout=5,
@@ -940,7 +972,7 @@ def repartidor_setup():
     user_id = session.get("user_id")
     if not user_id:
         try:
-            me = requests.get(
+            me = http.get(
                 f"{API_GATEWAY_URL}/api/v1/auth/me", headers=headers, timeout=4
             )
             if me.status_code == 200:
@@ -960,7 +992,7 @@ def repartidor_setup():
     existing_repartidor = None
     if request.method == "GET":
         try:
-            resp = requests.get(
+            resp = http.get(
                 f"{API_GATEWAY_URL}/api/v1/repartidores/{user_id}",
                 headers=headers,
                 timeout=3,
@@ -969,7 +1001,7 @@ def repartidor_setup():
                 existing_repartidor = resp.json()
             else:
                 try:
-                    resp = requests.get(
+                    resp = http.get(
                         f"http://repartidores-service:8004/api/v1/repartidores/{user_id}",
                         timeout=3,
                     )
@@ -996,7 +1028,7 @@ def repartidor_setup():
         # Check if repartidor exists to decide POST or PUT
         repartidor_exists = False
         try:
-            check_resp = requests.get(
+            check_resp = http.get(
                 f"{API_GATEWAY_URL}/api/v1/repartidores/{user_id}",
                 headers=headers,
                 timeout=3,
@@ -1005,7 +1037,7 @@ def repartidor_setup():
                 repartidor_exists = True
             else:
                 try:
-                    check_resp = requests.get(
+                    check_resp = http.get(
                         f"http://repartidores-service:8004/api/v1/repartidores/{user_id}",
                         timeout=3,
                     )
@@ -1020,14 +1052,14 @@ def repartidor_setup():
             # Update existing repartidor
             payload = {"nombre": nombre, "telefono": telefono}
             try:
-                resp = requests.put(
+                resp = http.put(
                     f"{API_GATEWAY_URL}/api/v1/repartidores/{user_id}",
                     json=payload,
                     headers=headers,
                     timeout=5,
                 )
                 if resp.status_code not in (200, 201):
-                    direct = requests.put(
+                    direct = http.put(
                         f"http://repartidores-service:8004/api/v1/repartidores/{user_id}",
                         json=payload,
                         timeout=4,
@@ -1041,7 +1073,7 @@ def repartidor_setup():
                         )
             except requests.exceptions.RequestException:
                 try:
-                    direct = requests.put(
+                    direct = http.put(
                         f"http://repartidores-service:8004/api/v1/repartidores/{user_id}",
                         json=payload,
                         timeout=4,
@@ -1064,14 +1096,14 @@ def repartidor_setup():
             # Create new repartidor
             payload = {"id": user_id, "nombre": nombre, "telefono": telefono}
             try:
-                resp = requests.post(
+                resp = http.post(
                     f"{API_GATEWAY_URL}/api/v1/repartidores",
                     json=payload,
                     headers=headers,
                     timeout=5,
                 )
                 if resp.status_code not in (200, 201):
-                    direct = requests.post(
+                    direct = http.post(
                         "http://repartidores-service:8004/api/v1/repartidores",
                         json=payload,
                         timeout=4,
@@ -1085,7 +1117,7 @@ def repartidor_setup():
                         )
             except requests.exceptions.RequestException:
                 try:
-                    direct = requests.post(
+                    direct = http.post(
                         "http://repartidores-service:8004/api/v1/repartidores",
                         json=payload,
                         timeout=4,
@@ -1116,21 +1148,21 @@ def repartidor_setup():
                     )
                 }
                 try:
-                    r = requests.post(
+                    r = http.post(
                         f"{API_GATEWAY_URL}/api/v1/repartidores/{user_id}/photo",
                         files=files,
                         headers=headers,
                         timeout=5,
                     )
                     if r.status_code not in (200, 201):
-                        requests.post(
+                        http.post(
                             f"http://repartidores-service:8004/api/v1/repartidores/{user_id}/photo",
                             files=files,
                             timeout=4,
                         )
                 except requests.exceptions.RequestException:
                     try:
-                        requests.post(
+                        http.post(
                             f"http://repartidores-service:8004/api/v1/repartidores/{user_id}/photo",
                             files=files,
                             timeout=4,
@@ -1207,7 +1239,7 @@ def new_user():
                 f"[FRONTEND][REGISTER] Calling gateway at {API_GATEWAY_URL}", flush=True
             )
             try:
-                resp = requests.post(
+                resp = http.post(
                     f"{API_GATEWAY_URL}/api/v1/auth/register", json=payload, timeout=2
                 )
                 print(
@@ -1219,7 +1251,7 @@ def new_user():
                     f"[FRONTEND][REGISTER] Gateway failed ({gw_ex}), trying direct auth service",
                     flush=True,
                 )
-                resp = requests.post(
+                resp = http.post(
                     "http://authentication:8001/register", json=payload, timeout=5
                 )
                 print(
@@ -1255,7 +1287,7 @@ def new_user():
                 autologin_success = False
                 try:
                     try:
-                        login_resp = requests.post(
+                        login_resp = http.post(
                             f"{API_GATEWAY_URL}/api/v1/auth/login",
                             json={"email": email, "password": password},
                             timeout=2,
@@ -1265,7 +1297,7 @@ def new_user():
                             "[FRONTEND][REGISTER] Gateway login timeout, using direct auth service",
                             flush=True,
                         )
-                        login_resp = requests.post(
+                        login_resp = http.post(
                             "http://authentication:8001/login",
                             json={"email": email, "password": password},
                             timeout=5,
@@ -1277,7 +1309,7 @@ def new_user():
                             # verify role before setting session
                             try:
                                 try:
-                                    me = requests.get(
+                                    me = http.get(
                                         f"{API_GATEWAY_URL}/api/v1/auth/me",
                                         headers={"Authorization": f"Bearer {token}"},
                                         timeout=2,
@@ -1287,7 +1319,7 @@ def new_user():
                                         "[FRONTEND][REGISTER] Gateway /me timeout, using direct auth service",
                                         flush=True,
                                     )
-                                    me = requests.get(
+                                    me = http.get(
                                         "http://authentication:8001/me",
                                         headers={"Authorization": f"Bearer {token}"},
                                         timeout=5,
@@ -1395,7 +1427,7 @@ def client_index():
     # Construir rutas
     gw_path = f"/api/v1/restaurantes?q={q}" if q else "/api/v1/restaurantes?limit=20"
     try:
-        resp = requests.get(f"{API_GATEWAY_URL}{gw_path}", timeout=5)
+        resp = http.get(f"{API_GATEWAY_URL}{gw_path}", timeout=5)
         if resp.status_code == 200:
             restos = resp.json().get("restaurantes") or resp.json()
         else:
@@ -1403,7 +1435,7 @@ def client_index():
             if resp.status_code == 404:
                 try:
                     direct_url = f"http://restaurantes-service:8002{gw_path}"
-                    dr = requests.get(direct_url, timeout=5)
+                    dr = http.get(direct_url, timeout=5)
                     if dr.status_code == 200:
                         restos = dr.json().get("restaurantes") or dr.json()
                 except requests.exceptions.RequestException:
@@ -1414,7 +1446,7 @@ def client_index():
         # gateway inaccesible: intento directo
         try:
             direct_url = f"http://restaurantes-service:8002{gw_path}"
-            dr = requests.get(direct_url, timeout=5)
+            dr = http.get(direct_url, timeout=5)
             if dr.status_code == 200:
                 restos = dr.json().get("restaurantes") or dr.json()
         except requests.exceptions.RequestException:
@@ -1438,14 +1470,14 @@ def restaurant_detail(rest_id):
     restaurante = None
     menu = []
     try:
-        r = requests.get(f"{API_GATEWAY_URL}/api/v1/restaurantes/{rest_id}", timeout=5)
+        r = http.get(f"{API_GATEWAY_URL}/api/v1/restaurantes/{rest_id}", timeout=5)
         if r.status_code == 200:
             restaurante = r.json()
         else:
             # si gateway respondió 404 o similar, intentar acceso directo al servicio restaurantes
             if r.status_code == 404:
                 try:
-                    direct_r = requests.get(
+                    direct_r = http.get(
                         f"http://restaurantes-service:8002/api/v1/restaurantes/{rest_id}",
                         timeout=5,
                     )
@@ -1458,7 +1490,7 @@ def restaurant_detail(rest_id):
     except requests.exceptions.RequestException:
         # intento directo si el gateway no responde
         try:
-            direct_r = requests.get(
+            direct_r = http.get(
                 f"http://restaurantes-service:8002/api/v1/restaurantes/{rest_id}",
                 timeout=5,
             )
@@ -1473,9 +1505,7 @@ def restaurant_detail(rest_id):
 
     # Obtener menú (normalized contract: {"menu": [...]}) con fallback al servicio directo
     try:
-        m = requests.get(
-            f"{API_GATEWAY_URL}/api/v1/restaurantes/{rest_id}/menu", timeout=5
-        )
+        m = http.get(f"{API_GATEWAY_URL}/api/v1/restaurantes/{rest_id}/menu", timeout=5)
         if m.status_code == 200:
             data = m.json()
             if isinstance(data, dict) and "menu" in data:
@@ -1487,7 +1517,7 @@ def restaurant_detail(rest_id):
         else:
             if m.status_code == 404:
                 try:
-                    direct_m = requests.get(
+                    direct_m = http.get(
                         f"http://restaurantes-service:8002/api/v1/restaurantes/{rest_id}/menu",
                         timeout=5,
                     )
@@ -1503,7 +1533,7 @@ def restaurant_detail(rest_id):
                 menu = []
     except requests.exceptions.RequestException:
         try:
-            direct_m = requests.get(
+            direct_m = http.get(
                 f"http://restaurantes-service:8002/api/v1/restaurantes/{rest_id}/menu",
                 timeout=5,
             )
@@ -1544,7 +1574,7 @@ def restaurant_detail(rest_id):
             "items": items,
         }
         try:
-            resp = requests.post(
+            resp = http.post(
                 f"{API_GATEWAY_URL}/api/v1/pedidos",
                 json=payload,
                 headers={"Authorization": f"Bearer {token}"},
@@ -1565,7 +1595,7 @@ def restaurant_detail(rest_id):
                 # si gateway devolvió 404 o similar, intentar enviar directamente al servicio de pedidos
                 if resp.status_code == 404:
                     try:
-                        direct = requests.post(
+                        direct = http.post(
                             "http://pedidos-service:8003/api/v1/pedidos",
                             json=payload,
                             headers={"Authorization": f"Bearer {token}"},
@@ -1609,7 +1639,7 @@ def restaurant_detail(rest_id):
         except requests.exceptions.RequestException:
             # intento directo si el gateway no responde
             try:
-                direct = requests.post(
+                direct = http.post(
                     "http://pedidos-service:8003/api/v1/pedidos",
                     json=payload,
                     headers={"Authorization": f"Bearer {token}"},
@@ -1651,7 +1681,7 @@ def restaurant_detail(rest_id):
                 if session.get("access_token")
                 else {}
             )
-            resp = requests.get(
+            resp = http.get(
                 f"{API_GATEWAY_URL}/api/v1/pedidos/{order_id}",
                 headers=headers,
                 timeout=3,
@@ -1682,14 +1712,14 @@ def order_status(order_id):
 
     try:
         try:
-            resp = requests.get(
+            resp = http.get(
                 f"{API_GATEWAY_URL}/api/v1/pedidos/{order_id}",
                 headers=headers,
                 timeout=2,
             )
         except requests.exceptions.RequestException:
             # Gateway timeout, try direct service
-            resp = requests.get(
+            resp = http.get(
                 f"http://pedidos-service:8003/api/v1/pedidos/{order_id}",
                 headers=headers,
                 timeout=5,
@@ -1718,14 +1748,14 @@ def api_order_status(order_id):
     headers = {"Authorization": f"Bearer {token}"} if token else {}
     try:
         try:
-            resp = requests.get(
+            resp = http.get(
                 f"{API_GATEWAY_URL}/api/v1/pedidos/{order_id}",
                 headers=headers,
                 timeout=2,
             )
         except requests.exceptions.RequestException:
             # Gateway timeout, try direct service
-            resp = requests.get(
+            resp = http.get(
                 f"http://pedidos-service:8003/api/v1/pedidos/{order_id}",
                 headers=headers,
                 timeout=5,
@@ -1756,7 +1786,7 @@ def api_rest_menu(rest_id):
     Intenta API Gateway y si falla, hace fallback al servicio `restaurantes` directo dentro de la red docker-compose.
     """
     try:
-        resp = requests.get(
+        resp = http.get(
             f"{API_GATEWAY_URL}/api/v1/restaurantes/{rest_id}/menu", timeout=4
         )
         if resp.status_code == 200:
@@ -1769,7 +1799,7 @@ def api_rest_menu(rest_id):
             # si gateway devuelve 404 o similar, intentamos el servicio directo
             if resp.status_code == 404:
                 try:
-                    direct = requests.get(
+                    direct = http.get(
                         f"http://restaurantes-service:8002/api/v1/restaurantes/{rest_id}/menu",
                         timeout=4,
                     )
@@ -1791,7 +1821,7 @@ def api_rest_menu(rest_id):
             )
     except requests.exceptions.RequestException:
         try:
-            direct = requests.get(
+            direct = http.get(
                 f"http://restaurantes-service:8002/api/v1/restaurantes/{rest_id}/menu",
                 timeout=4,
             )
@@ -1833,7 +1863,7 @@ def api_create_pedido():
 
     # Intentar API Gateway primero
     try:
-        resp = requests.post(
+        resp = http.post(
             f"{API_GATEWAY_URL}/api/v1/pedidos",
             json=payload,
             headers=headers,
@@ -1862,7 +1892,7 @@ def api_create_pedido():
                 resp.status_code in (404, 401) and not token
             ):
                 try:
-                    direct = requests.post(
+                    direct = http.post(
                         "http://pedidos-service:8003/api/v1/pedidos",
                         json=payload,
                         headers=headers,
@@ -1910,7 +1940,7 @@ def api_create_pedido():
     except requests.exceptions.RequestException:
         # intento directo si el gateway no responde
         try:
-            direct = requests.post(
+            direct = http.post(
                 "http://pedidos-service:8003/api/v1/pedidos",
                 json=payload,
                 headers=headers,
@@ -1971,6 +2001,38 @@ def _debug_set_last(order_id):
         return {"ok": False, "error": str(e)}, 500
 
 
+# Cabeceras de caché y rangos que se reenvían entre el navegador y el servicio.
+_PHOTO_REQUEST_HEADERS = ("If-None-Match", "Range", "If-Range")
+_PHOTO_RESPONSE_HEADERS = (
+    "Content-Type",
+    "ETag",
+    "Cache-Control",
+    "Last-Modified",
+    "Accept-Ranges",
+    "Content-Range",
+)
+
+
+def _fetch_photo(url, timeout):
+    """GET a photo from a service forwarding ``size``/``v`` and the
+    conditional/range headers; returns a Flask response or None."""
+    resp = http.get(
+        url,
+        params=request.args,
+        headers={
+            h: request.headers[h]
+            for h in _PHOTO_REQUEST_HEADERS
+            if h in request.headers
+        },
+        timeout=timeout,
+    )
+    if resp.status_code not in (200, 206, 304):
+        return None
+    headers = {h: resp.headers[h] for h in _PHOTO_RESPONSE_HEADERS if h in resp.headers}
+    headers.setdefault("Content-Type", "image/jpeg")
+    return resp.content, resp.status_code, headers
+
+
 @app.route("/repartidor/photo/<rep_id>")
 def repartidor_photo(rep_id):
     """Proxy endpoint that serves a repartidor photo by fetching it from the
@@ -1981,32 +2043,19 @@ def repartidor_photo(rep_id):
     try:
         # Try via API Gateway first with short timeout
         try:
-            resp = requests.get(
-                f"{API_GATEWAY_URL}/api/v1/repartidores/{rep_id}/photo",
-                timeout=1,
-                stream=True,
+            found = _fetch_photo(
+                f"{API_GATEWAY_URL}/api/v1/repartidores/{rep_id}/photo", timeout=1
             )
-            if resp.status_code == 200:
-                return (
-                    resp.content,
-                    resp.status_code,
-                    {"Content-Type": resp.headers.get("content-type", "image/jpeg")},
-                )
+            if found:
+                return found
         except requests.exceptions.RequestException:
             pass
         # Fallback to direct service inside compose network
-        direct = requests.get(
+        found = _fetch_photo(
             f"http://repartidores-service:8004/api/v1/repartidores/{rep_id}/photo",
             timeout=3,
-            stream=True,
         )
-        if direct.status_code == 200:
-            return (
-                direct.content,
-                direct.status_code,
-                {"Content-Type": direct.headers.get("content-type", "image/jpeg")},
-            )
-        return ("", 404)
+        return found or ("", 404)
     except Exception:
         return ("", 404)
 
@@ -2019,18 +2068,11 @@ def restaurante_photo(rest_id):
     try:
         # Skip API Gateway for photos - go directly to service
         # The gateway wraps binary responses in JSON which breaks images
-        direct = requests.get(
+        found = _fetch_photo(
             f"http://restaurantes-service:8002/api/v1/restaurantes/{rest_id}/photo",
             timeout=3,
-            stream=True,
         )
-        if direct.status_code == 200:
-            return (
-                direct.content,
-                direct.status_code,
-                {"Content-Type": direct.headers.get("content-type", "image/jpeg")},
-            )
-        return ("", 404)
+        return found or ("", 404)
     except Exception:
         return ("", 404)
 
@@ -2050,7 +2092,7 @@ def repartidor_dashboard():
     # attempt to refresh user id from /me if missing
     if not user_id:
         try:
-            me = requests.get(
+            me = http.get(
                 f"{API_GATEWAY_URL}/api/v1/auth/me",
                 headers={"Authorization": f"Bearer {session.get('access_token')}"},
                 timeout=4,
@@ -2081,20 +2123,20 @@ def repartidor_dashboard():
 
     # Try via gateway first, fallback to direct pedidos service
     try:
-        resp = requests.get(
+        resp = http.get(
             f"{API_GATEWAY_URL}/api/v1/repartidor/{user_id}/orders?year={year}&month={month}",
             headers={"Authorization": f"Bearer {session.get('access_token')}"},
             timeout=5,
         )
         if resp.status_code != 200:
             # fallback direct
-            resp = requests.get(
+            resp = http.get(
                 f"http://pedidos-service:8003/api/v1/repartidor/{user_id}/orders?year={year}&month={month}",
                 timeout=4,
             )
     except requests.exceptions.RequestException:
         try:
-            resp = requests.get(
+            resp = http.get(
                 f"http://pedidos-service:8003/api/v1/repartidor/{user_id}/orders?year={year}&month={month}",
                 timeout=4,
             )
@@ -2129,13 +2171,13 @@ def repartidor_dashboard():
     repartidor_data = None
     try:
         try:
-            rep_resp = requests.get(
+            rep_resp = http.get(
                 f"{API_GATEWAY_URL}/api/v1/repartidores/{user_id}",
                 headers={"Authorization": f"Bearer {session.get('access_token')}"},
                 timeout=2,
             )
         except requests.exceptions.RequestException:
-            rep_resp = requests.get(
+            rep_resp = http.get(
                 f"http://repartidores-service:8004/api/v1/repartidores/{user_id}",
                 timeout=3,
             )
@@ -2177,13 +2219,13 @@ def completar_pedido_repartidor(order_id):
 
     try:
         try:
-            resp = requests.post(
+            resp = http.post(
                 f"{API_GATEWAY_URL}/api/v1/pedidos/{order_id}/complete",
                 headers=headers,
                 timeout=2,
             )
         except requests.exceptions.RequestException:
-            resp = requests.post(
+            resp = http.post(
                 f"http://pedidos-service:8003/api/v1/pedidos/{order_id}/complete",
                 headers=headers,
                 timeout=5,
@@ -13,6 +13,8 @@ from bson.objectid import ObjectId
 import redis
 from dotenv import load_dotenv
 
+from common.metrics import instrument_app
+
 load_dotenv()
 
 SECRET_KEY = os.getenv("JWT_SECRET", "change-me-in-production")
@@ -59,6 +61,9 @@ class Token(BaseModel):
 
 app = FastAPI()
 
+# Métricas Prometheus en GET /metrics.
+instrument_app(app, service="authentication")
+
 
 def verify_password(plain_password, hashed_password):
     return PWD_CONTEXT.verify(plain_password, hashed_password)
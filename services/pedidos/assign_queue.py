@@ -0,0 +1,213 @@
+"""Event-driven repartidor assignment (``ASSIGN_QUEUE=redis``).
+
+Replaces the loop that polled every ``creado`` order every few seconds.
+Orders without a repartidor wait in a Redis sorted set per partition
+(``assign:waiting:{p}``, scored by creation time; partitions and their
+leaders come from :mod:`leader`). The dispatcher blocks on the two streams
+of :mod:`common.assign_events` and, on any event, drains the waiting sets
+it owns oldest first in batches of ``ASSIGN_BATCH_SIZE``: one
+``assign-batch`` call claims repartidores for the whole batch and one transaction stores
+them on the orders. Draining stops when fewer repartidores than orders
+come back. With nobody free it makes no further calls, and the next
+``assign:couriers`` event wakes it up.
+
+Every dispatcher reads every event (plain ``XREAD``, no consumer group):
+events are tiny, and a freed repartidor has to wake the leader of each
+partition. Order events for partitions owned by others are ignored.
+An order is only taken out of the waiting set after a repartidor was
+assigned to it, so a 204 never loses it. If two dispatchers still race for
+the same order (e.g. right after a failover), the loser gives its
+repartidor back.
+
+Lost events (Redis restarted, a publish that failed) are covered by a
+resync every ``ASSIGN_RESYNC_INTERVAL`` seconds, which re-adds the
+unassigned orders from Postgres. While Redis keeps failing, each failed
+round runs ``fallback`` instead (in pedidos, one round of the polling
+assigner), so orders are still assigned without the queue.
+"""
+
+import os
+import time
+from typing import Callable, Iterable, List, Optional, Set, Tuple
+
+from common import assign_events
+from leader import ASSIGN_LEADER_RETRY, PartitionLeases, partition_of
+
+ASSIGN_BLOCK_MS = int(os.getenv("ASSIGN_BLOCK_MS", "5000"))
+ASSIGN_RESYNC_INTERVAL = float(os.getenv("ASSIGN_RESYNC_INTERVAL", "60"))
+ASSIGN_BATCH_SIZE = int(os.getenv("ASSIGN_BATCH_SIZE", "100"))
+
+WAITING_KEY = "assign:waiting"
+
+
+class Dispatcher:
+    def __init__(
+        self,
+        client,
+        assign_batch: Callable[[int], List[dict]],
+        apply: Callable[[List[Tuple[str, dict]]], Set[str]],
+        release: Callable[[str], None],
+        unassigned: Callable[[], Iterable[Tuple[str, float]]],
+        leases: Optional[PartitionLeases] = None,
+        fallback: Optional[Callable[[], None]] = None,
+        fallback_interval: float = 5.0,
+    ):
+        """``assign_batch(n)`` claims up to ``n`` free repartidores,
+        ``apply`` stores ``(order_id, repartidor)`` pairs on the orders that
+        still wait for one and returns their ids, ``release`` frees a
+        repartidor again and ``unassigned`` lists ``(order_id, created_ts)``
+        from the database. Without ``leases`` this dispatcher owns the only
+        partition. ``fallback`` assigns straight from the database and runs
+        every ``fallback_interval`` seconds while the Redis rounds fail."""
+        self.client = client
+        self.assign_batch = assign_batch
+        self.apply = apply
+        self.release = release
+        self.unassigned = unassigned
+        self.leases = leases
+        self.fallback = fallback
+        self.fallback_interval = fallback_interval
+        self.partitions = leases.partitions if leases else 1
+        self.held: Set[int] = set() if leases else {0}
+        self._last_resync = 0.0
+        self._last_refresh = 0.0
+        self._last_ids = {
+            assign_events.ORDERS_STREAM: "$",
+            assign_events.COURIERS_STREAM: "$",
+        }
+
+    def _key(self, partition: int) -> str:
+        return f"{WAITING_KEY}:{partition}"
+
+    def add_waiting(self, order_id: str, created_ts: float) -> bool:
+        """Queue ``order_id`` if this dispatcher owns its partition."""
+        partition = partition_of(order_id, self.partitions)
+        if partition not in self.held:
+            return False
+        # nx: a resync must not move an order that is already waiting
+        self.client.zadd(self._key(partition), {order_id: created_ts}, nx=True)
+        return True
+
+    def drain(self, batch: int = ASSIGN_BATCH_SIZE) -> int:
+        """Assign free repartidores to waiting orders; returns how many."""
+        return sum(self._drain(self._key(p), batch) for p in sorted(self.held))
+
+    def _drain(self, key: str, batch: int) -> int:
+        assigned = 0
+        while True:
+            waiting = self.client.zrange(key, 0, batch - 1, withscores=True)
+            if not waiting:
+                return assigned
+            wanted = len(waiting)
+            reps = self.assign_batch(wanted)
+            if not reps:
+                return assigned
+            for extra in reps[wanted:]:
+                self.release(extra["id"])
+            waiting = [
+                (o.decode() if isinstance(o, bytes) else o, score)
+                for o, score in waiting[: len(reps)]
+            ]
+            # only the dispatcher that removes an order may keep its repartidor
+            pipe = self.client.pipeline(transaction=False)
+            for order_id, _ in waiting:
+                pipe.zrem(key, order_id)
+            removed = pipe.execute()
+            pairs, scores = [], {}
+            for (order_id, score), rep, ok in zip(waiting, reps, removed):
+                if ok:
+                    pairs.append((order_id, rep))
+                    scores[order_id] = score
+                else:
+                    self.release(rep["id"])
+            try:
+                applied = self.apply(pairs) if pairs else set()
+            except Exception:
+                for order_id, rep in pairs:
+                    self.release(rep["id"])
+                    self.add_waiting(order_id, scores[order_id])
+                raise
+            for order_id, rep in pairs:
+                # completed, deleted or assigned by the request itself meanwhile
+                if order_id not in applied:
+                    self.release(rep["id"])
+            assigned += len(applied)
+            if applied:
+                print(
+                    f"[PEDIDOS][ASSIGNER] assigned {len(applied)} waiting orders",
+                    flush=True,
+                )
+            if len(reps) < wanted:
+                # nobody else is free
+                return assigned
+
+    def resync(self) -> None:
+        for order_id, created_ts in self.unassigned():
+            self.add_waiting(order_id, created_ts)
+        self._last_resync = time.monotonic()
+        self.drain()
+
+    def refresh_leadership(self) -> None:
+        if self.leases is None:
+            return
+        held = self.leases.refresh()
+        if held - self.held:
+            # new partitions: load their backlog right away
+            self._last_resync = 0.0
+        self.held = held
+        self._last_refresh = time.monotonic()
+
+    def handle(self, stream: str, fields: dict) -> None:
+        if stream == assign_events.ORDERS_STREAM:
+            order_id = fields.get(b"order_id") or fields.get("order_id")
+            ts = fields.get(b"ts") or fields.get("ts") or time.time()
+            if order_id:
+                if isinstance(order_id, bytes):
+                    order_id = order_id.decode()
+                self.add_waiting(order_id, float(ts))
+        # a courier event needs no bookkeeping: drain() picks them up
+
+    def run_once(self) -> None:
+        if time.monotonic() - self._last_refresh >= ASSIGN_LEADER_RETRY:
+            self.refresh_leadership()
+        if not self.held:
+            # not a leader: stand by without reading events
+            time.sleep(ASSIGN_LEADER_RETRY)
+            return
+        if time.monotonic() - self._last_resync >= ASSIGN_RESYNC_INTERVAL:
+            self.resync()
+        batches = self.client.xread(
+            self._last_ids,
+            count=100,
+            block=min(ASSIGN_BLOCK_MS, 1000 * ASSIGN_LEADER_RETRY),
+        )
+        if not batches:
+            return
+        for stream, messages in batches:
+            if isinstance(stream, bytes):
+                stream = stream.decode()
+            for msg_id, fields in messages:
+                self.handle(stream, fields)
+                self._last_ids[stream] = msg_id
+        self.drain()
+
+    def step(self) -> None:
+        """:meth:`run_once`, falling back to ``fallback`` if it fails."""
+        try:
+            self.run_once()
+            return
+        except Exception as e:
+            print(f"[PEDIDOS][ASSIGNER] dispatcher error: {e}", flush=True)
+        if self.fallback is None:
+            time.sleep(1)
+            return
+        if self.held:
+            try:
+                self.fallback()
+            except Exception as e:
+                print(f"[PEDIDOS][ASSIGNER] fallback round failed: {e}", flush=True)
+        time.sleep(self.fallback_interval)
+
+    def run_forever(self) -> None:
+        while True:
+            self.step()
@@ -0,0 +1,6 @@
+import os
+import sys
+
+# Make the shared ``common`` package (repository root) importable in tests;
+# in the container it is provided through PYTHONPATH=/opt/shared.
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..", "..")))
@@ -0,0 +1,141 @@
+"""Leader election for the background assigner with Postgres advisory locks.
+
+Every pedidos worker and replica starts an assigner thread, but only the
+holders of a partition lock do any work. Orders are split into
+``ASSIGN_PARTITIONS`` partitions by the first 32 bits of their uuid;
+partition ``p`` is owned by whoever holds
+``pg_advisory_lock(LOCK_CLASS, p)``. With the default of one partition
+exactly one assigner runs cluster-wide. The Redis dispatcher only queues
+orders of its partitions, and the polling assigner only claims them
+(:func:`partition_filter` computes :func:`partition_of` in SQL).
+
+The locks live on one dedicated connection per process, opened from its
+own ``NullPool`` engine rather than the request pool, so holding it forever
+takes no slot from ``DB_POOL_SIZE``. If the process dies, Postgres drops
+the session and its locks, and another process takes
+over on its next :meth:`PartitionLeases.refresh` (failover within
+``ASSIGN_LEADER_RETRY`` seconds). A process without a partition grabs the
+first free one right away. A process that already owns one only takes
+another after seeing it free on two consecutive refreshes, which gives a
+replica that is just starting the first chance at it while still leaving
+no partition orphaned.
+
+On other databases (SQLite in development) there is a single process, so
+it owns every partition.
+"""
+
+import os
+import re
+from typing import Dict, Iterable, Set
+
+from sqlalchemy import create_engine, make_url, text
+from sqlalchemy.pool import NullPool
+
+ASSIGN_PARTITIONS = max(1, int(os.getenv("ASSIGN_PARTITIONS", "1")))
+ASSIGN_LEADER_RETRY = float(os.getenv("ASSIGN_LEADER_RETRY", "5"))
+
+# first key of the two-int advisory lock; the second is the partition
+LOCK_CLASS = 7301
+
+
+_HEX_PREFIX = re.compile(r"[0-9a-f]{8}")
+
+# partition_of in Postgres; ids that are not uuids all fall in partition 0
+_PARTITION_SQL = (
+    "(CASE WHEN orders.id ~ '^[0-9a-f]{8}' "
+    "THEN ('x' || substr(orders.id, 1, 8))::bit(32)::bigint ELSE 0 END) "
+    "% :partitions = ANY(:held)"
+)
+
+
+def partition_of(order_id: str, partitions: int = ASSIGN_PARTITIONS) -> int:
+    # not hash(): it has to agree across processes and with partition_filter
+    head = order_id[:8]
+    if not _HEX_PREFIX.fullmatch(head):
+        return 0
+    return int(head, 16) % partitions
+
+
+def partition_filter(partitions: int, held: Iterable[int]):
+    """Postgres condition on ``orders.id`` selecting the ``held`` partitions."""
+    return text(_PARTITION_SQL).bindparams(partitions=partitions, held=sorted(held))
+
+
+class PartitionLeases:
+    def __init__(self, url: str, partitions: int = ASSIGN_PARTITIONS):
+        self.url = url
+        self.postgres = make_url(url).get_backend_name() == "postgresql"
+        self.partitions = partitions
+        self._engine = None
+        self.held: Set[int] = set()
+        self._conn = None
+        self._seen_free: Dict[int, int] = {}
+
+    def _connection(self):
+        if self._conn is None:
+            if self._engine is None:
+                self._engine = create_engine(self.url, poolclass=NullPool)
+            self._conn = self._engine.connect()
+        return self._conn
+
+    def _drop_connection(self) -> None:
+        if self._conn is not None:
+            try:
+                self._conn.close()
+            except Exception:
+                pass
+        self._conn = None
+        self.held = set()
+
+    def _try_lock(self, partition: int) -> bool:
+        conn = self._connection()
+        got = conn.execute(
+            text("SELECT pg_try_advisory_lock(:cls, :part)"),
+            {"cls": LOCK_CLASS, "part": partition},
+        ).scalar()
+        # session-level lock: it survives the commit, the transaction must not
+        conn.commit()
+        return bool(got)
+
+    def _free_partitions(self) -> Set[int]:
+        conn = self._connection()
+        taken = conn.execute(
+            text(
+                "SELECT objid FROM pg_locks WHERE locktype = 'advisory' "
+                "AND classid = :cls AND objsubid = 2 AND granted"
+            ),
+            {"cls": LOCK_CLASS},
+        ).scalars()
+        taken = {int(objid) for objid in taken}
+        conn.commit()
+        return set(range(self.partitions)) - taken
+
+    def refresh(self) -> Set[int]:
+        """Check the held locks and take free partitions; returns the held set."""
+        if not self.postgres:
+            self.held = set(range(self.partitions))
+            return self.held
+        try:
+            free = self._free_partitions()
+            if not self.held:
+                for partition in sorted(free):
+                    if self._try_lock(partition):
+                        self.held.add(partition)
+                        break
+            else:
+                for partition in list(self._seen_free):
+                    if partition not in free:
+                        del self._seen_free[partition]
+                for partition in free:
+                    self._seen_free[partition] = self._seen_free.get(partition, 0) + 1
+                    if self._seen_free[partition] >= 2 and self._try_lock(partition):
+                        self.held.add(partition)
+                        del self._seen_free[partition]
+        except Exception as e:
+            # the connection is gone and the locks with it
+            print(f"[PEDIDOS][ASSIGNER] lost leader connection: {e}", flush=True)
+            self._drop_connection()
+        return set(self.held)
+
+    def owns(self, order_id: str) -> bool:
+        return partition_of(order_id, self.partitions) in self.held
@@ -1,5 +1,5 @@
 from sqlalchemy.orm import declarative_base, relationship
-from sqlalchemy import Column, String, Integer, ForeignKey, Numeric
+from sqlalchemy import Column, String, Integer, ForeignKey, Numeric, Index, and_
 from sqlalchemy import DateTime
 from datetime import datetime
 
@@ -22,12 +22,29 @@ class OrderORM(Base):
     repartidor_id = Column(String, nullable=True)
     repartidor_nombre = Column(String, nullable=True)
     repartidor_telefono = Column(String, nullable=True)
+    # stored at creation (see order_totals.py); NULL until backfilled
+    total = Column(Numeric(10, 2), nullable=True)
+    items_count = Column(Integer, nullable=True)
+    courier_fee = Column(Numeric(10, 2), nullable=True)
 
     items = relationship(
         "OrderItemORM", back_populates="order", cascade="all, delete-orphan"
     )
 
 
+# Partial index over the orders still waiting for a repartidor: it stays as
+# small as the backlog, and its (created_at, id) order is the assigner's claim
+# order, so claiming a batch reads only that many index entries.
+_pending = and_(OrderORM.estado == "creado", OrderORM.repartidor_id.is_(None))
+PENDING_ORDERS_INDEX = Index(
+    "ix_orders_pending",
+    OrderORM.created_at,
+    OrderORM.id,
+    postgresql_where=_pending,
+    sqlite_where=_pending,
+)
+
+
 class OrderItemORM(Base):
     __tablename__ = "order_items"
 
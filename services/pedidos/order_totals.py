@@ -0,0 +1,76 @@
+"""Order totals stored on the order row.
+
+``orders.total``, ``orders.items_count`` (lines in the order) and
+``orders.courier_fee`` (the repartidor's ``COURIER_FEE_RATE`` share of the
+total) are written once when the order is created, so the restaurant and
+repartidor dashboards aggregate order rows without reading ``order_items``.
+
+Tables created before these columns existed get them from
+:func:`add_total_columns`, and :func:`backfill_totals` fills the rows that
+are still ``NULL`` from their items in small batches, so no long lock is
+held on ``orders``. Both run at startup and are idempotent.
+"""
+
+import os
+from decimal import ROUND_HALF_UP, Decimal
+from typing import Iterable, Tuple
+
+from sqlalchemy import inspect, text
+
+COURIER_FEE_RATE = Decimal(os.getenv("COURIER_FEE_RATE", "0.10"))
+BACKFILL_BATCH = int(os.getenv("ORDER_TOTALS_BACKFILL_BATCH", "500"))
+
+CENT = Decimal("0.01")
+
+_COLUMNS = {
+    "total": "NUMERIC(10, 2)",
+    "items_count": "INTEGER",
+    "courier_fee": "NUMERIC(10, 2)",
+}
+
+_LINES_TOTAL = (
+    "(SELECT SUM(oi.precio * oi.cantidad) FROM order_items oi "
+    "WHERE oi.order_id = orders.id)"
+)
+_BACKFILL = text(
+    f"""
+    UPDATE orders SET
+        total = ROUND(COALESCE({_LINES_TOTAL}, 0), 2),
+        items_count = (SELECT COUNT(*) FROM order_items oi
+                       WHERE oi.order_id = orders.id),
+        courier_fee = ROUND(COALESCE({_LINES_TOTAL}, 0) * :rate, 2)
+    WHERE id IN (SELECT id FROM orders WHERE total IS NULL LIMIT :batch)
+    """
+)
+
+
+def compute_totals(lines: Iterable[Tuple[object, int]]) -> Tuple[Decimal, int, Decimal]:
+    """``(total, items_count, courier_fee)`` for ``(precio, cantidad)`` lines."""
+    total, count = Decimal("0"), 0
+    for precio, cantidad in lines:
+        total += Decimal(str(precio)) * int(cantidad)
+        count += 1
+    total = total.quantize(CENT, rounding=ROUND_HALF_UP)
+    fee = (total * COURIER_FEE_RATE).quantize(CENT, rounding=ROUND_HALF_UP)
+    return total, count, fee
+
+
+def add_total_columns(engine) -> None:
+    existing = {c["name"] for c in inspect(engine).get_columns("orders")}
+    with engine.begin() as conn:
+        for name, ddl_type in _COLUMNS.items():
+            if name not in existing:
+                conn.execute(text(f"ALTER TABLE orders ADD COLUMN {name} {ddl_type}"))
+
+
+def backfill_totals(engine, batch: int = BACKFILL_BATCH) -> int:
+    """Fill the totals of orders that predate the columns; returns how many."""
+    filled = 0
+    while True:
+        with engine.begin() as conn:
+            updated = conn.execute(
+                _BACKFILL, {"rate": float(COURIER_FEE_RATE), "batch": batch}
+            ).rowcount
+        filled += updated
+        if updated < batch:
+            return filled
@@ -0,0 +1,104 @@
+from datetime import datetime
+from decimal import Decimal
+
+from fastapi.testclient import TestClient
+from sqlalchemy import create_engine, event, text
+from sqlalchemy.orm import sessionmaker
+from sqlalchemy.pool import StaticPool
+
+import main as pedidos_main
+import order_totals
+from models import Base, OrderItemORM, OrderORM
+
+
+def test_backfill_fills_legacy_rows_from_their_items():
+    engine = create_engine("sqlite://")
+    with engine.begin() as conn:
+        # the tables as they were before the totals columns
+        conn.execute(text("CREATE TABLE orders (id VARCHAR PRIMARY KEY)"))
+        conn.execute(
+            text(
+                "CREATE TABLE order_items (id INTEGER PRIMARY KEY, order_id VARCHAR,"
+                " precio NUMERIC, cantidad INTEGER)"
+            )
+        )
+        conn.execute(text("INSERT INTO orders VALUES ('o1'), ('o2'), ('empty')"))
+        conn.execute(
+            text(
+                "INSERT INTO order_items (order_id, precio, cantidad) VALUES"
+                " ('o1', 7.5, 2), ('o1', 1.25, 1), ('o2', 10, 3)"
+            )
+        )
+    order_totals.add_total_columns(engine)
+    order_totals.add_total_columns(engine)  # idempotent
+    assert order_totals.backfill_totals(engine, batch=2) == 3
+    assert order_totals.backfill_totals(engine) == 0
+    with engine.connect() as conn:
+        rows = conn.execute(
+            text("SELECT id, total, items_count, courier_fee FROM orders ORDER BY id")
+        ).all()
+    assert [(r[0], float(r[1]), r[2], float(r[3])) for r in rows] == [
+        ("empty", 0.0, 0, 0.0),
+        ("o1", 16.25, 2, 1.63),
+        ("o2", 30.0, 1, 3.0),
+    ]
+
+
+def test_dashboards_read_totals_from_order_rows(monkeypatch):
+    engine = create_engine(
+        "sqlite://",
+        connect_args={"check_same_thread": False},
+        poolclass=StaticPool,
+    )
+    Base.metadata.create_all(bind=engine)
+    Session = sessionmaker(bind=engine)
+    total, count, fee = order_totals.compute_totals([(Decimal("7.5"), 2)])
+    with Session() as db:
+        db.add(
+            OrderORM(
+                id="o1",
+                restaurante_id="rest1",
+                direccion="Calle 1",
+                estado="asignado",
+                repartidor_id="rep1",
+                created_at=datetime(2024, 5, 3),
+                total=total,
+                items_count=count,
+                courier_fee=fee,
+            )
+        )
+        db.add(
+            OrderItemORM(
+                order_id="o1", item_id="p1", nombre="Pizza", precio=7.5, cantidad=2
+            )
+        )
+        db.commit()
+
+    statements = []
+    event.listen(
+        engine, "before_cursor_execute", lambda *args: statements.append(args[2])
+    )
+
+    def get_db():
+        with Session() as db:
+            yield db
+
+    pedidos_main.app.dependency_overrides[pedidos_main.get_db] = get_db
+    try:
+        client = TestClient(pedidos_main.app)
+        resp = client.get(
+            "/api/v1/repartidor/rep1/orders",
+            params={"year": 2024, "month": 5, "include_items": "false"},
+        )
+        body = resp.json()
+        assert body["gain_current"] == 1.5
+        assert body["orders"][0]["total"] == 15.0
+        assert "items" not in body["orders"][0]
+        assert not any("order_items" in s for s in statements)
+
+        resp = client.get("/api/v1/restaurante/rest1/orders")
+        body = resp.json()
+        assert body["stats_month"]["total"] == 15.0
+        assert body["orders"][0]["items"][0]["subtotal"] == 15.0
+    finally:
+        pedidos_main.app.dependency_overrides.clear()
@@ -44,5 +44,98 @@ def test_create_pedido_fails_when_item_out_of_stock(monkeypatch):
     assert "sin stock" in body.get("detail", "").lower()
 
 
+def _sqlite_sessions(monkeypatch):
+    from sqlalchemy import create_engine, event
+    from sqlalchemy.orm import sessionmaker
+    from sqlalchemy.pool import StaticPool
+
+    from models import Base
+
+    engine = create_engine(
+        "sqlite://", connect_args={"check_same_thread": False}, poolclass=StaticPool
+    )
+    # enforce order_items.order_id like Postgres does
+    event.listen(
+        engine, "connect", lambda conn, _: conn.execute("PRAGMA foreign_keys=ON")
+    )
+    Base.metadata.create_all(bind=engine)
+    Session = sessionmaker(bind=engine)
+    monkeypatch.setattr(pedidos_main, "SessionLocal", Session)
+    return Session
+
+
+def _fake_restaurantes(monkeypatch, confirm):
+    """Reserve succeeds, confirm is answered by ``confirm()``; returns the
+    list of cancelled reservation ids."""
+    cancelled = []
+
+    def fake_post(url, json=None, timeout=3, params=None):
+        if url.endswith("/reservations"):
+            item = {"id": "p1", "nombre": "Pizza", "precio": 7.5, "reservado": 1}
+            return DummyResponse(200, json_data={"items": [item]})
+        if url.endswith("/confirm"):
+            return confirm()
+        if url.endswith("/cancel"):
+            cancelled.append(url.rsplit("/", 2)[-2])
+            return DummyResponse(200, json_data={})
+        return DummyResponse(204)
+
+    monkeypatch.setattr(
+        pedidos_main.requests, "get", lambda *a, **k: DummyResponse(404)
+    )
+    monkeypatch.setattr(pedidos_main.requests, "post", fake_post)
+    monkeypatch.setattr(
+        pedidos_main.assign_events, "publish_order_pending", lambda order_id: None
+    )
+    return cancelled
+
+
+PAYLOAD = {
+    "restaurante_id": "rest1",
+    "cliente_email": "test@example.com",
+    "direccion": "Calle Test 1",
+    "items": [{"item_id": "p1", "cantidad": 1}],
+}
+
+
+def test_rejected_confirm_deletes_order_and_cancels_hold(monkeypatch):
+    from models import OrderItemORM, OrderORM
+
+    Session = _sqlite_sessions(monkeypatch)
+    cancelled = _fake_restaurantes(monkeypatch, lambda: DummyResponse(409))
+
+    resp = client.post("/api/v1/pedidos", json=PAYLOAD)
+    assert resp.status_code == 500
+    with Session() as db:
+        assert db.query(OrderORM).count() == 0
+        assert db.query(OrderItemORM).count() == 0
+    assert len(cancelled) == 1
+
+
+def test_unknown_confirm_keeps_order_and_retries(monkeypatch):
+    from models import OrderORM
+
+    Session = _sqlite_sessions(monkeypatch)
+
+    def unreachable():
+        raise pedidos_main.requests.ConnectionError("timeout")
+
+    cancelled = _fake_restaurantes(monkeypatch, unreachable)
+    retried = []
+    monkeypatch.setattr(
+        pedidos_main,
+        "_confirm_in_background",
+        lambda url, order_id: retried.append(order_id),
+    )
+
+    resp = client.post("/api/v1/pedidos", json=PAYLOAD)
+    assert resp.status_code == 200
+    order_id = resp.json()["id"]
+    # the confirm may have gone through: no cancel, keep retrying it
+    assert cancelled == [] and retried == [order_id]
+    with Session() as db:
+        assert db.get(OrderORM, order_id) is not None
+
+
 if __name__ == "__main__":
     pytest.main([__file__])
@@ -0,0 +1,37 @@
+import os
+import sys
+
+import pytest
+
+# Make the shared ``common`` package (repository root) importable in tests;
+# in the container it is provided through PYTHONPATH=/opt/shared.
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..", "..")))
+
+
+@pytest.fixture
+def client(monkeypatch):
+    from fastapi.testclient import TestClient
+    from sqlalchemy import create_engine
+    from sqlalchemy.orm import sessionmaker
+    from sqlalchemy.pool import StaticPool
+
+    import main
+    from models import Base, RepartidorORM
+
+    # in-memory SQLite stands in for Postgres (FOR UPDATE is a no-op there)
+    engine = create_engine(
+        "sqlite://", connect_args={"check_same_thread": False}, poolclass=StaticPool
+    )
+    Base.metadata.create_all(bind=engine)
+    session_factory = sessionmaker(autocommit=False, autoflush=False, bind=engine)
+    db = session_factory()
+    for rep_id, nombre, estado in [
+        ("r1", "Carlos", "disponible"),
+        ("r2", "Ana", "ocupado"),
+        ("r3", "Luis", "disponible"),
+    ]:
+        db.add(RepartidorORM(id=rep_id, nombre=nombre, estado=estado))
+    db.commit()
+    db.close()
+    monkeypatch.setattr(main, "SessionLocal", session_factory)
+    return TestClient(main.app)
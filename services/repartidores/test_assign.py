@@ -0,0 +1,32 @@
+def _estados(client):
+    reps = client.get("/api/v1/repartidores").json()["repartidores"]
+    return {r["id"]: r["estado"] for r in reps}
+
+
+def test_assign_next_takes_one_and_then_reports_none(client):
+    assert client.post("/api/v1/repartidores/assign-next").json()["id"] == "r1"
+    assert client.post("/api/v1/repartidores/assign-next").json()["id"] == "r3"
+    assert client.post("/api/v1/repartidores/assign-next").status_code == 204
+
+
+def test_assign_batch_claims_only_the_free_ones(client):
+    resp = client.post("/api/v1/repartidores/assign-batch", params={"n": 5})
+    assert resp.status_code == 200
+    claimed = resp.json()["repartidores"]
+    assert [r["id"] for r in claimed] == ["r1", "r3"]
+    assert {r["estado"] for r in claimed} == {"ocupado"}
+    # claimed repartidores are no longer disponible
+    assert "disponible" not in _estados(client).values()
+    again = client.post("/api/v1/repartidores/assign-batch", params={"n": 5})
+    assert again.json() == {"repartidores": []}
+
+
+def test_assign_batch_bounds_n(client):
+    for n in (0, -3):
+        resp = client.post("/api/v1/repartidores/assign-batch", params={"n": n})
+        assert resp.status_code == 422
+    assert _estados(client) == {"r1": "disponible", "r2": "ocupado", "r3": "disponible"}
+    # without n it claims a single repartidor
+    resp = client.post("/api/v1/repartidores/assign-batch")
+    assert [r["id"] for r in resp.json()["repartidores"]] == ["r1"]
+    assert _estados(client)["r3"] == "disponible"
@@ -0,0 +1,165 @@
+"""Two-tier read cache for restaurant records and menus.
+
+Tier 1 is a small in-process LRU with a very short TTL
+(``CATALOG_CACHE_LOCAL_TTL``); tier 2 is Redis (``CATALOG_CACHE_REDIS_URL``),
+shared by every worker and replica. A miss in both tiers loads from
+Postgres and fills both.
+
+Keys per restaurant:
+
+- ``rest:{id}``: the restaurant record
+- ``menu:{id}``: the menu with stock (``cantidad``)
+- ``menumeta:{id}``: the menu without stock, for reads that only show
+  names and prices; it survives reserve/release traffic
+
+Writes invalidate after committing: menu and restaurant edits drop every
+key of the restaurant, stock movements only ``menu:{id}``. Other workers'
+tier 1 copies are not notified and live at most the local TTL; a reader that
+loaded just before a write can also put back a stale value, bounded by the
+same TTLs.
+"""
+
+import json
+import os
+import threading
+import time
+from collections import OrderedDict
+from typing import Callable, Optional
+
+CATALOG_CACHE_ENABLED = os.getenv("CATALOG_CACHE_ENABLED", "1") == "1"
+CATALOG_CACHE_LOCAL_TTL = float(os.getenv("CATALOG_CACHE_LOCAL_TTL", "2"))
+CATALOG_CACHE_TTL = float(os.getenv("CATALOG_CACHE_TTL", "30"))
+CATALOG_CACHE_MAX_ENTRIES = int(os.getenv("CATALOG_CACHE_MAX_ENTRIES", "2000"))
+CATALOG_CACHE_REDIS_URL = os.getenv("CATALOG_CACHE_REDIS_URL")
+
+
+class _LocalTier:
+    def __init__(self, ttl: float, max_entries: int):
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self._entries: "OrderedDict[str, tuple]" = OrderedDict()
+        # sync endpoints run in a thread pool
+        self._lock = threading.Lock()
+
+    def get(self, key: str):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            expires_at, value = entry
+            if expires_at <= time.monotonic():
+                self._entries.pop(key, None)
+                return None
+            self._entries.move_to_end(key)
+            return value
+
+    def set(self, key: str, value) -> None:
+        with self._lock:
+            self._entries[key] = (time.monotonic() + self.ttl, value)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def delete(self, *keys: str) -> None:
+        with self._lock:
+            for key in keys:
+                self._entries.pop(key, None)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+
+
+class CatalogCache:
+    def __init__(
+        self,
+        local_ttl: float = CATALOG_CACHE_LOCAL_TTL,
+        redis_client=None,
+        redis_ttl: float = CATALOG_CACHE_TTL,
+        max_entries: int = CATALOG_CACHE_MAX_ENTRIES,
+        namespace: str = "catalog:",
+    ):
+        self.local = _LocalTier(local_ttl, max_entries)
+        self.redis = redis_client
+        self.redis_ttl = redis_ttl
+        self.namespace = namespace
+        self.hits = 0
+        self.misses = 0
+
+    def get_or_load(self, key: str, loader: Callable[[], Optional[dict]]):
+        """Return the cached value, or ``loader()`` (cached unless ``None``)."""
+        value = self.local.get(key)
+        if value is not None:
+            self.hits += 1
+            return value
+        if self.redis is not None:
+            try:
+                raw = self.redis.get(self.namespace + key)
+            except Exception:
+                # a cache outage must never fail the read
+                raw = None
+            if raw:
+                value = json.loads(raw)
+                self.local.set(key, value)
+                self.hits += 1
+                return value
+        self.misses += 1
+        value = loader()
+        if value is not None:
+            self.local.set(key, value)
+            if self.redis is not None:
+                try:
+                    self.redis.set(
+                        self.namespace + key,
+                        json.dumps(value),
+                        px=max(1, int(self.redis_ttl * 1000)),
+                    )
+                except Exception:
+                    pass
+        return value
+
+    def delete(self, *keys: str) -> None:
+        self.local.delete(*keys)
+        if self.redis is not None:
+            try:
+                self.redis.delete(*[self.namespace + k for k in keys])
+            except Exception:
+                pass
+
+    def invalidate_restaurant(self, rest_id: str) -> None:
+        self.delete(f"rest:{rest_id}", f"menu:{rest_id}", f"menumeta:{rest_id}")
+
+    def invalidate_stock(self, *rest_ids: str) -> None:
+        if rest_ids:
+            self.delete(*[f"menu:{rest_id}" for rest_id in rest_ids])
+
+    def clear(self) -> None:
+        self.local.clear()
+
+    def stats(self) -> dict:
+        return {"hits": self.hits, "misses": self.misses}
+
+
+def from_env() -> Optional[CatalogCache]:
+    if not CATALOG_CACHE_ENABLED:
+        return None
+    client = None
+    if CATALOG_CACHE_REDIS_URL:
+        import redis
+
+        client = redis.from_url(CATALOG_CACHE_REDIS_URL)
+    return CatalogCache(redis_client=client)
+
+
+# Caché del proceso: None desactiva la caché y cada lectura va a Postgres.
+cache = from_env()
+
+
+def invalidate_restaurant(rest_id: str) -> None:
+    if cache is not None:
+        cache.invalidate_restaurant(rest_id)
+
+
+def invalidate_stock(*rest_ids: str) -> None:
+    if cache is not None:
+        cache.invalidate_stock(*rest_ids)
@@ -0,0 +1,41 @@
+import os
+import sys
+
+import pytest
+
+# Make the shared ``common`` package (repository root) importable in tests;
+# in the container it is provided through PYTHONPATH=/opt/shared.
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..", "..")))
+
+
+@pytest.fixture
+def client(monkeypatch):
+    from fastapi.testclient import TestClient
+    from sqlalchemy import create_engine
+    from sqlalchemy.orm import sessionmaker
+    from sqlalchemy.pool import StaticPool
+
+    import catalog_cache
+    import database_sql
+    from main import app
+    from models import Base, MenuItemORM, RestauranteORM
+
+    # in-memory SQLite stands in for Postgres (FOR UPDATE is a no-op there)
+    engine = create_engine(
+        "sqlite://", connect_args={"check_same_thread": False}, poolclass=StaticPool
+    )
+    Base.metadata.create_all(bind=engine)
+    session_factory = sessionmaker(autocommit=False, autoflush=False, bind=engine)
+    db = session_factory()
+    db.add(RestauranteORM(id="rest1", nombre="Pizzeria"))
+    db.add(
+        MenuItemORM(id="p1", restaurante_id="rest1", nombre="A", precio=5, cantidad=3)
+    )
+    db.add(
+        MenuItemORM(id="p2", restaurante_id="rest1", nombre="B", precio=7, cantidad=1)
+    )
+    db.commit()
+    db.close()
+    monkeypatch.setattr(database_sql, "SessionLocal", session_factory)
+    monkeypatch.setattr(catalog_cache, "cache", catalog_cache.CatalogCache())
+    return TestClient(app)
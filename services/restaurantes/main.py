@@ -1,15 +1,36 @@
-from fastapi import FastAPI, HTTPException, UploadFile, File, Request
-from fastapi.responses import FileResponse
+from fastapi import Depends, FastAPI, HTTPException, UploadFile, File, Request
 from typing import Optional
 from sqlalchemy.orm import Session
+import catalog_cache
 import database_sql
-from models import RestauranteORM, MenuItemORM
+from database_sql import get_db
+import reservations
+import search
+import stock_engine
+from models import RestauranteORM, MenuItemORM, ReleaseRequest, ReservationRequest
+from common.media import MediaStore, UploadLimitMiddleware
+from common.metrics import instrument_app
 import time
 import os
-import shutil
+import threading
 
 app = FastAPI()
 
+# Métricas Prometheus en GET /metrics (HTTP; el pool lo registra database_sql).
+instrument_app(app, service="restaurantes")
+# 413 para fotos demasiado grandes antes de leer el cuerpo.
+app.add_middleware(UploadLimitMiddleware)
+
+_photo_stores = {}
+
+
+def _photos() -> MediaStore:
+    # relative to the working directory, like the rest of ./data
+    root = os.path.join(os.getcwd(), "data", "restaurante_photos")
+    if root not in _photo_stores:
+        _photo_stores[root] = MediaStore(root)
+    return _photo_stores[root]
+
 
 def seed_db_if_empty() -> None:
     db: Session = database_sql.SessionLocal()
@@ -94,8 +115,7 @@ def seed_db_if_empty() -> None:
 @app.on_event("startup")
 def startup() -> None:
     # Create photos directory if it doesn't exist
-    photos_dir = os.path.join(os.getcwd(), "data", "restaurante_photos")
-    os.makedirs(photos_dir, exist_ok=True)
+    _photos()
 
     # Try to create tables and seed with a small retry loop for DB readiness
     attempts = 0
@@ -107,196 +127,411 @@ def startup() -> None:
         except Exception:
             attempts += 1
             time.sleep(1)
+    try:
+        search.create_search_indexes(database_sql.engine)
+    except Exception as e:
+        # listing keeps working with the plain ILIKE filter
+        print(f"[RESTAURANTES][SEARCH] search indexes not created: {e}", flush=True)
+
+
+RESERVATION_SWEEP_INTERVAL = int(os.getenv("RESERVATION_SWEEP_INTERVAL", "30"))
+
+
+def _reservation_sweeper_loop():
+    while True:
+        try:
+            db = database_sql.SessionLocal()
+            try:
+                # drain in batches so a large backlog is cleared in one pass
+                while True:
+                    expired = reservations.sweep_expired(db)
+                    if expired:
+                        print(
+                            f"[RESTAURANTES][SWEEPER] expired {expired} reservations",
+                            flush=True,
+                        )
+                    if expired < reservations.RESERVATION_SWEEP_BATCH:
+                        break
+            finally:
+                db.close()
+        except Exception as e:
+            print(f"[RESTAURANTES][SWEEPER] sweep failed: {e}", flush=True)
+        time.sleep(RESERVATION_SWEEP_INTERVAL)
+
+
+@app.on_event("startup")
+def start_reservation_sweeper():
+    t = threading.Thread(
+        target=_reservation_sweeper_loop, daemon=True, name="reservation-sweeper"
+    )
+    t.start()
+
+
+def _stock_maintenance_loop():
+    while True:
+        try:
+            stock_engine.stock.run_maintenance()
+        except Exception as e:
+            print(f"[RESTAURANTES][STOCK] maintenance failed: {e}", flush=True)
+        time.sleep(stock_engine.STOCK_FLUSH_INTERVAL)
+
+
+@app.on_event("startup")
+def start_stock_maintenance():
+    # write-behind of the Redis counters and periodic reconciliation
+    if stock_engine.stock is None:
+        return
+    t = threading.Thread(
+        target=_stock_maintenance_loop, daemon=True, name="stock-maintenance"
+    )
+    t.start()
 
 
 @app.get("/api/v1/restaurantes")
-def list_restaurantes(q: Optional[str] = None, limit: int = 20):
-    db: Session = database_sql.SessionLocal()
-    try:
-        query = db.query(RestauranteORM)
-        if q:
-            like = f"%{q}%"
-            query = query.filter(
-                RestauranteORM.nombre.ilike(like)
-                | RestauranteORM.descripcion.ilike(like)
-            )
-        rows = query.limit(max(1, limit)).all()
-        return {"restaurantes": [r.to_dict() for r in rows]}
-    finally:
-        db.close()
+def list_restaurantes(
+    q: Optional[str] = None,
+    limit: int = 20,
+    cursor: Optional[str] = None,
+    fields: Optional[str] = None,
+    format: str = "objects",
+    db: Session = Depends(get_db),
+):
+    """List restaurants, ranked by relevance when ``q`` is given and by
+    rating otherwise.
+
+    Pass the returned ``next_cursor`` as ``cursor`` to get the next page;
+    it is ``null`` on the last one. ``fields=nombre,rating`` returns only
+    those columns (plus ``id``); ``format=compact`` returns
+    ``{"fields": [...], "rows": [[...]]}`` instead of one object per row.
+    """
+    if format not in ("objects", "compact"):
+        raise HTTPException(status_code=400, detail="Formato desconocido")
+    columns = search.parse_fields(fields)
+    rows, next_cursor = search.list_page(db, q, limit, cursor, columns)
+    if format == "compact":
+        return {**search.to_compact(rows, columns), "next_cursor": next_cursor}
+    return {"restaurantes": rows, "next_cursor": next_cursor}
+
+
+@app.get("/api/v1/restaurantes/autocomplete")
+def autocomplete_restaurantes(
+    q: str = "", limit: int = 8, db: Session = Depends(get_db)
+):
+    """Restaurant names for the search box as the user types."""
+    return {"sugerencias": search.autocomplete(db, q, limit)}
 
 
 @app.get("/api/v1/restaurantes/by-user/{user_id}")
-def get_restaurante_by_user(user_id: str):
+def get_restaurante_by_user(user_id: str, db: Session = Depends(get_db)):
     """Get restaurant by user_id."""
-    db = database_sql.SessionLocal()
-    try:
-        r = db.query(RestauranteORM).filter(RestauranteORM.user_id == user_id).first()
-        if not r:
-            raise HTTPException(
-                status_code=404, detail="No se encontró restaurante para este usuario"
-            )
-        return r.to_dict()
-    finally:
-        db.close()
+    r = db.query(RestauranteORM).filter(RestauranteORM.user_id == user_id).first()
+    if not r:
+        raise HTTPException(
+            status_code=404, detail="No se encontró restaurante para este usuario"
+        )
+    return r.to_dict()
 
 
 @app.get("/api/v1/restaurantes/{rest_id}")
 def get_restaurante(rest_id: str):
-    db = database_sql.SessionLocal()
-    try:
-        r = db.query(RestauranteORM).filter(RestauranteORM.id == rest_id).first()
-        if not r:
-            raise HTTPException(status_code=404, detail="Restaurante no encontrado")
-        return r.to_dict()
-    finally:
-        db.close()
+    def load():
+        db = database_sql.SessionLocal()
+        try:
+            r = db.query(RestauranteORM).filter(RestauranteORM.id == rest_id).first()
+            return r.to_dict() if r else None
+        finally:
+            db.close()
+
+    if catalog_cache.cache is not None:
+        r = catalog_cache.cache.get_or_load(f"rest:{rest_id}", load)
+    else:
+        r = load()
+    if r is None:
+        raise HTTPException(status_code=404, detail="Restaurante no encontrado")
+    return r
 
 
 @app.get("/api/v1/restaurantes/{rest_id}/menu")
-def get_menu(rest_id: str):
-    db = database_sql.SessionLocal()
-    try:
-        items = (
-            db.query(MenuItemORM).filter(MenuItemORM.restaurante_id == rest_id).all()
-        )
-        return {"menu": [i.to_dict() for i in items]}
-    finally:
-        db.close()
+def get_menu(rest_id: str, include_stock: bool = True):
+    """Menu of a restaurant. ``include_stock=false`` leaves out ``cantidad``
+    and is served from a cache entry that stock movements do not invalidate."""
+
+    def load():
+        db = database_sql.SessionLocal()
+        try:
+            items = (
+                db.query(MenuItemORM)
+                .filter(MenuItemORM.restaurante_id == rest_id)
+                .all()
+            )
+            menu = [i.to_dict() for i in items]
+        finally:
+            db.close()
+        if not include_stock:
+            for i in menu:
+                i.pop("cantidad")
+        return menu
+
+    key = f"menu:{rest_id}" if include_stock else f"menumeta:{rest_id}"
+    if catalog_cache.cache is not None:
+        # cached entries are shared: copy before changing anything below
+        menu = [dict(i) for i in catalog_cache.cache.get_or_load(key, load)]
+    else:
+        menu = load()
+    if include_stock and stock_engine.stock is not None:
+        # live counters: menu_items.cantidad lags behind by the flush interval
+        levels = stock_engine.stock.levels(rest_id, [i["id"] for i in menu])
+        for i in menu:
+            i["cantidad"] = levels.get(i["id"], i["cantidad"])
+    return {"menu": menu}
 
 
 @app.post("/api/v1/restaurantes")
-def create_restaurante(payload: dict, request: Request):
+def create_restaurante(payload: dict, request: Request, db: Session = Depends(get_db)):
     """Create a restaurant. Expects JSON with at least 'nombre'. If 'id' is provided it will be used, otherwise generated."""
-    db = database_sql.SessionLocal()
-    try:
-        nombre = payload.get("nombre") if isinstance(payload, dict) else None
-        if not nombre:
-            raise HTTPException(status_code=400, detail="'nombre' is required")
-        rest_id = payload.get("id") or f"rest_{int(time.time() * 1000)}"
-        existing = db.query(RestauranteORM).filter(RestauranteORM.id == rest_id).first()
-        if existing:
-            raise HTTPException(
-                status_code=400, detail="Restaurante with given id already exists"
-            )
+    nombre = payload.get("nombre") if isinstance(payload, dict) else None
+    if not nombre:
+        raise HTTPException(status_code=400, detail="'nombre' is required")
+    rest_id = payload.get("id") or f"rest_{int(time.time() * 1000)}"
+    existing = db.query(RestauranteORM).filter(RestauranteORM.id == rest_id).first()
+    if existing:
+        raise HTTPException(
+            status_code=400, detail="Restaurante with given id already exists"
+        )
 
-        # Get user_id from headers (set by API Gateway from JWT token)
-        user_id = request.headers.get("X-User-Id")
+    # Get user_id from headers (set by API Gateway from JWT token)
+    user_id = request.headers.get("X-User-Id")
 
-        r = RestauranteORM(
-            id=rest_id,
-            nombre=nombre,
-            direccion=payload.get("direccion"),
-            descripcion=payload.get("descripcion"),
-            user_id=user_id,
-        )
-        db.add(r)
-        db.commit()
-        return r.to_dict()
-    finally:
-        db.close()
+    r = RestauranteORM(
+        id=rest_id,
+        nombre=nombre,
+        direccion=payload.get("direccion"),
+        descripcion=payload.get("descripcion"),
+        user_id=user_id,
+    )
+    db.add(r)
+    db.commit()
+    catalog_cache.invalidate_restaurant(rest_id)
+    return r.to_dict()
 
 
 @app.post("/api/v1/restaurantes/{rest_id}/menu")
-def create_menu_item(rest_id: str, payload: dict):
+def create_menu_item(rest_id: str, payload: dict, db: Session = Depends(get_db)):
     """Create a menu item for a restaurant. Expects 'id' (optional), 'nombre', 'precio' and optional 'cantidad'."""
+    nombre = payload.get("nombre") if isinstance(payload, dict) else None
+    precio = payload.get("precio") if isinstance(payload, dict) else None
+    if not nombre or precio is None:
+        raise HTTPException(
+            status_code=400, detail="'nombre' and 'precio' are required"
+        )
+    item_id = payload.get("id") or f"item_{int(time.time() * 1000)}"
+    existing = (
+        db.query(MenuItemORM)
+        .filter(MenuItemORM.id == item_id, MenuItemORM.restaurante_id == rest_id)
+        .first()
+    )
+    if existing:
+        raise HTTPException(
+            status_code=400, detail="Menu item with given id already exists"
+        )
+    item = MenuItemORM(
+        id=item_id,
+        restaurante_id=rest_id,
+        nombre=nombre,
+        precio=float(precio),
+        cantidad=int(payload.get("cantidad") or 0),
+    )
+    db.add(item)
+    db.commit()
+    catalog_cache.invalidate_restaurant(rest_id)
+    return item.to_dict()
+
+
+def _menu_item_out(rest_id: str, item_id: str, cantidad: Optional[int]) -> dict:
+    # plain read for nombre/precio: the stock itself moved in Redis
     db = database_sql.SessionLocal()
     try:
-        nombre = payload.get("nombre") if isinstance(payload, dict) else None
-        precio = payload.get("precio") if isinstance(payload, dict) else None
-        if not nombre or precio is None:
-            raise HTTPException(
-                status_code=400, detail="'nombre' and 'precio' are required"
-            )
-        item_id = payload.get("id") or f"item_{int(time.time() * 1000)}"
-        existing = (
+        item = (
             db.query(MenuItemORM)
             .filter(MenuItemORM.id == item_id, MenuItemORM.restaurante_id == rest_id)
             .first()
         )
-        if existing:
-            raise HTTPException(
-                status_code=400, detail="Menu item with given id already exists"
-            )
-        item = MenuItemORM(
-            id=item_id,
-            restaurante_id=rest_id,
-            nombre=nombre,
-            precio=float(precio),
-            cantidad=int(payload.get("cantidad") or 0),
-        )
-        db.add(item)
-        db.commit()
-        return item.to_dict()
+        if not item:
+            raise HTTPException(status_code=404, detail="Item no encontrado")
+        out = item.to_dict()
+        if cantidad is not None:
+            out["cantidad"] = cantidad
+        return out
     finally:
         db.close()
 
 
 @app.post("/api/v1/restaurantes/{rest_id}/menu/{item_id}/reserve")
-def reserve_menu_item(rest_id: str, item_id: str, cantidad: int = 1):
+def reserve_menu_item(
+    rest_id: str, item_id: str, cantidad: int = 1, db: Session = Depends(get_db)
+):
     """Reserve (decrement) cantidad of a menu item if available.
 
     This uses a SELECT FOR UPDATE (SQLAlchemy with_for_update) to avoid
-    race conditions when multiple concurrent reservations are attempted.
+    race conditions when multiple concurrent reservations are attempted,
+    or an atomic Redis decrement when the Redis stock engine is enabled.
     """
-    db = database_sql.SessionLocal()
+    if stock_engine.stock is not None:
+        try:
+            levels = stock_engine.stock.reserve(rest_id, {item_id: cantidad})
+        except stock_engine.StockError as e:
+            if e.reason == "not_found":
+                raise HTTPException(status_code=404, detail="Item no encontrado")
+            raise HTTPException(status_code=400, detail="Cantidad insuficiente")
+        catalog_cache.invalidate_stock(rest_id)
+        return _menu_item_out(rest_id, item_id, levels.get(item_id))
+    # lock the row for update to prevent overselling under concurrency
+    item = (
+        db.query(MenuItemORM)
+        .with_for_update()
+        .filter(MenuItemORM.id == item_id, MenuItemORM.restaurante_id == rest_id)
+        .first()
+    )
+    if not item:
+        raise HTTPException(status_code=404, detail="Item no encontrado")
+    if item.cantidad < cantidad:
+        raise HTTPException(status_code=400, detail="Cantidad insuficiente")
+    item.cantidad = item.cantidad - cantidad
+    db.add(item)
+    db.commit()
+    catalog_cache.invalidate_stock(rest_id)
+    return item.to_dict()
+
+
+@app.post("/api/v1/restaurantes/{rest_id}/reservations")
+def reserve_menu_items(
+    rest_id: str, payload: ReservationRequest, db: Session = Depends(get_db)
+):
+    """Reserve a whole cart in a single transaction (all items or none).
+
+    Rows are locked with SELECT FOR UPDATE in primary key order, so two
+    carts sharing items always lock them in the same order and cannot
+    deadlock. Repeated item ids in the cart are added together.
+
+    The hold stays ``pendiente`` until confirmed or cancelled and expires
+    after ``ttl_seconds``. Retrying with the same ``reservation_id`` returns
+    the existing reservation without touching stock again.
+    """
+    wanted = {}
+    for it in payload.items:
+        wanted[it.item_id] = wanted.get(it.item_id, 0) + it.cantidad
     try:
-        # lock the row for update to prevent overselling under concurrency
-        item = (
-            db.query(MenuItemORM)
-            .with_for_update()
-            .filter(MenuItemORM.id == item_id, MenuItemORM.restaurante_id == rest_id)
-            .first()
+        r = reservations.create(
+            db, rest_id, wanted, payload.reservation_id, payload.ttl_seconds
         )
-        if not item:
-            raise HTTPException(status_code=404, detail="Item no encontrado")
-        if item.cantidad < cantidad:
-            raise HTTPException(status_code=400, detail="Cantidad insuficiente")
-        item.cantidad = item.cantidad - cantidad
-        db.add(item)
-        db.commit()
-        return item.to_dict()
-    finally:
-        db.close()
+    except HTTPException:
+        db.rollback()
+        raise
+    return reservations.reservation_out(db, r)
 
 
-@app.post("/api/v1/restaurantes/{rest_id}/menu/{item_id}/release")
-def release_menu_item(rest_id: str, item_id: str, cantidad: int = 1):
-    """Release (increment) cantidad of a menu item (undo a reserve)."""
+@app.post("/api/v1/restaurantes/{rest_id}/reservations/{reservation_id}/confirm")
+def confirm_reservation(
+    rest_id: str, reservation_id: str, db: Session = Depends(get_db)
+):
+    """Confirm a pending hold (idempotent); 409 if it was cancelled or expired."""
+    r = reservations.confirm(db, rest_id, reservation_id)
+    return reservations.reservation_out(db, r)
+
+
+@app.post("/api/v1/restaurantes/{rest_id}/reservations/{reservation_id}/cancel")
+def cancel_reservation(
+    rest_id: str, reservation_id: str, db: Session = Depends(get_db)
+):
+    """Cancel a pending hold and give its stock back (idempotent)."""
+    r = reservations.cancel(db, rest_id, reservation_id)
+    return reservations.reservation_out(db, r)
+
+
+def _release_items(rest_id: str, wanted: dict, not_found: str) -> list:
+    """Give back stock for several items at once (all of them or none)."""
     db = database_sql.SessionLocal()
     try:
-        item = (
+        if stock_engine.stock is None:
+            found = reservations.increment_stock(db, wanted, rest_id)
+        else:
+            found = [
+                row.id
+                for row in db.query(MenuItemORM.id).filter(
+                    MenuItemORM.restaurante_id == rest_id,
+                    MenuItemORM.id.in_(list(wanted)),
+                )
+            ]
+        missing = [item_id for item_id in wanted if item_id not in found]
+        if missing:
+            db.rollback()
+            raise HTTPException(
+                status_code=404, detail=not_found.format(item_id=missing[0])
+            )
+        if stock_engine.stock is not None:
+            stock_engine.stock.release(rest_id, wanted)
+            levels = stock_engine.stock.levels(rest_id, wanted)
+        else:
+            db.commit()
+            levels = {}
+        catalog_cache.invalidate_stock(rest_id)
+        items = (
             db.query(MenuItemORM)
-            .filter(MenuItemORM.id == item_id, MenuItemORM.restaurante_id == rest_id)
-            .first()
+            .filter(
+                MenuItemORM.restaurante_id == rest_id,
+                MenuItemORM.id.in_(list(wanted)),
+            )
+            .order_by(MenuItemORM.id)
+            .all()
         )
-        if not item:
-            raise HTTPException(status_code=404, detail="Item no encontrado")
-        item.cantidad = item.cantidad + cantidad
-        db.add(item)
-        db.commit()
-        return item.to_dict()
+        return [
+            {**i.to_dict(), "cantidad": levels.get(i.id, int(i.cantidad))}
+            for i in items
+        ]
     finally:
         db.close()
 
 
+@app.post("/api/v1/restaurantes/{rest_id}/menu/{item_id}/release")
+def release_menu_item(rest_id: str, item_id: str, cantidad: int = 1):
+    """Release (increment) cantidad of a menu item (undo a reserve).
+
+    The increment is done in SQL (``cantidad = cantidad + n``) on a locked
+    row, so concurrent releases do not lose updates.
+    """
+    return _release_items(rest_id, {item_id: cantidad}, "Item no encontrado")[0]
+
+
+@app.post("/api/v1/restaurantes/{rest_id}/releases")
+def release_menu_items(rest_id: str, payload: ReleaseRequest):
+    """Give back stock for many items in one statement and one transaction.
+
+    Fails with 404 without changing anything if an item does not belong to
+    the restaurant. Repeated item ids are added together.
+    """
+    wanted = {}
+    for it in payload.items:
+        wanted[it.item_id] = wanted.get(it.item_id, 0) + it.cantidad
+    items = _release_items(
+        rest_id, wanted, "Item {item_id} no encontrado en el restaurante"
+    )
+    return {"restaurante_id": rest_id, "items": items}
+
+
 @app.delete("/api/v1/restaurantes/{rest_id}/menu/{item_id}")
-def delete_menu_item(rest_id: str, item_id: str):
+def delete_menu_item(rest_id: str, item_id: str, db: Session = Depends(get_db)):
     """Delete a menu item from a restaurant."""
-    db = database_sql.SessionLocal()
-    try:
-        item = (
-            db.query(MenuItemORM)
-            .filter(MenuItemORM.id == item_id, MenuItemORM.restaurante_id == rest_id)
-            .first()
-        )
-        if not item:
-            raise HTTPException(status_code=404, detail="Item no encontrado")
-        db.delete(item)
-        db.commit()
-        return {"message": "Item eliminado correctamente", "id": item_id}
-    finally:
-        db.close()
+    item = (
+        db.query(MenuItemORM)
+        .filter(MenuItemORM.id == item_id, MenuItemORM.restaurante_id == rest_id)
+        .first()
+    )
+    if not item:
+        raise HTTPException(status_code=404, detail="Item no encontrado")
+    db.delete(item)
+    db.commit()
+    catalog_cache.invalidate_restaurant(rest_id)
+    return {"message": "Item eliminado correctamente", "id": item_id}
 
 
 @app.get("/health")
@@ -310,50 +545,37 @@ def read_root():
 
 
 @app.post("/api/v1/restaurantes/{rest_id}/photo")
-def upload_restaurante_photo(rest_id: str, file: UploadFile = File(...)):
-    """Upload a photo/logo for a restaurant and store its URL in the DB.
-
-    The file is saved under ./data/restaurante_photos/<rest_id>__<filename>
-    and the DB `foto_url` column will store the relative path.
-    Removes any existing photos for this restaurant before uploading the new one.
+def upload_restaurante_photo(
+    rest_id: str, file: UploadFile = File(...), db: Session = Depends(get_db)
+):
+    """Upload a photo/logo for a restaurant and store its name in the DB.
+
+    The file is stored by content hash (see ``common.media``) and `foto_url`
+    holds that name. The previous photo is deleted unless another restaurant
+    uses the same file.
     """
-    db = database_sql.SessionLocal()
     try:
         r = db.query(RestauranteORM).filter(RestauranteORM.id == rest_id).first()
         if not r:
             raise HTTPException(status_code=404, detail="Restaurante no encontrado")
+        # give the connection back to the pool while the file is written
+        db.rollback()
 
-        # ensure data dir exists
-        data_dir = os.path.join(os.getcwd(), "data", "restaurante_photos")
-        os.makedirs(data_dir, exist_ok=True)
-
-        # Delete old photos for this restaurant
-        try:
-            for fname in os.listdir(data_dir):
-                if fname.startswith(f"{rest_id}__"):
-                    old_file = os.path.join(data_dir, fname)
-                    if os.path.isfile(old_file):
-                        os.remove(old_file)
-        except Exception:
-            pass  # Continue even if deletion fails
-
-        # Save new photo with consistent naming
-        safe_name = os.path.basename(file.filename)
-        # Use timestamp to ensure uniqueness and avoid browser cache issues
-        import time
-
-        timestamp = int(time.time() * 1000)
-        file_ext = os.path.splitext(safe_name)[1] if "." in safe_name else ".jpg"
-        dest_path = os.path.join(data_dir, f"{rest_id}__{timestamp}{file_ext}")
-
-        with open(dest_path, "wb") as out_f:
-            shutil.copyfileobj(file.file, out_f)
-
-        # store filename (we will serve via the GET /photo endpoint)
-        filename = f"{rest_id}__{timestamp}{file_ext}"
+        filename = _photos().save(file.file)
+        old = r.foto_url
         r.foto_url = filename
         db.add(r)
         db.commit()
+        catalog_cache.invalidate_restaurant(rest_id)
+
+        if old and old != filename:
+            shared = (
+                db.query(RestauranteORM.id)
+                .filter(RestauranteORM.foto_url == old)
+                .first()
+            )
+            if shared is None:
+                _photos().delete(old)
 
         return {"foto_url": filename}
     finally:
@@ -361,36 +583,17 @@ def upload_restaurante_photo(rest_id: str, file: UploadFile = File(...)):
             file.file.close()
         except Exception:
             pass
-        db.close()
 
 
 @app.get("/api/v1/restaurantes/{rest_id}/photo")
-def get_restaurante_photo(rest_id: str):
-    """Serve the uploaded photo for a restaurant (if present).
+def get_restaurante_photo(rest_id: str, request: Request, size: Optional[int] = None):
+    """Serve the photo of a restaurant, or its ``size`` px thumbnail.
 
-    The uploaded file is looked up in ./data/restaurante_photos using the
-    foto_url from the database for the specific restaurant.
+    The file is located from the (cached) `foto_url`, with no directory
+    scan; ETag, ``Cache-Control`` and ``Range`` are handled by
+    ``common.media``.
     """
-    db = database_sql.SessionLocal()
-    try:
-        # Get the restaurant and its foto_url from DB
-        r = db.query(RestauranteORM).filter(RestauranteORM.id == rest_id).first()
-        if not r or not r.foto_url:
-            raise HTTPException(status_code=404, detail="Foto no encontrada")
-
-        data_dir = os.path.join(os.getcwd(), "data", "restaurante_photos")
-        full_path = os.path.join(data_dir, r.foto_url)
-
-        if not os.path.exists(full_path) or not os.path.isfile(full_path):
-            # If file doesn't exist, try to find any file with the rest_id prefix (fallback)
-            if os.path.exists(data_dir):
-                for fname in os.listdir(data_dir):
-                    if fname.startswith(f"{rest_id}__"):
-                        full_path = os.path.join(data_dir, fname)
-                        if os.path.isfile(full_path):
-                            return FileResponse(full_path)
-            raise HTTPException(status_code=404, detail="Foto no encontrada")
-
-        return FileResponse(full_path)
-    finally:
-        db.close()
+    foto_url = get_restaurante(rest_id).get("foto_url")
+    if not foto_url:
+        raise HTTPException(status_code=404, detail="Foto no encontrada")
+    return _photos().response(request, foto_url, size=size)
@@ -1,7 +1,9 @@
-from sqlalchemy import Column, Integer, String, Float, ForeignKey
+from datetime import datetime
+
+from sqlalchemy import Column, Integer, String, Float, ForeignKey, DateTime, Index
 from sqlalchemy.orm import declarative_base, relationship
-from pydantic import BaseModel
-from typing import Optional
+from pydantic import BaseModel, Field
+from typing import List, Optional
 
 
 # Declarative base used by the service
@@ -56,6 +58,36 @@ class MenuItemORM(Base):
         }
 
 
+class ReservationORM(Base):
+    """Stock hold for a cart: menu cantidad is already decremented while the
+    reservation is ``pendiente`` and is given back if it is cancelled or
+    expires before being confirmed."""
+
+    __tablename__ = "reservations"
+    # the sweeper looks up pending holds by expiry
+    __table_args__ = (Index("ix_reservations_estado_expires", "estado", "expires_at"),)
+
+    id = Column(String, primary_key=True, index=True)
+    restaurante_id = Column(String, ForeignKey("restaurantes.id"), index=True)
+    estado = Column(String, nullable=False, default="pendiente")
+    expires_at = Column(DateTime, nullable=False)
+    created_at = Column(DateTime, nullable=False, default=datetime.utcnow)
+
+    items = relationship(
+        "ReservationItemORM", back_populates="reservation", cascade="all, delete-orphan"
+    )
+
+
+class ReservationItemORM(Base):
+    __tablename__ = "reservation_items"
+
+    reservation_id = Column(String, ForeignKey("reservations.id"), primary_key=True)
+    item_id = Column(String, primary_key=True)
+    cantidad = Column(Integer, nullable=False)
+
+    reservation = relationship("ReservationORM", back_populates="items")
+
+
 # Pydantic models for API responses/validation
 class MenuItem(BaseModel):
     id: str
@@ -64,6 +96,23 @@ class MenuItem(BaseModel):
     cantidad: int
 
 
+class ReservationItem(BaseModel):
+    item_id: str
+    cantidad: int = Field(..., gt=0)
+
+
+class ReservationRequest(BaseModel):
+    items: List[ReservationItem] = Field(..., min_length=1)
+    # client supplied id (e.g. the order id): retrying with the same id
+    # returns the existing reservation instead of reserving twice
+    reservation_id: Optional[str] = None
+    ttl_seconds: Optional[int] = Field(None, gt=0)
+
+
+class ReleaseRequest(BaseModel):
+    items: List[ReservationItem] = Field(..., min_length=1)
+
+
 class Restaurante(BaseModel):
     id: str
     nombre: str
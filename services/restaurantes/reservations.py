@@ -0,0 +1,309 @@
+"""Reservation ledger: stock holds with expiry and idempotent confirm/cancel.
+
+Creating a reservation decrements ``menu_items.cantidad`` and records the
+hold in ``reservations``/``reservation_items`` in the same transaction. The
+hold is then confirmed (the order was persisted) or cancelled (stock goes
+back). Holds still pending after ``expires_at`` are expired in bulk by
+:func:`sweep_expired`, so a pedidos process dying mid-order cannot leak
+stock.
+
+Lock order is always reservation rows first, then menu rows by id, which
+matches the cart reservation and keeps concurrent sweeps, cancels and
+reservations free of deadlocks.
+
+With the Redis stock engine enabled the counters move in Redis instead and
+only the ledger rows are written here; stock given back by a cancel or an
+expiry is released to Redis once the ledger change is committed.
+"""
+
+import os
+import uuid
+from datetime import datetime, timedelta
+from typing import Dict, List, Optional
+
+from fastapi import HTTPException
+from sqlalchemy import case, func, select, update
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.orm import Session
+
+import catalog_cache
+import stock_engine
+from models import MenuItemORM, ReservationItemORM, ReservationORM
+
+PENDING = "pendiente"
+CONFIRMED = "confirmada"
+CANCELLED = "cancelada"
+EXPIRED = "expirada"
+
+RESERVATION_TTL_SECONDS = int(os.getenv("RESERVATION_TTL_SECONDS", "300"))
+RESERVATION_MAX_TTL_SECONDS = int(os.getenv("RESERVATION_MAX_TTL_SECONDS", "3600"))
+RESERVATION_SWEEP_BATCH = int(os.getenv("RESERVATION_SWEEP_BATCH", "500"))
+
+
+def reservation_out(db: Session, r: ReservationORM) -> dict:
+    menu = {
+        m.id: m
+        for m in db.query(MenuItemORM).filter(
+            MenuItemORM.id.in_([it.item_id for it in r.items])
+        )
+    }
+    items = []
+    for it in r.items:
+        info = menu[it.item_id].to_dict() if it.item_id in menu else {"id": it.item_id}
+        items.append({**info, "reservado": it.cantidad})
+    return {
+        "reservation_id": r.id,
+        "restaurante_id": r.restaurante_id,
+        "estado": r.estado,
+        "expires_at": r.expires_at.isoformat(),
+        "items": items,
+    }
+
+
+def increment_stock(
+    db: Session, deltas: Dict[str, int], rest_id: Optional[str] = None
+) -> List[str]:
+    """Add ``deltas`` to ``menu_items.cantidad`` with a single UPDATE.
+
+    The increment happens in SQL (``cantidad = cantidad + n``), so
+    concurrent releases cannot overwrite each other. Rows are locked in id
+    order first, like every other stock writer; the UPDATE alone would lock
+    them in plan order. Returns the ids that exist (restricted to
+    ``rest_id`` when given); the caller decides whether missing ones are an
+    error before committing.
+    """
+    if not deltas:
+        return []
+    query = select(MenuItemORM.id).where(MenuItemORM.id.in_(list(deltas)))
+    if rest_id is not None:
+        query = query.where(MenuItemORM.restaurante_id == rest_id)
+    found = list(db.scalars(query.order_by(MenuItemORM.id).with_for_update()))
+    if found:
+        db.execute(
+            update(MenuItemORM)
+            .where(MenuItemORM.id.in_(found))
+            .values(
+                cantidad=MenuItemORM.cantidad
+                + case(deltas, value=MenuItemORM.id, else_=0)
+            )
+            .execution_options(synchronize_session=False)
+        )
+    return found
+
+
+def restore_stock(db: Session, reservation_ids: List[str]) -> None:
+    """Give back the stock held by ``reservation_ids`` with one UPDATE."""
+    totals = db.execute(
+        select(ReservationItemORM.item_id, func.sum(ReservationItemORM.cantidad))
+        .where(ReservationItemORM.reservation_id.in_(reservation_ids))
+        .group_by(ReservationItemORM.item_id)
+    ).all()
+    increment_stock(db, {item_id: int(cantidad) for item_id, cantidad in totals})
+
+
+def _return_stock(db: Session, reservation_ids: List[str]) -> Dict[str, dict]:
+    """Give back the held stock within the current transaction (SQL), or
+    return ``{rest_id: {item_id: cantidad}}`` to release after commit."""
+    if stock_engine.stock is None:
+        restore_stock(db, reservation_ids)
+        return {}
+    held: Dict[str, dict] = {}
+    rows = (
+        db.query(
+            ReservationORM.restaurante_id,
+            ReservationItemORM.item_id,
+            ReservationItemORM.cantidad,
+        )
+        .join(ReservationORM.items)
+        .filter(ReservationORM.id.in_(reservation_ids))
+    )
+    for rest_id, item_id, cantidad in rows:
+        wanted = held.setdefault(rest_id, {})
+        wanted[item_id] = wanted.get(item_id, 0) + cantidad
+    return held
+
+
+def _release_held(held: Dict[str, dict]) -> None:
+    for rest_id, wanted in held.items():
+        stock_engine.stock.release(rest_id, wanted)
+
+
+def _take_stock(db: Session, rest_id: str, wanted: Dict[str, int]) -> None:
+    """Decrement every item of ``wanted`` or raise without touching any."""
+    if stock_engine.stock is not None:
+        try:
+            stock_engine.stock.reserve(rest_id, wanted)
+        except stock_engine.StockError as e:
+            if e.reason == "not_found":
+                raise HTTPException(
+                    status_code=404,
+                    detail=f"Item {e.item_id} no encontrado en el restaurante",
+                )
+            if e.reason == "out_of_stock":
+                raise HTTPException(
+                    status_code=400, detail=f"Item {e.item_id} sin stock"
+                )
+            raise HTTPException(
+                status_code=400, detail=f"Stock insuficiente para item {e.item_id}"
+            )
+        return
+    rows = (
+        db.query(MenuItemORM)
+        .filter(
+            MenuItemORM.restaurante_id == rest_id,
+            MenuItemORM.id.in_(list(wanted)),
+        )
+        .order_by(MenuItemORM.id)
+        .with_for_update()
+        .all()
+    )
+    by_id = {row.id: row for row in rows}
+    missing = [item_id for item_id in wanted if item_id not in by_id]
+    if missing:
+        raise HTTPException(
+            status_code=404,
+            detail=f"Item {missing[0]} no encontrado en el restaurante",
+        )
+    for item_id, cantidad in wanted.items():
+        item = by_id[item_id]
+        if item.cantidad <= 0:
+            raise HTTPException(status_code=400, detail=f"Item {item_id} sin stock")
+        if item.cantidad < cantidad:
+            raise HTTPException(
+                status_code=400,
+                detail=f"Stock insuficiente para item {item_id}",
+            )
+    for item_id, cantidad in wanted.items():
+        by_id[item_id].cantidad = by_id[item_id].cantidad - cantidad
+
+
+def _existing(db: Session, rest_id: str, reservation_id: str) -> ReservationORM:
+    r = db.get(ReservationORM, reservation_id)
+    if r is not None and r.restaurante_id != rest_id:
+        raise HTTPException(
+            status_code=409, detail="La reserva pertenece a otro restaurante"
+        )
+    return r
+
+
+def create(
+    db: Session,
+    rest_id: str,
+    wanted: Dict[str, int],
+    reservation_id: Optional[str] = None,
+    ttl_seconds: Optional[int] = None,
+) -> ReservationORM:
+    """Reserve every item of ``wanted`` or none of them."""
+    if reservation_id:
+        r = _existing(db, rest_id, reservation_id)
+        if r is not None:
+            return r
+    _take_stock(db, rest_id, wanted)
+    ttl = min(ttl_seconds or RESERVATION_TTL_SECONDS, RESERVATION_MAX_TTL_SECONDS)
+    r = ReservationORM(
+        id=reservation_id or str(uuid.uuid4()),
+        restaurante_id=rest_id,
+        estado=PENDING,
+        expires_at=datetime.utcnow() + timedelta(seconds=ttl),
+        items=[
+            ReservationItemORM(item_id=item_id, cantidad=cantidad)
+            for item_id, cantidad in wanted.items()
+        ],
+    )
+    db.add(r)
+    try:
+        db.commit()
+    except IntegrityError:
+        # a concurrent retry with the same id won: undo ours, return theirs
+        db.rollback()
+        if stock_engine.stock is not None:
+            stock_engine.stock.release(rest_id, wanted)
+        r = _existing(db, rest_id, reservation_id) if reservation_id else None
+        if r is None:
+            raise
+    except Exception:
+        db.rollback()
+        if stock_engine.stock is not None:
+            stock_engine.stock.release(rest_id, wanted)
+        raise
+    catalog_cache.invalidate_stock(rest_id)
+    return r
+
+
+def _locked(db: Session, rest_id: str, reservation_id: str) -> ReservationORM:
+    r = (
+        db.query(ReservationORM)
+        .filter(
+            ReservationORM.id == reservation_id,
+            ReservationORM.restaurante_id == rest_id,
+        )
+        .with_for_update()
+        .first()
+    )
+    if not r:
+        raise HTTPException(status_code=404, detail="Reserva no encontrada")
+    return r
+
+
+def _release(db: Session, r: ReservationORM, estado: str) -> None:
+    held = _return_stock(db, [r.id])
+    r.estado = estado
+    db.commit()
+    _release_held(held)
+    catalog_cache.invalidate_stock(r.restaurante_id)
+
+
+def confirm(db: Session, rest_id: str, reservation_id: str) -> ReservationORM:
+    """Make the hold permanent. Confirming twice is a no-op."""
+    r = _locked(db, rest_id, reservation_id)
+    if r.estado == CONFIRMED:
+        return r
+    if r.estado == PENDING and r.expires_at <= datetime.utcnow():
+        # expired but not swept yet: same outcome as if the sweeper had run
+        _release(db, r, EXPIRED)
+    if r.estado != PENDING:
+        raise HTTPException(status_code=409, detail=f"Reserva {r.estado}")
+    r.estado = CONFIRMED
+    db.commit()
+    return r
+
+
+def cancel(db: Session, rest_id: str, reservation_id: str) -> ReservationORM:
+    """Give the stock back. Cancelling an already released hold is a no-op."""
+    r = _locked(db, rest_id, reservation_id)
+    if r.estado in (CANCELLED, EXPIRED):
+        return r
+    if r.estado == CONFIRMED:
+        raise HTTPException(status_code=409, detail="Reserva confirmada")
+    _release(db, r, CANCELLED)
+    return r
+
+
+def sweep_expired(db: Session, limit: int = RESERVATION_SWEEP_BATCH) -> int:
+    """Expire up to ``limit`` stale pending holds in one transaction."""
+    ids = db.scalars(
+        select(ReservationORM.id)
+        .where(
+            ReservationORM.estado == PENDING,
+            ReservationORM.expires_at <= datetime.utcnow(),
+        )
+        .order_by(ReservationORM.id)
+        .limit(limit)
+        # rows being confirmed/cancelled right now are left for the next pass
+        .with_for_update(skip_locked=True)
+    ).all()
+    if not ids:
+        return 0
+    held = _return_stock(db, ids)
+    rest_ids = set(
+        db.scalars(
+            select(ReservationORM.restaurante_id).where(ReservationORM.id.in_(ids))
+        )
+    )
+    db.execute(
+        update(ReservationORM).where(ReservationORM.id.in_(ids)).values(estado=EXPIRED)
+    )
+    db.commit()
+    _release_held(held)
+    catalog_cache.invalidate_stock(*rest_ids)
+    return len(ids)
@@ -0,0 +1,314 @@
+"""Restaurant search: ranked full-text + trigram matching, autocomplete and
+cursor pagination for ``GET /api/v1/restaurantes``.
+
+Without a query the listing is ordered by ``(rating DESC NULLS LAST, id)``
+and walked with a keyset on that pair, served by an index on the same
+columns. ``fields`` restricts the columns read and returned, and
+:func:`to_compact` turns a page into a header plus one array per row.
+
+On Postgres, :func:`create_search_indexes` (run by the startup DDL) adds
+
+- ``restaurantes.search_vector``: a stored generated ``tsvector`` with the
+  name (weight A, ``simple`` config, no stemming) and the description
+  (weight B, ``spanish`` config), plus a GIN index on it;
+- GIN ``pg_trgm`` indexes on ``lower(nombre)`` and ``lower(descripcion)``,
+  which serve typo-tolerant matches and prefix/infix ``LIKE``.
+
+A search matches either index, so the planner never falls back to a
+sequential scan; results are ordered by ``ts_rank_cd`` plus trigram
+similarity. Pages are addressed by an opaque cursor holding the last
+``(score, id)`` (or ``(rating, id)`` without a query) instead of an offset,
+so deep pages cost the same as the first one.
+
+Other databases (SQLite in tests) get the previous ``ILIKE`` filter with
+the ``(rating, id)`` order and cursor.
+"""
+
+import base64
+import json
+import re
+from typing import List, Optional, Sequence, Tuple
+
+from fastapi import HTTPException
+from sqlalchemy import and_, or_, text
+from sqlalchemy.orm import Session
+
+from models import RestauranteORM
+
+MAX_LIMIT = 100
+
+# columns a client may ask for with ``fields``; ``id`` is always returned
+FIELDS = ("id", "nombre", "direccion", "descripcion", "rating", "foto_url", "user_id")
+
+_DDL = [
+    "CREATE INDEX IF NOT EXISTS ix_restaurantes_rating_id "
+    "ON restaurantes (rating DESC NULLS LAST, id)",
+    """
+    ALTER TABLE restaurantes ADD COLUMN IF NOT EXISTS search_vector tsvector
+    GENERATED ALWAYS AS (
+        setweight(to_tsvector('simple', coalesce(nombre, '')), 'A') ||
+        setweight(to_tsvector('spanish', coalesce(descripcion, '')), 'B')
+    ) STORED
+    """,
+    "CREATE INDEX IF NOT EXISTS ix_restaurantes_search_vector "
+    "ON restaurantes USING gin (search_vector)",
+]
+_TRGM_DDL = [
+    "CREATE EXTENSION IF NOT EXISTS pg_trgm",
+    "CREATE INDEX IF NOT EXISTS ix_restaurantes_nombre_trgm "
+    "ON restaurantes USING gin (lower(nombre) gin_trgm_ops)",
+    "CREATE INDEX IF NOT EXISTS ix_restaurantes_descripcion_trgm "
+    "ON restaurantes USING gin (lower(coalesce(descripcion, '')) gin_trgm_ops)",
+]
+
+_WORD = re.compile(r"\w+", re.UNICODE)
+
+# set by create_search_indexes once the DDL above is in place
+_state = {"fulltext": False, "trigram": False}
+
+
+def create_search_indexes(engine) -> None:
+    """Create the search column and indexes (idempotent, Postgres only)."""
+    if engine.dialect.name != "postgresql":
+        return
+    with engine.begin() as conn:
+        for stmt in _DDL:
+            conn.execute(text(stmt))
+    _state["fulltext"] = True
+    try:
+        with engine.begin() as conn:
+            for stmt in _TRGM_DDL:
+                conn.execute(text(stmt))
+    except Exception as e:
+        # CREATE EXTENSION needs privileges the service user may lack: full
+        # text search still works, only typo tolerance is lost
+        print(f"[RESTAURANTES][SEARCH] pg_trgm not available: {e}", flush=True)
+    with engine.connect() as conn:
+        _state["trigram"] = (
+            conn.execute(
+                text("SELECT 1 FROM pg_extension WHERE extname = 'pg_trgm'")
+            ).first()
+            is not None
+        )
+
+
+def _is_postgres(db: Session) -> bool:
+    return db.get_bind().dialect.name == "postgresql"
+
+
+def encode_cursor(*values) -> str:
+    raw = json.dumps(values, separators=(",", ":")).encode("utf-8")
+    return base64.urlsafe_b64encode(raw).decode("ascii").rstrip("=")
+
+
+def decode_cursor(cursor: Optional[str]) -> Optional[list]:
+    if not cursor:
+        return None
+    try:
+        padded = cursor + "=" * (-len(cursor) % 4)
+        values = json.loads(base64.urlsafe_b64decode(padded))
+    except Exception:
+        raise HTTPException(status_code=400, detail="Cursor inválido")
+    if not isinstance(values, list) or len(values) != 2:
+        raise HTTPException(status_code=400, detail="Cursor inválido")
+    return values
+
+
+def parse_fields(fields: Optional[str]) -> List[str]:
+    """Validate a ``fields=a,b`` projection; ``id`` always comes first."""
+    if not fields:
+        return list(FIELDS)
+    wanted = [f.strip() for f in fields.split(",") if f.strip()]
+    unknown = [f for f in wanted if f not in FIELDS]
+    if unknown:
+        raise HTTPException(
+            status_code=400, detail=f"Campo desconocido: {', '.join(unknown)}"
+        )
+    return ["id"] + [f for f in FIELDS if f in wanted and f != "id"]
+
+
+def to_compact(rows: List[dict], fields: Sequence[str]) -> dict:
+    """``{"fields": [...], "rows": [[...], ...]}``: column names sent once."""
+    return {"fields": list(fields), "rows": [[r[f] for f in fields] for r in rows]}
+
+
+def _prefix_tsquery(q: str) -> Optional[str]:
+    # every word must match, the last one as a prefix (typing "pizz" finds
+    # "pizzeria"); words are reduced to \w+ so nothing reaches to_tsquery raw
+    words = _WORD.findall(q.lower())
+    if not words:
+        return None
+    return " & ".join(f"{w}:*" for w in words)
+
+
+def _escape_like(q: str) -> str:
+    return q.replace("\\", "\\\\").replace("%", "\\%").replace("_", "\\_")
+
+
+def _page(rows: List, limit: int, cursor_of) -> Tuple[List, Optional[str]]:
+    # one extra row tells whether there is a next page
+    if len(rows) > limit:
+        rows = rows[:limit]
+        return rows, cursor_of(rows[-1])
+    return rows, None
+
+
+def _after_rating(after: list):
+    # keyset on (rating DESC NULLS LAST, id): rows strictly after the cursor
+    rating, after_id = after
+    rating_col, id_col = RestauranteORM.rating, RestauranteORM.id
+    if rating is None:
+        return and_(rating_col.is_(None), id_col > str(after_id))
+    try:
+        rating = float(rating)
+    except (TypeError, ValueError):
+        raise HTTPException(status_code=400, detail="Cursor inválido")
+    return or_(
+        rating_col < rating,
+        and_(rating_col == rating, id_col > str(after_id)),
+        rating_col.is_(None),
+    )
+
+
+def list_page(
+    db: Session,
+    q: Optional[str],
+    limit: int,
+    cursor: Optional[str],
+    fields: Sequence[str] = FIELDS,
+) -> Tuple[List[dict], Optional[str]]:
+    """One page of restaurants (ranked when ``q`` is given) and the cursor
+    of the next page, or ``None`` on the last one. Rows only hold
+    ``fields``."""
+    limit = max(1, min(limit, MAX_LIMIT))
+    after = decode_cursor(cursor)
+    if q and q.strip() and _state["fulltext"] and _is_postgres(db):
+        return _ranked_page(db, q.strip(), limit, after, fields)
+    # rating is read for the cursor even when it is not returned
+    columns = [getattr(RestauranteORM, f) for f in fields]
+    if "rating" not in fields:
+        columns.append(RestauranteORM.rating)
+    query = db.query(*columns)
+    if q:
+        like = f"%{q}%"
+        query = query.filter(
+            RestauranteORM.nombre.ilike(like) | RestauranteORM.descripcion.ilike(like)
+        )
+    if after:
+        query = query.filter(_after_rating(after))
+    rows = (
+        query.order_by(RestauranteORM.rating.desc().nulls_last(), RestauranteORM.id)
+        .limit(limit + 1)
+        .all()
+    )
+    rows, next_cursor = _page(rows, limit, lambda r: encode_cursor(r.rating, r.id))
+    return [_row_dict(r._mapping, fields) for r in rows], next_cursor
+
+
+_RANKED_SQL = """
+WITH matches AS (
+    SELECT {columns},
+           round((ts_rank_cd(r.search_vector, query) {similarity})::numeric, 6)
+               AS score
+    FROM restaurantes r, to_tsquery('simple', :tsq) AS query
+    WHERE r.search_vector @@ query {trigram_match}
+)
+SELECT * FROM matches
+WHERE CAST(:after_score AS numeric) IS NULL
+   OR score < CAST(:after_score AS numeric)
+   OR (score = CAST(:after_score AS numeric) AND id > :after_id)
+ORDER BY score DESC, id
+LIMIT :limit
+"""
+_TRGM_SIMILARITY = "+ similarity(lower(r.nombre), :q)"
+_TRGM_MATCH = """
+       OR lower(r.nombre) % :q
+       OR lower(coalesce(r.descripcion, '')) LIKE :like ESCAPE '\\'
+"""
+
+
+def _ranked_page(
+    db: Session, q: str, limit: int, after: Optional[list], fields: Sequence[str]
+):
+    q = q.lower()
+    tsq = _prefix_tsquery(q)
+    # nothing indexable to match on (e.g. only punctuation)
+    if tsq is None:
+        return [], None
+    after_score, after_id = after if after else (None, None)
+    trigram = _state["trigram"]
+    sql = _RANKED_SQL.format(
+        # names come from FIELDS, never from the request
+        columns=", ".join(f"r.{f}" for f in fields),
+        similarity=_TRGM_SIMILARITY if trigram else "",
+        trigram_match=_TRGM_MATCH if trigram else "",
+    )
+    rows = (
+        db.execute(
+            text(sql),
+            {
+                "q": q,
+                "tsq": tsq,
+                "like": f"%{_escape_like(q)}%",
+                "after_score": after_score,
+                "after_id": after_id,
+                "limit": limit + 1,
+            },
+        )
+        .mappings()
+        .all()
+    )
+    rows, next_cursor = _page(
+        rows, limit, lambda r: encode_cursor(str(r["score"]), r["id"])
+    )
+    return [_row_dict(r, fields) for r in rows], next_cursor
+
+
+def _row_dict(row, fields: Sequence[str]) -> dict:
+    out = {f: row[f] for f in fields}
+    if out.get("rating") is not None:
+        out["rating"] = float(out["rating"])
+    return out
+
+
+def autocomplete(db: Session, q: str, limit: int = 8) -> List[dict]:
+    """Restaurant names where some word starts with ``q``, best match first."""
+    q = (q or "").strip().lower()
+    if not q:
+        return []
+    limit = max(1, min(limit, MAX_LIMIT))
+    prefix = _escape_like(q)
+    if not (_state["trigram"] and _is_postgres(db)):
+        rows = (
+            db.query(RestauranteORM.id, RestauranteORM.nombre)
+            .filter(
+                or_(
+                    RestauranteORM.nombre.ilike(f"{prefix}%", escape="\\"),
+                    RestauranteORM.nombre.ilike(f"% {prefix}%", escape="\\"),
+                )
+            )
+            .order_by(RestauranteORM.nombre)
+            .limit(limit)
+            .all()
+        )
+        return [{"id": r.id, "nombre": r.nombre} for r in rows]
+    # both LIKE patterns are answered by the trigram index on lower(nombre)
+    rows = db.execute(
+        text(
+            """
+            SELECT id, nombre FROM restaurantes
+            WHERE lower(nombre) LIKE :prefix ESCAPE '\\'
+               OR lower(nombre) LIKE :word_prefix ESCAPE '\\'
+            ORDER BY lower(nombre) LIKE :prefix ESCAPE '\\' DESC,
+                     similarity(lower(nombre), :q) DESC, nombre
+            LIMIT :limit
+            """
+        ),
+        {
+            "q": q,
+            "prefix": f"{prefix}%",
+            "word_prefix": f"% {prefix}%",
+            "limit": limit,
+        },
+    ).all()
+    return [{"id": r.id, "nombre": r.nombre} for r in rows]
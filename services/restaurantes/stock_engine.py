@@ -0,0 +1,329 @@
+"""Optional Redis stock engine (``STOCK_ENGINE=redis``).
+
+Live stock counters are kept in Redis (``stock:{rest_id}:{item_id}``) and
+moved with Lua scripts that check and decrement every item of a cart in one
+atomic step, so reserving never waits on a Postgres row lock.
+
+Every movement is also added to a pending-delta hash. A background job
+(:meth:`RedisStockEngine.run_maintenance`) writes those deltas behind to
+``menu_items.cantidad`` in one batched UPDATE, and periodically reconciles
+the counters with the table so edits made directly in SQL are picked up.
+Only one process runs the job at a time (a Redis lock), because flushing and
+reconciling must not interleave.
+
+Counters are loaded lazily from Postgres on first use as
+``cantidad + pending + flushing``, so an empty or restarted Redis recovers
+without a warm-up step. That sum only holds if no flush commits between the
+read of ``cantidad`` and the load, so flushes bump a flush epoch (odd while
+one is in flight): a loader waits for an even epoch, and the load script
+refuses to seed the counter if the epoch moved since ``cantidad`` was read.
+
+The scripts touch several keys in one call and assume a single Redis node,
+not a cluster.
+"""
+
+import os
+import time
+import uuid
+from typing import Dict, Iterable, List, Optional, Tuple
+
+from sqlalchemy import bindparam, update
+
+import database_sql
+from models import MenuItemORM
+
+STOCK_ENGINE = os.getenv("STOCK_ENGINE", "sql")
+STOCK_FLUSH_INTERVAL = float(os.getenv("STOCK_FLUSH_INTERVAL", "1"))
+STOCK_RECONCILE_INTERVAL = float(os.getenv("STOCK_RECONCILE_INTERVAL", "60"))
+STOCK_RECONCILE_BATCH = int(os.getenv("STOCK_RECONCILE_BATCH", "1000"))
+
+PENDING_KEY = "stock:pending"
+FLUSHING_KEY = "stock:flushing"
+LOCK_KEY = "stock:maintenance-lock"
+EPOCH_KEY = "stock:flush-epoch"
+
+# a loader waits this long for an in-flight flush before loading anyway
+LOAD_ATTEMPTS = 100
+LOAD_RETRY_DELAY = 0.01
+
+
+class StockError(Exception):
+    """A cart could not be reserved; ``reason`` is ``not_found``,
+    ``out_of_stock`` or ``insufficient``."""
+
+    def __init__(self, reason: str, item_id: str):
+        super().__init__(f"{reason}: {item_id}")
+        self.reason = reason
+        self.item_id = item_id
+
+
+# KEYS: n counters + pending hash; ARGV: n quantities + n item ids.
+# Returns {1} on success, {-1, i} if counter i is not loaded, {0, i} if short.
+_RESERVE = """
+local n = #KEYS - 1
+for i = 1, n do
+  local v = redis.call('GET', KEYS[i])
+  if not v then return {-1, i} end
+  if tonumber(v) < tonumber(ARGV[i]) then return {0, i} end
+end
+for i = 1, n do
+  redis.call('DECRBY', KEYS[i], ARGV[i])
+  redis.call('HINCRBY', KEYS[n + 1], ARGV[n + i], -tonumber(ARGV[i]))
+end
+return {1}
+"""
+
+# Same layout as _RESERVE. Counters not loaded yet are left alone: the
+# pending delta is enough for them to load with the right value.
+_RELEASE = """
+local n = #KEYS - 1
+for i = 1, n do
+  if redis.call('EXISTS', KEYS[i]) == 1 then
+    redis.call('INCRBY', KEYS[i], ARGV[i])
+  end
+  redis.call('HINCRBY', KEYS[n + 1], ARGV[n + i], ARGV[i])
+end
+return 1
+"""
+
+# KEYS: counter, pending, flushing, epoch; ARGV: value in Postgres, item id,
+# epoch seen before reading Postgres ('' skips the check). Returns false if a
+# flush started meanwhile: the value read may or may not include its batch.
+_LOAD = """
+if ARGV[3] ~= '' and (redis.call('GET', KEYS[4]) or '0') ~= ARGV[3] then
+  return false
+end
+local v = tonumber(ARGV[1])
+v = v + tonumber(redis.call('HGET', KEYS[2], ARGV[2]) or '0')
+v = v + tonumber(redis.call('HGET', KEYS[3], ARGV[2]) or '0')
+redis.call('SET', KEYS[1], v, 'NX')
+return redis.call('GET', KEYS[1])
+"""
+
+# Move the pending deltas aside for writing; a batch left over by a failed
+# flush is retried first. Makes the epoch odd while there is a batch to
+# write. KEYS: pending, flushing, epoch.
+_TAKE_PENDING = """
+if redis.call('EXISTS', KEYS[2]) == 0 and redis.call('EXISTS', KEYS[1]) == 1 then
+  redis.call('RENAME', KEYS[1], KEYS[2])
+end
+if redis.call('EXISTS', KEYS[2]) == 1
+    and tonumber(redis.call('GET', KEYS[3]) or '0') % 2 == 0 then
+  redis.call('INCR', KEYS[3])
+end
+return redis.call('HGETALL', KEYS[2])
+"""
+
+# End a flush: drop the written batch (ARGV[1] == '1') or keep it for a
+# retry, and make the epoch even again. KEYS: flushing, epoch.
+_FLUSH_DONE = """
+if ARGV[1] == '1' then
+  redis.call('DEL', KEYS[1])
+end
+if tonumber(redis.call('GET', KEYS[2]) or '0') % 2 == 1 then
+  redis.call('INCR', KEYS[2])
+end
+return 1
+"""
+
+# ARGV: (counter key, item id, value in Postgres) triples. Items with deltas
+# not yet written are skipped: Postgres is behind for them by design.
+_RECONCILE = """
+local fixed = 0
+for i = 1, #ARGV, 3 do
+  local key, item, db = ARGV[i], ARGV[i + 1], ARGV[i + 2]
+  if redis.call('HEXISTS', KEYS[1], item) == 0
+      and redis.call('HEXISTS', KEYS[2], item) == 0 then
+    if redis.call('GET', key) ~= db then
+      redis.call('SET', key, db)
+      fixed = fixed + 1
+    end
+  end
+end
+return fixed
+"""
+
+_UNLOCK = """
+if redis.call('GET', KEYS[1]) == ARGV[1] then
+  return redis.call('DEL', KEYS[1])
+end
+return 0
+"""
+
+
+class RedisStockEngine:
+    def __init__(self, client):
+        self.client = client
+        self._reserve = client.register_script(_RESERVE)
+        self._release = client.register_script(_RELEASE)
+        self._load = client.register_script(_LOAD)
+        self._take_pending = client.register_script(_TAKE_PENDING)
+        self._flush_done = client.register_script(_FLUSH_DONE)
+        self._reconcile = client.register_script(_RECONCILE)
+        self._unlock = client.register_script(_UNLOCK)
+        self._last_reconcile = 0.0
+
+    @staticmethod
+    def key(rest_id: str, item_id: str) -> str:
+        return f"stock:{rest_id}:{item_id}"
+
+    def _args(self, rest_id: str, items: List[Tuple[str, int]]):
+        keys = [self.key(rest_id, item_id) for item_id, _ in items] + [PENDING_KEY]
+        args = [cantidad for _, cantidad in items] + [item_id for item_id, _ in items]
+        return keys, args
+
+    def _read_cantidad(self, rest_id: str, item_id: str) -> Optional[int]:
+        db = database_sql.SessionLocal()
+        try:
+            row = (
+                db.query(MenuItemORM.cantidad)
+                .filter(
+                    MenuItemORM.id == item_id, MenuItemORM.restaurante_id == rest_id
+                )
+                .first()
+            )
+        finally:
+            db.close()
+        return None if row is None else int(row.cantidad)
+
+    def load(self, rest_id: str, item_id: str) -> Optional[int]:
+        """Load one counter from Postgres; ``None`` if the item does not exist."""
+        keys = [self.key(rest_id, item_id), PENDING_KEY, FLUSHING_KEY, EPOCH_KEY]
+        for _ in range(LOAD_ATTEMPTS):
+            epoch = self.client.get(EPOCH_KEY)
+            epoch = epoch.decode() if isinstance(epoch, bytes) else (epoch or "0")
+            if int(epoch) % 2 == 0:
+                cantidad = self._read_cantidad(rest_id, item_id)
+                if cantidad is None:
+                    return None
+                value = self._load(keys=keys, args=[cantidad, item_id, epoch])
+                if value is not None:
+                    return int(value)
+            time.sleep(LOAD_RETRY_DELAY)
+        # a flush that died before ending leaves the epoch odd: load without
+        # the check and let the next reconcile pass correct any drift
+        cantidad = self._read_cantidad(rest_id, item_id)
+        if cantidad is None:
+            return None
+        return int(self._load(keys=keys, args=[cantidad, item_id, ""]))
+
+    def reserve(self, rest_id: str, wanted: Dict[str, int]) -> Dict[str, int]:
+        """Take every item of ``wanted`` or none; return the remaining stock."""
+        items = sorted(wanted.items())
+        keys, args = self._args(rest_id, items)
+        # each retry loads one more counter, so this ends after len(items) + 1
+        for _ in range(len(items) + 1):
+            result = self._reserve(keys=keys, args=args)
+            status = int(result[0])
+            if status == 1:
+                return self.levels(rest_id, wanted)
+            item_id = items[int(result[1]) - 1][0]
+            if status == 0:
+                level = self.client.get(self.key(rest_id, item_id))
+                reason = "out_of_stock" if int(level or 0) <= 0 else "insufficient"
+                raise StockError(reason, item_id)
+            if self.load(rest_id, item_id) is None:
+                raise StockError("not_found", item_id)
+        raise StockError("not_found", items[0][0])
+
+    def release(self, rest_id: str, wanted: Dict[str, int]) -> None:
+        items = sorted(wanted.items())
+        keys, args = self._args(rest_id, items)
+        self._release(keys=keys, args=args)
+
+    def levels(self, rest_id: str, item_ids: Iterable[str]) -> Dict[str, int]:
+        """Live counters for ``item_ids`` (items not loaded yet are omitted)."""
+        item_ids = list(item_ids)
+        if not item_ids:
+            return {}
+        values = self.client.mget([self.key(rest_id, i) for i in item_ids])
+        return {i: int(v) for i, v in zip(item_ids, values) if v is not None}
+
+    def flush(self) -> int:
+        """Write the pending deltas to ``menu_items`` in one batched UPDATE."""
+        raw = self._take_pending(keys=[PENDING_KEY, FLUSHING_KEY, EPOCH_KEY])
+        deltas = {}
+        for field, value in zip(raw[::2], raw[1::2]):
+            delta = int(value)
+            if delta:
+                deltas[field.decode() if isinstance(field, bytes) else field] = delta
+        written = False
+        try:
+            if deltas:
+                db = database_sql.SessionLocal()
+                try:
+                    # id order keeps row locks in the same order as
+                    # reservations. Core executemany on the connection: given a
+                    # parameter list, Session.execute would turn an ORM update()
+                    # into a bulk update by primary key and reject the WHERE.
+                    table = MenuItemORM.__table__
+                    db.connection().execute(
+                        update(table)
+                        .where(table.c.id == bindparam("b_id"))
+                        .values(cantidad=table.c.cantidad + bindparam("b_delta")),
+                        [
+                            {"b_id": item_id, "b_delta": deltas[item_id]}
+                            for item_id in sorted(deltas)
+                        ],
+                    )
+                    db.commit()
+                finally:
+                    db.close()
+            written = True
+        finally:
+            # on failure the batch stays in FLUSHING_KEY and is retried next
+            # time; either way Postgres and FLUSHING_KEY agree again
+            self._flush_done(keys=[FLUSHING_KEY, EPOCH_KEY], args=[int(written)])
+        return len(deltas)
+
+    def reconcile(self, batch: int = STOCK_RECONCILE_BATCH) -> int:
+        """Reset counters that drifted from ``menu_items`` (e.g. SQL edits)."""
+        fixed = 0
+        last_id = ""
+        while True:
+            db = database_sql.SessionLocal()
+            try:
+                rows = (
+                    db.query(
+                        MenuItemORM.id, MenuItemORM.restaurante_id, MenuItemORM.cantidad
+                    )
+                    .filter(MenuItemORM.id > last_id)
+                    .order_by(MenuItemORM.id)
+                    .limit(batch)
+                    .all()
+                )
+            finally:
+                db.close()
+            if not rows:
+                return fixed
+            args = []
+            for row in rows:
+                args += [self.key(row.restaurante_id, row.id), row.id, row.cantidad]
+            fixed += int(self._reconcile(keys=[PENDING_KEY, FLUSHING_KEY], args=args))
+            last_id = rows[-1].id
+
+    def run_maintenance(self, lock_ttl: float = 30.0) -> None:
+        """Flush, and reconcile when due, holding the cluster-wide lock."""
+        token = uuid.uuid4().hex
+        if not self.client.set(LOCK_KEY, token, nx=True, px=int(lock_ttl * 1000)):
+            return
+        try:
+            self.flush()
+            now = time.monotonic()
+            if now - self._last_reconcile >= STOCK_RECONCILE_INTERVAL:
+                self.reconcile()
+                self._last_reconcile = now
+        finally:
+            self._unlock(keys=[LOCK_KEY], args=[token])
+
+
+def from_env() -> Optional[RedisStockEngine]:
+    if STOCK_ENGINE != "redis":
+        return None
+    from database_redis import get_redis_client
+
+    return RedisStockEngine(get_redis_client())
+
+
+# Motor de stock del proceso: None usa los bloqueos de fila de Postgres.
+stock = from_env()
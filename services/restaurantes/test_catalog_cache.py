@@ -0,0 +1,34 @@
+import catalog_cache
+
+
+def test_menu_is_cached_and_invalidated_by_writes(client):
+    cache = catalog_cache.cache
+    client.get("/api/v1/restaurantes/rest1/menu")
+    client.get("/api/v1/restaurantes/rest1/menu")
+    assert cache.stats() == {"hits": 1, "misses": 1}
+
+    client.post("/api/v1/restaurantes/rest1/menu/p1/reserve?cantidad=1")
+    menu = client.get("/api/v1/restaurantes/rest1/menu").json()["menu"]
+    assert {i["id"]: i["cantidad"] for i in menu}["p1"] == 2
+
+    client.post(
+        "/api/v1/restaurantes/rest1/menu", json={"id": "p3", "nombre": "C", "precio": 1}
+    )
+    menu = client.get("/api/v1/restaurantes/rest1/menu").json()["menu"]
+    assert "p3" in {i["id"] for i in menu}
+
+
+def test_metadata_menu_survives_stock_movements(client):
+    cache = catalog_cache.cache
+    meta = client.get("/api/v1/restaurantes/rest1/menu?include_stock=false").json()
+    assert all("cantidad" not in i for i in meta["menu"])
+    client.post("/api/v1/restaurantes/rest1/menu/p1/release?cantidad=1")
+    client.get("/api/v1/restaurantes/rest1/menu?include_stock=false")
+    assert cache.stats()["hits"] == 1
+
+
+def test_restaurant_record_is_cached(client):
+    assert client.get("/api/v1/restaurantes/rest1").json()["nombre"] == "Pizzeria"
+    client.get("/api/v1/restaurantes/rest1")
+    assert catalog_cache.cache.stats() == {"hits": 1, "misses": 1}
+    assert client.get("/api/v1/restaurantes/nope").status_code == 404
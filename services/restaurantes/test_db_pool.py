@@ -0,0 +1,25 @@
+import pytest
+from sqlalchemy import exc
+
+from common.db import TimedQueuePool, create_db_engine
+from common.metrics import REGISTRY
+
+
+def test_pool_exports_checkout_wait_timeouts_and_saturation(tmp_path):
+    engine = create_db_engine(
+        f"sqlite:///{tmp_path / 'pool.db'}",
+        service="pooltest",
+        poolclass=TimedQueuePool,
+        pool_size=1,
+        max_overflow=0,
+        pool_timeout=0.05,
+    )
+    conn = engine.connect()
+    with pytest.raises(exc.TimeoutError):
+        engine.connect()
+    metrics = REGISTRY.render()
+    conn.close()
+    labels = '{service="pooltest",pool="default"}'
+    assert f"db_pool_checkout_seconds_count{labels} 2" in metrics
+    assert f"db_pool_checkout_timeouts_total{labels} 1" in metrics
+    assert f"db_pool_saturation{labels} 1" in metrics
@@ -0,0 +1,84 @@
+import os
+
+import main
+
+
+def test_photo_is_content_addressed_and_cacheable(client, monkeypatch, tmp_path):
+    monkeypatch.chdir(tmp_path)
+    data = b"\xff\xd8\xff" + b"x" * 100
+    up = client.post(
+        "/api/v1/restaurantes/rest1/photo",
+        files={"file": ("logo.JPG", data, "image/jpeg")},
+    )
+    name = up.json()["foto_url"]
+    assert name.endswith(".jpg") and len(name) == 64 + 4
+
+    resp = client.get("/api/v1/restaurantes/rest1/photo")
+    assert resp.content == data
+    etag = resp.headers["etag"]
+    assert etag == f'"{name[:64]}"'
+    assert "immutable" not in resp.headers["cache-control"]
+
+    again = client.get(
+        "/api/v1/restaurantes/rest1/photo", headers={"If-None-Match": etag}
+    )
+    assert again.status_code == 304
+    part = client.get(
+        "/api/v1/restaurantes/rest1/photo", headers={"Range": "bytes=0-2"}
+    )
+    assert part.status_code == 206 and part.content == data[:3]
+    pinned = client.get("/api/v1/restaurantes/rest1/photo", params={"v": name})
+    assert "immutable" in pinned.headers["cache-control"]
+
+    # replacing the photo removes the old file
+    client.post(
+        "/api/v1/restaurantes/rest1/photo",
+        files={"file": ("logo.png", b"\x89PNG\r\n\x1a\n new", "image/png")},
+    )
+    old = tmp_path / "data" / "restaurante_photos" / name[:2] / name
+    assert not os.path.exists(old)
+
+
+def test_upload_is_checked_by_content_and_size(client, monkeypatch, tmp_path):
+    monkeypatch.chdir(tmp_path)
+    url = "/api/v1/restaurantes/rest1/photo"
+    # the extension and content type claim an image, the bytes do not
+    fake = client.post(url, files={"file": ("x.jpg", b"<?php", "image/jpeg")})
+    assert fake.status_code == 415
+    monkeypatch.setattr(main._photos(), "max_bytes", 10)
+    big = client.post(
+        url, files={"file": ("x.gif", b"GIF89a" + b"0" * 10, "image/gif")}
+    )
+    assert big.status_code == 413
+    # nothing was kept: no temp files, no stored photo
+    root = tmp_path / "data" / "restaurante_photos"
+    assert [p for p in root.rglob("*") if p.is_file()] == []
+    assert client.get(url).status_code == 404
+
+
+def test_chunked_upload_is_cut_off_while_streaming(client, monkeypatch, tmp_path):
+    import common.media
+
+    monkeypatch.chdir(tmp_path)
+    monkeypatch.setattr(common.media, "MEDIA_MAX_UPLOAD_BYTES", 10)
+    boundary = "b0undary"
+    head = (
+        f'--{boundary}\r\nContent-Disposition: form-data; name="file"; '
+        'filename="x.gif"\r\nContent-Type: image/gif\r\n\r\nGIF89a'
+    ).encode()
+
+    def body():
+        # no Content-Length: the size is only known while reading
+        yield head
+        for _ in range(64):
+            yield b"0" * 4096
+        yield f"\r\n--{boundary}--\r\n".encode()
+
+    resp = client.post(
+        "/api/v1/restaurantes/rest1/photo",
+        content=body(),
+        headers={"Content-Type": f"multipart/form-data; boundary={boundary}"},
+    )
+    assert resp.status_code == 413
+    root = tmp_path / "data" / "restaurante_photos"
+    assert not root.exists() or [p for p in root.rglob("*") if p.is_file()] == []
@@ -0,0 +1,234 @@
+from datetime import datetime, timedelta
+
+import pytest
+
+import database_sql
+import stock_engine
+from models import MenuItemORM
+
+
+def _stock(client):
+    menu = client.get("/api/v1/restaurantes/rest1/menu").json()["menu"]
+    return {it["id"]: it["cantidad"] for it in menu}
+
+
+def test_reservation_reserves_whole_cart(client):
+    resp = client.post(
+        "/api/v1/restaurantes/rest1/reservations",
+        json={
+            "items": [
+                {"item_id": "p2", "cantidad": 1},
+                {"item_id": "p1", "cantidad": 2},
+            ]
+        },
+    )
+    assert resp.status_code == 200
+    items = resp.json()["items"]
+    assert {it["id"]: it["reservado"] for it in items} == {"p1": 2, "p2": 1}
+    assert _stock(client) == {"p1": 1, "p2": 0}
+
+
+def test_reservation_is_all_or_nothing(client):
+    resp = client.post(
+        "/api/v1/restaurantes/rest1/reservations",
+        json={
+            "items": [
+                {"item_id": "p1", "cantidad": 2},
+                {"item_id": "p2", "cantidad": 2},
+            ]
+        },
+    )
+    assert resp.status_code == 400
+    assert "p2" in resp.json()["detail"]
+    assert _stock(client) == {"p1": 3, "p2": 1}
+
+
+def test_reservation_unknown_item_is_404(client):
+    resp = client.post(
+        "/api/v1/restaurantes/rest1/reservations",
+        json={"items": [{"item_id": "nope", "cantidad": 1}]},
+    )
+    assert resp.status_code == 404
+
+
+def _reserve(client, reservation_id, cantidad=2, ttl=None):
+    body = {
+        "reservation_id": reservation_id,
+        "items": [{"item_id": "p1", "cantidad": cantidad}],
+    }
+    if ttl:
+        body["ttl_seconds"] = ttl
+    return client.post("/api/v1/restaurantes/rest1/reservations", json=body)
+
+
+def test_retry_with_same_reservation_id_reserves_once(client):
+    first = _reserve(client, "order-1")
+    again = _reserve(client, "order-1")
+    assert first.status_code == again.status_code == 200
+    assert again.json()["reservation_id"] == "order-1"
+    assert _stock(client)["p1"] == 1
+
+
+def test_confirm_and_cancel_are_idempotent(client):
+    _reserve(client, "order-1")
+    url = "/api/v1/restaurantes/rest1/reservations/order-1"
+    assert client.post(f"{url}/confirm").json()["estado"] == "confirmada"
+    assert client.post(f"{url}/confirm").status_code == 200
+    assert client.post(f"{url}/cancel").status_code == 409
+
+    _reserve(client, "order-2", cantidad=1)
+    url = "/api/v1/restaurantes/rest1/reservations/order-2"
+    assert client.post(f"{url}/cancel").json()["estado"] == "cancelada"
+    assert client.post(f"{url}/cancel").status_code == 200
+    assert client.post(f"{url}/confirm").status_code == 409
+    assert _stock(client)["p1"] == 1
+
+
+def test_sweeper_expires_stale_holds(client, monkeypatch):
+    import reservations
+
+    _reserve(client, "order-1", cantidad=3)
+    _reserve(client, "order-2", cantidad=1, ttl=60)  # p1 is out of stock now
+    assert _stock(client)["p1"] == 0
+
+    later = datetime.utcnow() + timedelta(hours=2)
+
+    class _Clock(datetime):
+        @classmethod
+        def utcnow(cls):
+            return later
+
+    monkeypatch.setattr(reservations, "datetime", _Clock)
+    db = database_sql.SessionLocal()
+    try:
+        assert reservations.sweep_expired(db) == 1
+        assert reservations.sweep_expired(db) == 0
+    finally:
+        db.close()
+    assert _stock(client)["p1"] == 3
+    resp = client.post("/api/v1/restaurantes/rest1/reservations/order-1/confirm")
+    assert resp.status_code == 409
+
+
+class _MemoryStock:
+    """Stands in for the Redis engine: same contract, plain dict counters."""
+
+    def __init__(self, levels):
+        self.counters = dict(levels)
+
+    def reserve(self, rest_id, wanted):
+        for item_id, cantidad in wanted.items():
+            if item_id not in self.counters:
+                raise stock_engine.StockError("not_found", item_id)
+            if self.counters[item_id] < cantidad:
+                raise stock_engine.StockError("insufficient", item_id)
+        for item_id, cantidad in wanted.items():
+            self.counters[item_id] -= cantidad
+        return self.levels(rest_id, wanted)
+
+    def release(self, rest_id, wanted):
+        for item_id, cantidad in wanted.items():
+            self.counters[item_id] += cantidad
+
+    def levels(self, rest_id, item_ids):
+        return {i: self.counters[i] for i in item_ids if i in self.counters}
+
+
+def test_stock_engine_moves_counters_instead_of_rows(client, monkeypatch):
+    engine = _MemoryStock({"p1": 3, "p2": 1})
+    monkeypatch.setattr(stock_engine, "stock", engine)
+
+    assert _reserve(client, "order-1", cantidad=2).status_code == 200
+    assert _reserve(client, "order-2", cantidad=2).status_code == 400
+    assert engine.counters["p1"] == 1
+    # the table is only written behind by the maintenance job
+    db = database_sql.SessionLocal()
+    try:
+        assert db.get(MenuItemORM, "p1").cantidad == 3
+    finally:
+        db.close()
+    assert _stock(client)["p1"] == 1
+
+    client.post("/api/v1/restaurantes/rest1/reservations/order-1/cancel")
+    assert engine.counters["p1"] == 3
+
+
+def test_batch_release_increments_in_one_statement(client):
+    resp = client.post(
+        "/api/v1/restaurantes/rest1/releases",
+        json={
+            "items": [
+                {"item_id": "p1", "cantidad": 2},
+                {"item_id": "p2", "cantidad": 1},
+                {"item_id": "p1", "cantidad": 1},
+            ]
+        },
+    )
+    assert resp.status_code == 200
+    assert {it["id"]: it["cantidad"] for it in resp.json()["items"]} == {
+        "p1": 6,
+        "p2": 2,
+    }
+    single = client.post("/api/v1/restaurantes/rest1/menu/p2/release?cantidad=3")
+    assert single.json()["cantidad"] == 5
+
+
+def test_batch_release_is_all_or_nothing(client):
+    resp = client.post(
+        "/api/v1/restaurantes/rest1/releases",
+        json={
+            "items": [{"item_id": "p1", "cantidad": 2}, {"item_id": "x", "cantidad": 1}]
+        },
+    )
+    assert resp.status_code == 404
+    assert _stock(client) == {"p1": 3, "p2": 1}
+
+
+def _redis_engine():
+    fakeredis = pytest.importorskip("fakeredis")
+    pytest.importorskip("lupa")  # runs the Lua scripts
+    return stock_engine.RedisStockEngine(fakeredis.FakeRedis())
+
+
+def _cantidad(item_id):
+    db = database_sql.SessionLocal()
+    try:
+        return db.get(MenuItemORM, item_id).cantidad
+    finally:
+        db.close()
+
+
+def test_redis_engine_reserve_flush_and_reload(client):
+    engine = _redis_engine()
+    assert engine.reserve("rest1", {"p1": 2}) == {"p1": 1}
+    with pytest.raises(stock_engine.StockError) as exc:
+        engine.reserve("rest1", {"p1": 1, "p2": 2})
+    assert exc.value.reason == "insufficient"
+    assert _cantidad("p1") == 3  # written behind
+
+    assert engine.flush() == 1
+    assert _cantidad("p1") == 1
+    engine.release("rest1", {"p1": 1})
+    # a restarted Redis reloads from the table plus the unwritten deltas
+    engine.client.delete(engine.key("rest1", "p1"))
+    assert engine.load("rest1", "p1") == 2
+    assert engine.flush() == 1 and _cantidad("p1") == 2
+    assert engine.reconcile() == 0
+
+
+def test_redis_engine_load_does_not_miss_a_concurrent_flush(client, monkeypatch):
+    engine = _redis_engine()
+    engine.reserve("rest1", {"p1": 2})
+    engine.client.delete(engine.key("rest1", "p1"))
+    read = engine._read_cantidad
+
+    def read_then_flush(rest_id, item_id):
+        value = read(rest_id, item_id)
+        if _cantidad(item_id) == 3:
+            # the batch commits after the loader read the table
+            engine.flush()
+        return value
+
+    monkeypatch.setattr(engine, "_read_cantidad", read_then_flush)
+    assert engine.load("rest1", "p1") == 1
+    assert _cantidad("p1") == 1
@@ -0,0 +1,75 @@
+import database_sql
+from models import RestauranteORM
+
+
+def _add(*restaurants, rating=None):
+    db = database_sql.SessionLocal()
+    try:
+        for rest_id, nombre, descripcion in restaurants:
+            db.add(
+                RestauranteORM(
+                    id=rest_id,
+                    nombre=nombre,
+                    descripcion=descripcion,
+                    rating=(rating or {}).get(rest_id),
+                )
+            )
+        db.commit()
+    finally:
+        db.close()
+
+
+def test_listing_pages_with_cursor(client):
+    _add(*[(f"r{i:02d}", f"Local {i}", None) for i in range(5)])
+    seen, cursor = [], None
+    while True:
+        params = {"limit": 2}
+        if cursor:
+            params["cursor"] = cursor
+        body = client.get("/api/v1/restaurantes", params=params).json()
+        seen += [r["id"] for r in body["restaurantes"]]
+        cursor = body["next_cursor"]
+        if cursor is None:
+            break
+    assert seen == sorted(["rest1"] + [f"r{i:02d}" for i in range(5)])
+
+
+def test_listing_orders_by_rating_and_projects_fields(client):
+    _add(
+        *[(f"r{i}", f"Local {i}", None) for i in range(4)],
+        rating={"r0": 3.5, "r1": 4.8, "r2": 3.5},
+    )
+    params = {"limit": 2, "fields": "nombre", "format": "compact"}
+    first = client.get("/api/v1/restaurantes", params=params).json()
+    assert first["fields"] == ["id", "nombre"]
+    assert first["rows"] == [["r1", "Local 1"], ["r0", "Local 0"]]
+    params["cursor"] = first["next_cursor"]
+    second = client.get("/api/v1/restaurantes", params=params).json()
+    # unrated restaurants go last
+    assert [row[0] for row in second["rows"]] == ["r2", "r3"]
+    params["cursor"] = second["next_cursor"]
+    third = client.get("/api/v1/restaurantes", params=params).json()
+    assert third == {
+        "fields": ["id", "nombre"],
+        "rows": [["rest1", "Pizzeria"]],
+        "next_cursor": None,
+    }
+    bad = client.get("/api/v1/restaurantes", params={"fields": "password"})
+    assert bad.status_code == 400
+
+
+def test_search_filters_and_rejects_bad_cursor(client):
+    _add(("r1", "Sushi Bar", "pescado"), ("r2", "Tacos", "pizza al pastor"))
+    body = client.get("/api/v1/restaurantes", params={"q": "pizz"}).json()
+    assert {r["id"] for r in body["restaurantes"]} == {"rest1", "r2"}
+    resp = client.get("/api/v1/restaurantes", params={"cursor": "%%%"})
+    assert resp.status_code == 400
+
+
+def test_autocomplete_matches_word_prefixes(client):
+    _add(("r1", "La Pizzeria Roma", None), ("r2", "Pasta Fresca", None))
+    names = client.get("/api/v1/restaurantes/autocomplete", params={"q": "piz"}).json()
+    assert [s["nombre"] for s in names["sugerencias"]] == [
+        "La Pizzeria Roma",
+        "Pizzeria",
+    ]